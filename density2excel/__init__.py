@@ -0,0 +1,32 @@
+"""
+密度检测仪串口数据采集与Excel回写
+
+各子模块按职责拆分，无界面的程序只需导入用到的模块：
+- acquisition：串口读取与重试
+- connection：串口连接监控、断线重连
+- capture：串口原始数据录制与回放
+- parsing：从原始数据中提取密度值
+- stats：平均值等统计计算
+- recompute：历史工作簿多进程批量重算
+- validate：工作簿模板批量校验与修复
+- archive：检测结果二进制归档
+- summary：班次、机台增量汇总
+- spec：产品规格表与合格判定
+- xlsx：直接读取xlsx压缩包中的工作表XML
+- storage：Excel读写、回写线程、批量队列
+- records：产品和检测记录类
+- session：检测会话断点
+- provenance：读数来源记录
+- console：命令行检测流程
+- engine：检测引擎（图形界面、命令行和HTTP服务共用的采集循环）
+- simulate：模拟时钟、仪器和串口（测试用）
+- service：HTTP/SSE服务（可选）
+- trend：读数趋势图（Tk画布）
+- notify：界面内的非模态提示
+- ui：Tk图形界面（导入时才加载tkinter）
+"""
+
+import time
+
+# 启动计时起点：在导入其它模块之前记录，用于测量窗口首次绘制耗时
+STARTUP_T0 = time.perf_counter()
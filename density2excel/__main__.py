@@ -0,0 +1,323 @@
+"""
+命令行入口：python -m density2excel [gui|console|demo|replay|recompute|validate|archive|summary|simulate|serve]
+"""
+
+import argparse
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="density2excel", description="密度检测系统")
+    subparsers = parser.add_subparsers(dest="command")
+
+    gui_parser = subparsers.add_parser("gui", help="运行图形界面（默认）")
+    gui_parser.add_argument("--measure-startup", action="store_true", help="输出启动耗时后自动退出")
+
+    subparsers.add_parser("console", help="命令行检测流程")
+    subparsers.add_parser("demo", help="使用固定数据模拟检测流程")
+
+    replay_parser = subparsers.add_parser("replay", help="回放串口录制文件，输出解析出的密度值")
+    replay_parser.add_argument("capture", help="录制文件（captures/capture_YYYYMMDD.jsonl）")
+    replay_parser.add_argument("--profile", default="default", help="解析方案（default/strict）")
+    replay_parser.add_argument("--readings", type=int, default=5, help="每个样品的读数次数")
+    replay_parser.add_argument("--speed", type=float, default=0, help="回放速度倍数，0为不等待（默认）")
+
+    recompute_parser = subparsers.add_parser("recompute", help="多进程重算归档工作簿的平均值和统计")
+    recompute_parser.add_argument("paths", nargs="+", help="工作簿文件或目录")
+    recompute_parser.add_argument("--output-dir", default="recomputed", help="重算后的副本目录（默认recomputed）")
+    recompute_parser.add_argument("--dry-run", action="store_true", help="只统计，不输出副本")
+    recompute_parser.add_argument("--min", type=float, dest="low", help="读数下限，超出的读数不计入平均值")
+    recompute_parser.add_argument("--max", type=float, dest="high", help="读数上限")
+    recompute_parser.add_argument("--workers", type=int, help="进程数，默认CPU核数")
+
+    validate_parser = subparsers.add_parser("validate", help="多进程校验工作簿模板，可输出修复后的副本")
+    validate_parser.add_argument("paths", nargs="+", help="工作簿文件或目录")
+    validate_parser.add_argument("--fix-dir", help="修复后的副本目录（不指定时只校验）")
+    validate_parser.add_argument("--workers", type=int, help="进程数，默认CPU核数")
+    validate_parser.add_argument("--errors-only", action="store_true", help="只列出错误，不列出警告")
+
+    archive_parser = subparsers.add_parser("archive", help="按机台汇总二进制归档中的结果，可导入历史工作簿")
+    archive_parser.add_argument("--file", help="归档文件（默认取config.ini中[Archive]的设置）")
+    archive_parser.add_argument("--import", dest="imports", nargs="+", metavar="PATH",
+                                help="先把这些工作簿（文件或目录）中已检测的行追加到归档")
+    archive_parser.add_argument("--since", help="只汇总该日期（YYYY-MM-DD）之后的结果")
+
+    summary_parser = subparsers.add_parser("summary", help="输出工作簿按班次、机台的汇总（回写时增量更新）")
+    summary_parser.add_argument("workbook", help="工作簿")
+    summary_parser.add_argument("--rebuild", action="store_true", help="扫描一次工作表重新统计（用于已有的检测结果）")
+    summary_parser.add_argument("--sheet", help="重新统计的工作表，默认活动工作表")
+
+    simulate_parser = subparsers.add_parser("simulate", help="用模拟仪器和模拟时钟运行一个班次，输出吞吐量和读数延迟")
+    simulate_parser.add_argument("--products", type=int, default=300, help="产品数（默认300）")
+    simulate_parser.add_argument("--dropout", type=float, default=0.0, help="测量超时的概率")
+    simulate_parser.add_argument("--garbage", type=float, default=0.0, help="输出乱码的概率")
+    simulate_parser.add_argument("--measure-time", type=float, default=2.0, help="一次测量的模拟耗时（秒）")
+    simulate_parser.add_argument("--seed", type=int, default=0, help="随机数种子")
+
+    serve_parser = subparsers.add_parser("serve", help="运行HTTP服务（接收批次、控制检测、SSE推送读数）")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认只监听本机）")
+    serve_parser.add_argument("--port", type=int, default=8765, help="端口（默认8765）")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "console":
+        from .console import main as console_main
+        console_main()
+    elif args.command == "demo":
+        from .console import test_with_fixed_data
+        test_with_fixed_data()
+    elif args.command == "replay":
+        return replay(args)
+    elif args.command == "recompute":
+        return recompute(args)
+    elif args.command == "validate":
+        return validate(args)
+    elif args.command == "archive":
+        return archive(args)
+    elif args.command == "summary":
+        return summary(args)
+    elif args.command == "simulate":
+        return simulate(args)
+    elif args.command == "serve":
+        return serve(args)
+    else:
+        from .ui import run_gui
+        run_gui(measure_startup=getattr(args, "measure_startup", False))
+    return 0
+
+
+def replay(args):
+    from .capture import replay_capture
+    from .parsing import PARSER_PROFILES
+
+    if args.profile not in PARSER_PROFILES:
+        print(f"未知的解析方案: {args.profile}")
+        return 2
+    samples = replay_capture(args.capture, parser_profile=args.profile, readings_per_sample=args.readings,
+                             speed=args.speed)
+    failed = 0
+    for index, sample in enumerate(samples, 1):
+        values = ", ".join("失败" if value is None else f"{value:.4f}" for value in sample["densities"])
+        failed += sum(1 for value in sample["densities"] if value is None)
+        average = f"{sample['average']:.4f}" if sample["average"] is not None else "--"
+        print(f"样品 {index}: {values}  平均值 {average}")
+    print(f"共 {len(samples)} 个样品，{failed} 次读数失败")
+    return 0
+
+
+def _format_stats(stats):
+    if not stats.count:
+        return "无数据"
+    sd = f"{stats.stdev:.4f}" if stats.stdev is not None else "--"
+    return f"{stats.count} 个，均值 {stats.mean:.4f}，标准差 {sd}，范围 {stats.minimum:.4f}~{stats.maximum:.4f}"
+
+
+def recompute(args):
+    import time
+    from .config import AppConfig, ConfigError, load_config
+    from .recompute import find_workbooks, recompute_workbooks
+    from .spec import load_spec_table
+
+    filenames = find_workbooks(args.paths)
+    if not filenames:
+        print("没有找到工作簿")
+        return 2
+    try:
+        config = load_config()
+    except ConfigError:
+        config = AppConfig()
+    # 配置了规格（规格表或检测方案中的上下限）时按回写时的规格重新判定L列
+    spec = load_spec_table(config)
+    if not len(spec) and spec.default is None:
+        spec = None
+        print("未配置规格，L列判定保持不变（平均值变化的行需要人工复核判定）")
+
+    def on_result(summary):
+        if "error" in summary:
+            print(f"{summary['file']}: 出错 {summary['error']}")
+        elif spec is not None:
+            print(f"{summary['file']}: {summary['rows']} 行，{summary['changed']} 行平均值变化，"
+                  f"{summary['rejudged']} 行判定变化")
+        else:
+            print(f"{summary['file']}: {summary['rows']} 行，{summary['changed']} 行平均值变化")
+
+    started = time.perf_counter()
+    merged, _ = recompute_workbooks(filenames, None if args.dry_run else args.output_dir, args.low, args.high,
+                                    args.workers, on_result, spec)
+    judged = f"{merged['rejudged']} 行判定变化，" if spec is not None else ""
+    print(f"\n共 {merged['files']} 个工作簿（失败 {merged['failed']}），{merged['rows']} 行，"
+          f"{merged['measured']} 行有读数，{merged['changed']} 行平均值变化，{judged}"
+          f"耗时 {time.perf_counter() - started:.1f}s")
+    print(f"平均值: {_format_stats(merged['averages'])}")
+    print(f"读数: {_format_stats(merged['readings'])}")
+    return 1 if merged["failed"] else 0
+
+
+def validate(args):
+    import time
+    from .recompute import find_workbooks
+    from .validate import ERROR, validate_workbooks
+
+    filenames = find_workbooks(args.paths)
+    if not filenames:
+        print("没有找到工作簿")
+        return 2
+    totals = {"failed": 0, "errors": 0, "warnings": 0}
+
+    def on_result(summary):
+        if "error" in summary:
+            totals["failed"] += 1
+            print(f"{summary['file']}: 无法读取 {summary['error']}")
+            return
+        errors = sum(1 for issue in summary["issues"] if issue["level"] == ERROR)
+        totals["errors"] += errors
+        totals["warnings"] += len(summary["issues"]) - errors
+        print(f"{summary['file']}: {summary['rows']} 行，{errors} 个错误，{len(summary['issues']) - errors} 个警告"
+              + (f"，已输出 {summary['output']}" if summary["output"] else ""))
+        for issue in summary["issues"]:
+            if args.errors_only and issue["level"] != ERROR:
+                continue
+            level = "错误" if issue["level"] == ERROR else "警告"
+            cell = f"{issue['column'] or ''}{issue['row']}"
+            value = f"（{issue['value']!r}）" if issue["value"] is not None else ""
+            print(f"  [{level}] {issue['sheet']}!{cell} {issue['problem']}{value}")
+
+    started = time.perf_counter()
+    validate_workbooks(filenames, args.fix_dir, args.workers, on_result)
+    print(f"\n共 {len(filenames)} 个工作簿（无法读取 {totals['failed']}），{totals['errors']} 个错误，"
+          f"{totals['warnings']} 个警告，耗时 {time.perf_counter() - started:.1f}s")
+    return 1 if totals["failed"] or totals["errors"] else 0
+
+
+def archive(args):
+    import math
+    from datetime import datetime
+    from .archive import ResultArchive, import_workbook, iter_records
+    from .config import AppConfig, ConfigError, load_config
+    from .stats import RunningStats
+
+    filename = args.file
+    if not filename:
+        try:
+            filename = load_config().archive.filename
+        except ConfigError:
+            filename = AppConfig().archive.filename
+    if args.imports:
+        from .recompute import find_workbooks
+        result_archive = ResultArchive(filename)
+        try:
+            for workbook in find_workbooks(args.imports):
+                print(f"{workbook}: 导入 {import_workbook(result_archive, workbook)} 条结果")
+        finally:
+            result_archive.close()
+    try:
+        since = datetime.strptime(args.since, "%Y-%m-%d").timestamp() if args.since else None
+    except ValueError:
+        print(f"无效的日期: {args.since}")
+        return 2
+
+    machines = {}
+    try:
+        for record in iter_records(filename):
+            if since is not None and not record["time"] >= since:
+                continue
+            if not math.isnan(record["average"]):
+                machines.setdefault(record["machine"], RunningStats()).add(record["average"])
+    except FileNotFoundError:
+        print(f"归档文件不存在: {filename}")
+        return 2
+    for machine in sorted(machines):
+        print(f"{machine or '未知机台'}: 平均值 {_format_stats(machines[machine])}")
+    total = sum(stats.count for stats in machines.values())
+    print(f"共 {total} 个产品，{len(machines)} 个机台")
+    return 0
+
+
+def summary(args):
+    from .config import AppConfig, ConfigError, load_config
+    from .spec import load_spec_table
+    from .summary import SummaryStore, format_report
+
+    try:
+        config = load_config()
+    except ConfigError:
+        config = AppConfig()
+    summaries = SummaryStore(judge=load_spec_table(config).judge)
+    if args.rebuild:
+        print(f"已重新统计 {summaries.rebuild(args.workbook, args.sheet)} 个产品")
+    for line in format_report(summaries.report(args.workbook)):
+        print(line)
+    return 0
+
+
+def simulate(args):
+    from .config import AppConfig, ConfigError, load_config
+    from .simulate import FakeClock, SimulatedInstrument, make_products, run_shift
+
+    try:
+        config = load_config()
+    except ConfigError:
+        config = AppConfig()
+    clock = FakeClock()
+    instrument = SimulatedInstrument(clock, dropout=args.dropout, garbage=args.garbage,
+                                     measure_time=args.measure_time, seed=args.seed)
+    report = run_shift(make_products(args.products), instrument.read_frame, clock, config)
+    latency = report["latency"]
+    print(f"{report['products']} 个产品，{report['readings']} 次读数（失败 {report['failed_readings']}），"
+          f"{report['attempts']} 次读取")
+    if report["throughput"] is not None:
+        print(f"模拟耗时 {report['simulated_seconds']:.1f}s，吞吐量 {report['throughput']:.1f} 个/小时")
+    if latency["mean"] is not None:
+        print(f"读数延迟：平均 {latency['mean']:.2f}s，P50 {latency['p50']:.2f}s，P95 {latency['p95']:.2f}s，"
+              f"最大 {latency['max']:.2f}s")
+    print(f"实际耗时 {report['wall_seconds'] * 1000:.0f}ms")
+    for message in report["errors"]:
+        print(f"错误: {message}")
+    return 1 if report["errors"] else 0
+
+
+def serve(args):
+    from .archive import ResultArchive
+    from .config import AppConfig, ConfigError, load_config
+    from .connection import SerialSupervisor
+    from .engine import DetectionEngine
+    from .service import DetectionService
+    from .spec import load_spec_table
+    from .storage import CsvSink, ExcelWriteWorker
+    from .summary import SummaryStore
+
+    try:
+        config = load_config()
+    except ConfigError as e:
+        print(f"配置文件无效，使用默认配置: {e}")
+        config = AppConfig()
+    spec_table = load_spec_table(config)
+    supervisor = SerialSupervisor(lambda: config.serial,
+                                  on_state=lambda state, message: print(message) if message else None).start()
+    writer = ExcelWriteWorker(on_done=lambda model, success: print(f"{model} 写入{'成功' if success else '失败'}"),
+                              write_mode=config.profile.write_mode, summaries=SummaryStore(judge=spec_table.judge))
+    result_archive = ResultArchive.from_settings(config.archive)
+    csv_sink = CsvSink.from_settings(config.csv_log)
+    engine = DetectionEngine(supervisor.read_frame, config, writer, before_reading=supervisor.clear,
+                             archive=result_archive, spec=spec_table, csv_sink=csv_sink, provenance=True)
+    service = DetectionService(None, host=args.host, port=args.port, engine=engine)
+    print(f"HTTP服务已启动: {service.address}（Ctrl+C停止）")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        engine.wait(5)
+        writer.close()
+        supervisor.stop()
+        if result_archive is not None:
+            result_archive.close()
+        if csv_sink is not None:
+            csv_sink.close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
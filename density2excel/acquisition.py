@@ -0,0 +1,172 @@
+"""
+串口数据采集
+"""
+
+import time
+
+from .parsing import extract_density_value
+
+
+# serial 在函数内导入，界面启动时不必等待加载
+def open_serial_port(port, baudrate=9600, bytesize=8, stopbits=1, parity='NONE', timeout=3):
+    """
+    打开串口
+    :param port: 串口名称，如COM3（Windows）或/dev/ttyUSB0（Linux）
+    :param baudrate: 波特率
+    :param bytesize: 数据位
+    :param stopbits: 停止位
+    :param parity: 校验位
+    :param timeout: 读取超时时间
+    :return: serial.Serial对象，打开失败时抛出serial.SerialException
+    """
+    import serial
+    
+    # 转换停止位
+    if stopbits == 1:
+        stopbits = serial.STOPBITS_ONE
+    elif stopbits == 1.5:
+        stopbits = serial.STOPBITS_ONE_POINT_FIVE
+    elif stopbits == 2:
+        stopbits = serial.STOPBITS_TWO
+    
+    # 转换校验位
+    if parity == 'NONE':
+        parity = serial.PARITY_NONE
+    elif parity == 'ODD':
+        parity = serial.PARITY_ODD
+    elif parity == 'EVEN':
+        parity = serial.PARITY_EVEN
+    
+    # 初始化串口，增加流控制设置
+    return serial.Serial(
+        port=port,
+        baudrate=baudrate,
+        parity=parity,
+        stopbits=stopbits,
+        bytesize=bytesize,
+        timeout=timeout,
+        xonxoff=False,  # 禁用软件流控制
+        rtscts=False,   # 禁用硬件流控制
+        dsrdtr=False,   # 禁用DSR/DTR流控制
+        writeTimeout=2
+    )
+
+
+def read_serial_data(port, baudrate=9600, bytesize=8, stopbits=1, parity='NONE', timeout=3):
+    """
+    从COM口读取数据（每次打开、读取、关闭串口）
+    :param port: 串口名称，如COM3（Windows）或/dev/ttyUSB0（Linux）
+    :param baudrate: 波特率
+    :param bytesize: 数据位
+    :param stopbits: 停止位
+    :param parity: 校验位
+    :param timeout: 超时时间
+    :return: 读取到的串口数据字符串
+    """
+    try:
+        ser = open_serial_port(port, baudrate, bytesize, stopbits, parity, timeout)
+
+        # 清空输入缓冲区，确保读取最新数据
+        ser.flushInput()
+        
+        # 读取串口数据
+        data = ""
+        lines_read = 0
+        max_lines = 10  # 增加最大读取行数，提高兼容性
+        line_timeout = 0.5  # 每行读取的超时时间
+        
+        # 尝试读取max_lines行数据，或直到超时
+        start_time = time.time()
+        while time.time() - start_time < timeout and lines_read < max_lines:
+            line_start_time = time.time()
+            line_data = b""
+            
+            # 读取一行数据，处理超时
+            while time.time() - line_start_time < line_timeout:
+                if ser.in_waiting > 0:
+                    byte = ser.read(1)
+                    if byte == b'\n':
+                        break
+                    line_data += byte
+                else:
+                    time.sleep(0.01)  # 短暂休眠，减少CPU占用
+            
+            # 解码并处理读取到的行
+            if line_data:
+                line = line_data.decode('utf-8', errors='ignore').strip()
+                if line:
+                    data += line + "\n"
+                    lines_read += 1
+                    # 如果已经找到密度数据，可以提前返回
+                    if "Density" in line:
+                        # 再读取1-2行，确保获取完整数据
+                        for _ in range(2):
+                            if ser.in_waiting > 0:
+                                extra_line = ser.readline().decode('utf-8', errors='ignore').strip()
+                                if extra_line:
+                                    data += extra_line + "\n"
+                    
+        # 关闭串口前检查是否还有剩余数据
+        if ser.in_waiting > 0:
+            remaining_data = ser.read(ser.in_waiting).decode('utf-8', errors='ignore').strip()
+            if remaining_data:
+                data += remaining_data + "\n"
+        
+        ser.close()
+        
+        # 改进数据完整性检查
+        if data.strip():
+            # 打印读取到的原始数据，用于调试
+            # print(f"读取到的数据: {data}")
+            return data
+        else:
+            return ""
+
+    except Exception as e:
+        # 不打印每次读取错误，避免控制台信息过多
+        # print(f"串口读取错误: {e}")
+        return ""
+
+
+def read_density(read_raw, max_attempts, detect_num, parser_profile="default", should_continue=None, log=None,
+                 on_raw=None, sleep=time.sleep):
+    """
+    反复读取串口直到提取到一个密度值
+    读取到数据但没有密度值时等待0.5秒，读取失败时按指数退避等待（最多2秒）
+    :param read_raw: 无参数函数，返回一次读取到的原始数据字符串
+    :param max_attempts: 最大尝试次数
+    :param detect_num: 第几次检测，用于日志
+    :param parser_profile: 解析方案，见parsing.PARSER_PROFILES
+    :param should_continue: 无参数函数，返回False时停止重试
+    :param log: 日志函数 log(message)
+    :param on_raw: 读取到原始数据时的回调 on_raw(raw_data)
+    :param sleep: 等待函数，默认time.sleep
+    :return: (密度值, 尝试次数)，失败时密度值为None
+    """
+    log = log or (lambda message: None)
+    attempts = 0
+    for attempt in range(max_attempts):
+        if should_continue is not None and not should_continue():
+            break
+        attempts = attempt + 1
+        
+        raw_data = read_raw()
+        if raw_data:
+            if on_raw:
+                on_raw(raw_data)
+            log(f"第 {detect_num} 次检测 - 第 {attempt + 1} 次尝试读取到原始数据")
+            
+            # 提取密度值
+            density = extract_density_value(raw_data, parser_profile)
+            if density is not None:
+                log(f"第 {detect_num} 次检测 - 成功提取密度值: {density} g/ccm")
+                return density, attempts
+            # 即使没有找到密度值，也稍微等待一下
+            log(f"第 {detect_num} 次检测 - 读取到数据但未找到密度值，重试中...")
+            sleep(0.5)
+        else:
+            log(f"第 {detect_num} 次检测 - 第 {attempt + 1} 次尝试读取失败，重试中...")
+            # 指数退避策略
+            wait_time = min(0.1 * (2 ** attempt), 2)  # 最大等待2秒
+            sleep(wait_time)
+    return None, attempts
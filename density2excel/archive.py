@@ -0,0 +1,244 @@
+"""
+检测结果二进制归档
+
+每个产品的结果追加为一条定长记录，便于长期趋势分析时直接按切片读取，不必逐个解析xlsx：
+
+    文件头（32字节）：魔数 b"D2XARCH1"、版本、记录长度、每条记录的读数个数
+    记录（72字节，小端）：
+        time      float64    检测时间（Unix时间戳，未知时为NaN）
+        product   uint32     产品型号在字符串表中的序号
+        machine   uint32     机台号序号
+        shift     uint32     班次序号
+        count     uint32     已采集的读数个数
+        readings  float64×5  密度1~密度5（失败或未采集为NaN）
+        average   float64    平均值（NaN表示无法计算）
+
+字符串表保存在旁边的 <归档>.strings.jsonl 中，每行一个字符串，行号即序号，只追加不改写。
+安装了numpy时 open_memmap 返回零拷贝的结构化数组（numpy.memmap）；
+没有numpy时 iter_records 通过mmap逐条读取。
+"""
+
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from datetime import datetime
+
+MAGIC = b"D2XARCH1"
+VERSION = 1
+READINGS = 5  # 与Excel中的密度1~密度5一致
+HEADER = struct.Struct("<8s3I12x")
+RECORD = struct.Struct(f"<d4I{READINGS}dd")
+DEFAULT_ARCHIVE = os.path.join("archive", "results.d2a")
+NAN = float("nan")
+
+
+def strings_filename(filename):
+    """归档对应的字符串表文件"""
+    return filename + ".strings.jsonl"
+
+
+def numpy_dtype():
+    """记录对应的numpy结构化类型（需要numpy）"""
+    import numpy
+    return numpy.dtype([
+        ("time", "<f8"),
+        ("product", "<u4"),
+        ("machine", "<u4"),
+        ("shift", "<u4"),
+        ("count", "<u4"),
+        ("readings", "<f8", (READINGS,)),
+        ("average", "<f8"),
+    ])
+
+
+def _timestamp(value):
+    """检测时间（datetime或"%Y-%m-%d %H:%M:%S"文本）转换为时间戳，无法解析时为NaN"""
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, str) and value.strip():
+        try:
+            return datetime.strptime(value.strip(), "%Y-%m-%d %H:%M:%S").timestamp()
+        except ValueError:
+            return NAN
+    return NAN
+
+
+def _float(value):
+    if value is None or value == "":
+        return NAN
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _load_strings(filename):
+    """
+    读取字符串表
+    写入中断时最后一行可能不完整：没有换行符或无法解析的最后一行忽略
+    :return: (字符串列表, 完整行的总字节数, 文件字节数)
+    """
+    try:
+        with open(strings_filename(filename), "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return [], 0, 0
+    strings = []
+    end = 0
+    lines = data.split(b"\n")
+    for number, line in enumerate(lines[:-1]):
+        if line.strip():
+            try:
+                strings.append(json.loads(line.decode("utf-8")))
+            except ValueError:
+                if number < len(lines) - 2:
+                    raise
+                break
+        end += len(line) + 1
+    return strings, end, len(data)
+
+
+def read_strings(filename):
+    """读取字符串表，返回列表（序号即下标），不完整的最后一行忽略"""
+    return _load_strings(filename)[0]
+
+
+def _check_header(data, filename):
+    if len(data) < HEADER.size:
+        raise ValueError(f"不是检测结果归档: {filename}")
+    magic, version, record_size, readings = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION or record_size != RECORD.size or readings != READINGS:
+        raise ValueError(f"不是检测结果归档或版本不兼容: {filename}")
+
+
+class ResultArchive:
+    """追加写入归档，可以在多个线程中调用append"""
+
+    def __init__(self, filename=DEFAULT_ARCHIVE):
+        self.filename = filename
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(filename))
+        os.makedirs(directory, exist_ok=True)
+        self._strings, valid_size, size = _load_strings(filename)
+        if valid_size < size:
+            # 上次写入中断留下的不完整行截掉，之后追加的字符串从新的一行开始
+            with open(strings_filename(filename), "r+b") as f:
+                f.truncate(valid_size)
+        self._ids = {text: index for index, text in enumerate(self._strings)}
+        self._file = open(filename, "ab")
+        if self._file.tell() == 0:
+            self._file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, READINGS))
+            self._file.flush()
+        else:
+            with open(filename, "rb") as f:
+                _check_header(f.read(HEADER.size), filename)
+            # 上次写入中断留下的不完整记录截掉，保证记录按定长对齐
+            size = self._file.tell()
+            remainder = (size - HEADER.size) % RECORD.size
+            if remainder:
+                self._file.truncate(size - remainder)
+        self._strings_file = open(strings_filename(filename), "a", encoding="utf-8")
+
+    @classmethod
+    def from_settings(cls, settings):
+        """按配置（ArchiveSettings）创建，未启用时返回None"""
+        return cls(settings.filename) if settings.enabled else None
+
+    def _string_id(self, value):
+        text = "" if value is None else str(value)
+        index = self._ids.get(text)
+        if index is None:
+            index = self._ids[text] = len(self._strings)
+            self._strings.append(text)
+            self._strings_file.write(json.dumps(text, ensure_ascii=False) + "\n")
+        return index
+
+    def append(self, detect_data):
+        """
+        追加一个产品的结果
+        :param detect_data: build_detect_data得到的检测数据字典（或DetectionRecord）
+        """
+        readings = [_float(detect_data.get(f"密度{index}")) for index in range(1, READINGS + 1)]
+        with self._lock:
+            record = RECORD.pack(
+                _timestamp(detect_data.get("检测时间")),
+                self._string_id(detect_data.get("产品型号")),
+                self._string_id(detect_data.get("机台号")),
+                self._string_id(detect_data.get("班次")),
+                sum(1 for value in readings if not math.isnan(value)),
+                *readings,
+                _float(detect_data.get("平均值")),
+            )
+            # 先写字符串表，记录中引用的序号总是已经存在
+            self._strings_file.flush()
+            self._file.write(record)
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+            self._strings_file.close()
+
+
+def record_count(filename):
+    """归档中的记录数"""
+    return max(0, (os.path.getsize(filename) - HEADER.size) // RECORD.size)
+
+
+def open_memmap(filename):
+    """
+    以numpy.memmap打开归档（零拷贝），例如 data["average"][data["machine"] == 3]
+    :return: (结构化数组, 字符串表)
+    """
+    import numpy
+    with open(filename, "rb") as f:
+        _check_header(f.read(HEADER.size), filename)
+    count = record_count(filename)
+    data = numpy.memmap(filename, dtype=numpy_dtype(), mode="r", offset=HEADER.size, shape=(count,))
+    return data, read_strings(filename)
+
+
+def iter_records(filename, start=0, stop=None):
+    """
+    逐条读取记录（不需要numpy），通过mmap按偏移量直接定位
+    :param start: 起始记录序号
+    :param stop: 结束记录序号（不含），为None时读到末尾
+    :return: 生成 {"time", "product", "machine", "shift", "count", "readings", "average"}，
+             字符串字段已按字符串表转换
+    """
+    strings = read_strings(filename)
+    count = record_count(filename)
+    stop = count if stop is None else min(stop, count)
+    if start >= stop:
+        return
+    with open(filename, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        _check_header(data, filename)
+        for offset in range(HEADER.size + start * RECORD.size, HEADER.size + stop * RECORD.size, RECORD.size):
+            fields = RECORD.unpack_from(data, offset)
+            yield {
+                "time": fields[0],
+                "product": strings[fields[1]],
+                "machine": strings[fields[2]],
+                "shift": strings[fields[3]],
+                "count": fields[4],
+                "readings": fields[5:5 + READINGS],
+                "average": fields[5 + READINGS],
+            }
+
+
+def import_workbook(archive, filename, sheet_name=None):
+    """
+    把工作簿中已检测的行追加到归档（历史数据回填）
+    :param archive: ResultArchive
+    :return: 追加的记录数
+    """
+    from .storage import read_detection_history
+    count = 0
+    for record in read_detection_history(filename, sheet_name):
+        if any(value is not None for value in record.densities):
+            archive.append(record)
+            count += 1
+    return count
@@ -0,0 +1,162 @@
+"""
+串口原始数据录制与回放
+
+录制文件为JSONL，每行一段收到的字节：{"t": 时间戳, "d": base64数据}，按天分文件。
+回放时把录制的数据按原来的帧拆分方式送回read_density，
+可以实时回放，也可以不等待地快速回放，用于在真实产线数据上回归测试解析方案。
+"""
+
+import base64
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from .acquisition import read_density
+from .connection import FrameSplitter
+from .stats import average_density
+
+CAPTURE_PREFIX = "capture_"
+
+
+class CaptureRecorder:
+    """
+    录制串口收到的全部字节，可直接注册为SerialSupervisor的数据监听
+    文件句柄保持打开，每隔flush_interval秒刷新一次，日期变化时换新文件
+    """
+
+    def __init__(self, directory, flush_interval=1.0):
+        """
+        :param directory: 录制文件目录，不存在时创建
+        :param flush_interval: 刷新到磁盘的间隔（秒）
+        """
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.filename = None
+        self._file = None
+        self._day = None
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, timestamp, data):
+        self.record(timestamp, data)
+
+    def record(self, timestamp, data):
+        """
+        追加一段数据
+        :param timestamp: 接收时间（time.time()）
+        :param data: bytes
+        """
+        line = json.dumps({"t": round(timestamp, 4), "d": base64.b64encode(data).decode("ascii")}) + "\n"
+        with self._lock:
+            day = datetime.fromtimestamp(timestamp).strftime("%Y%m%d")
+            if day != self._day:
+                self._open(day)
+            self._file.write(line)
+            if timestamp - self._last_flush >= self.flush_interval:
+                self._file.flush()
+                self._last_flush = timestamp
+
+    def _open(self, day):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        self.filename = os.path.join(self.directory, f"{CAPTURE_PREFIX}{day}.jsonl")
+        self._file = open(self.filename, "a", encoding="utf-8")
+        self._day = day
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._day = None
+
+
+def read_capture(filename):
+    """
+    逐段读取录制文件，跳过损坏的行（例如断电时写了一半的最后一行）
+    :param filename: 录制文件
+    :return: 生成 (时间戳, bytes)
+    """
+    with open(filename, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                yield record["t"], base64.b64decode(record["d"])
+            except (ValueError, KeyError):
+                continue
+
+
+class ReplaySource:
+    """
+    录制文件回放源，read_frame与SerialSupervisor.read_frame用法相同
+    speed为0时不等待，否则按录制时的时间间隔除以speed等待
+    """
+
+    def __init__(self, filename, speed=0, sleep=time.sleep):
+        self.speed = speed
+        self.sleep = sleep
+        self.exhausted = False
+        self._frames = self._iter_frames(filename)
+
+    def _iter_frames(self, filename):
+        splitter = FrameSplitter()
+        previous = None
+        for timestamp, data in read_capture(filename):
+            if self.speed and previous is not None and timestamp > previous:
+                self.sleep((timestamp - previous) / self.speed)
+            previous = timestamp
+            for frame in splitter.feed(data):
+                yield frame
+        tail = splitter.flush()
+        if tail:
+            yield tail
+
+    def read_frame(self, timeout=3):
+        """返回下一帧数据，回放结束后返回"" """
+        if self.exhausted:
+            return ""
+        try:
+            return next(self._frames)
+        except StopIteration:
+            self.exhausted = True
+            return ""
+
+
+def replay_capture(filename, parser_profile="default", readings_per_sample=5, max_attempts=15, speed=0,
+                   on_reading=None):
+    """
+    把录制文件送回检测流程（read_density），按每个样品的读数次数分组计算平均值
+    :param filename: 录制文件
+    :param parser_profile: 解析方案
+    :param readings_per_sample: 每个样品的读数次数
+    :param max_attempts: 每次读数的最大尝试次数
+    :param speed: 回放速度，0为不等待
+    :param on_reading: 每得到一个读数时的回调 on_reading(sample_index, reading_index, density)
+    :return: 样品列表，每项 {"densities": [...], "average": 平均值}
+    """
+    source = ReplaySource(filename, speed)
+    samples = []
+    densities = []
+    while not source.exhausted:
+        density, _ = read_density(
+            source.read_frame,
+            max_attempts,
+            len(densities) + 1,
+            parser_profile=parser_profile,
+            should_continue=lambda: not source.exhausted,
+            sleep=lambda seconds: None,
+        )
+        if density is None and source.exhausted:
+            break
+        densities.append(density)
+        if on_reading:
+            on_reading(len(samples) + 1, len(densities), density)
+        if len(densities) == readings_per_sample:
+            samples.append({"densities": densities, "average": average_density(densities)})
+            densities = []
+    if densities:
+        samples.append({"densities": densities, "average": average_density(densities)})
+    return samples
@@ -0,0 +1,448 @@
+"""
+配置文件（config.ini）读取、校验与热加载
+
+[SerialConfig] 是默认串口参数，可以用 instrument / profile 选择当前仪器和方案：
+
+    [SerialConfig]
+    port = COM2
+    ...
+    instrument = line2
+    profile = default
+
+    [Instrument:line2]        ; 覆盖 SerialConfig 中的任意串口参数，也可以指定 profile
+    port = COM5
+    profile = strict
+
+    [Profile:strict]
+    parser_profile = strict   ; 解析方案，见 parsing.PARSER_PROFILES
+    readings_per_sample = 3   ; 每个样品的读数次数（1~5）
+    flush_policy = product    ; product：每个产品保存一次；source：批量队列离开文件时保存一次
+    write_mode = patch        ; workbook：openpyxl完整保存；patch：只修改变化的单元格，保留图表、数据验证等
+    spec_min = 1.30           ; 平均值的规格下限/上限（可选），规格表中没有的产品型号按此判定
+    spec_max = 1.36
+
+    [Notify]
+    modal = false             ; true：检测完成和出错时弹出对话框（需要点击确认）；false：界面内提示，不打断流程
+    sound = true              ; 提示时响铃
+    duration = 5              ; 提示显示的秒数
+
+    [CsvLog]
+    enabled = true            ; 每个读数追加一行到CSV（时间、产品、机台、班次、读数序号、密度值）
+    directory = csv_logs      ; 输出目录，每天一个文件
+    max_size_mb = 10          ; 单个文件超过该大小时换新文件
+    flush_interval = 5        ; 最长多少秒刷新一次到磁盘
+
+    [Archive]
+    enabled = true            ; 每个产品的结果追加到二进制归档，用于长期趋势分析
+    filename = archive/results.d2a
+
+    [Spec]
+    file = specs.csv          ; 产品规格表（CSV或工作簿），启动时读取，按产品型号判定合格/不合格，为空时只用spec_min/spec_max
+    sheet =                   ; 规格表在工作簿中的工作表名称，为空时使用活动工作表
+"""
+
+import configparser
+import os
+import threading
+from dataclasses import dataclass, field, replace
+from typing import Optional
+
+from .parsing import PARSER_PROFILES
+
+DEFAULT_CONFIG_FILE = "config.ini"
+
+SERIAL_SECTION = "SerialConfig"
+NOTIFY_SECTION = "Notify"
+CSV_LOG_SECTION = "CsvLog"
+ARCHIVE_SECTION = "Archive"
+SPEC_SECTION = "Spec"
+INSTRUMENT_PREFIX = "Instrument:"
+PROFILE_PREFIX = "Profile:"
+
+VALID_BYTESIZES = (5, 6, 7, 8)
+VALID_STOPBITS = (1, 1.5, 2)
+VALID_PARITIES = ("NONE", "ODD", "EVEN")
+FLUSH_POLICIES = ("product", "source")
+WRITE_MODES = ("workbook", "patch")
+MAX_READINGS_PER_SAMPLE = 5  # Excel中只有密度1~密度5五列
+
+
+class ConfigError(ValueError):
+    """配置文件内容无效"""
+
+
+@dataclass(frozen=True)
+class SerialSettings:
+    """串口参数"""
+    port: str = "COM2"
+    baudrate: int = 9600
+    bytesize: int = 7
+    stopbits: float = 1
+    parity: str = "NONE"
+    timeout: float = 2
+    max_attempts: int = 15
+    capture_dir: str = "captures"  # 串口原始数据录制目录，为空时不录制
+    scanner_port: str = ""  # 条码扫描枪串口（9600 8N1），为空时只用键盘输入扫码
+
+
+@dataclass(frozen=True)
+class ProfileSettings:
+    """检测方案"""
+    parser_profile: str = "default"
+    readings_per_sample: int = MAX_READINGS_PER_SAMPLE
+    flush_policy: str = "source"
+    write_mode: str = "workbook"
+    spec_min: Optional[float] = None
+    spec_max: Optional[float] = None
+
+
+@dataclass(frozen=True)
+class NotifySettings:
+    """检测流程中的提示方式"""
+    modal: bool = False
+    sound: bool = True
+    duration: float = 5
+
+
+@dataclass(frozen=True)
+class CsvLogSettings:
+    """读数CSV日志"""
+    enabled: bool = True
+    directory: str = "csv_logs"
+    max_size_mb: float = 10
+    flush_interval: float = 5
+
+
+@dataclass(frozen=True)
+class ArchiveSettings:
+    """检测结果二进制归档"""
+    enabled: bool = True
+    filename: str = os.path.join("archive", "results.d2a")
+
+
+@dataclass(frozen=True)
+class SpecSettings:
+    """产品规格表"""
+    file: str = ""
+    sheet: str = ""
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """
+    已校验的完整配置
+    serial、profile 是按当前仪器合并覆盖后的结果，instruments、profiles 保留文件中的全部定义
+    """
+    serial: SerialSettings = field(default_factory=SerialSettings)
+    profile: ProfileSettings = field(default_factory=ProfileSettings)
+    notify: NotifySettings = field(default_factory=NotifySettings)
+    csv_log: CsvLogSettings = field(default_factory=CsvLogSettings)
+    archive: ArchiveSettings = field(default_factory=ArchiveSettings)
+    spec: SpecSettings = field(default_factory=SpecSettings)
+    instrument: str = ""
+    profile_name: str = "default"
+    instruments: dict = field(default_factory=dict)
+    profiles: dict = field(default_factory=dict)
+
+
+def _parse_number(section, key, convert, default):
+    value = section.get(key)
+    if value is None or not value.strip():
+        return default
+    try:
+        return convert(value)
+    except ValueError:
+        raise ConfigError(f"[{section.name}] {key} = {value} 不是有效的数值")
+
+
+def _parse_serial(section, base):
+    """用配置节中的串口参数覆盖base"""
+    stopbits = _parse_number(section, "stopbits", float, base.stopbits)
+    settings = replace(
+        base,
+        port=section.get("port", base.port).strip(),
+        baudrate=_parse_number(section, "baudrate", int, base.baudrate),
+        bytesize=_parse_number(section, "bytesize", int, base.bytesize),
+        stopbits=int(stopbits) if stopbits in (1, 2) else stopbits,
+        parity=section.get("parity", base.parity).strip().upper(),
+        timeout=_parse_number(section, "timeout", float, base.timeout),
+        max_attempts=_parse_number(section, "max_attempts", int, base.max_attempts),
+        capture_dir=section.get("capture_dir", base.capture_dir).strip(),
+        scanner_port=section.get("scanner_port", base.scanner_port).strip(),
+    )
+    validate_serial(settings, section.name)
+    return settings
+
+
+def _parse_profile(section):
+    profile = ProfileSettings(
+        parser_profile=section.get("parser_profile", ProfileSettings.parser_profile).strip(),
+        readings_per_sample=_parse_number(section, "readings_per_sample", int, ProfileSettings.readings_per_sample),
+        flush_policy=section.get("flush_policy", ProfileSettings.flush_policy).strip().lower(),
+        write_mode=section.get("write_mode", ProfileSettings.write_mode).strip().lower(),
+        spec_min=_parse_number(section, "spec_min", float, None),
+        spec_max=_parse_number(section, "spec_max", float, None),
+    )
+    if profile.parser_profile not in PARSER_PROFILES:
+        raise ConfigError(f"[{section.name}] 未知的解析方案: {profile.parser_profile}")
+    if not 1 <= profile.readings_per_sample <= MAX_READINGS_PER_SAMPLE:
+        raise ConfigError(f"[{section.name}] readings_per_sample 必须在 1~{MAX_READINGS_PER_SAMPLE} 之间")
+    if profile.flush_policy not in FLUSH_POLICIES:
+        raise ConfigError(f"[{section.name}] flush_policy 必须是 {'/'.join(FLUSH_POLICIES)} 之一")
+    if profile.write_mode not in WRITE_MODES:
+        raise ConfigError(f"[{section.name}] write_mode 必须是 {'/'.join(WRITE_MODES)} 之一")
+    if profile.spec_min is not None and profile.spec_max is not None and profile.spec_min > profile.spec_max:
+        raise ConfigError(f"[{section.name}] spec_min 不能大于 spec_max")
+    return profile
+
+
+def _parse_notify(section):
+    try:
+        notify = NotifySettings(
+            modal=section.getboolean("modal", NotifySettings.modal),
+            sound=section.getboolean("sound", NotifySettings.sound),
+            duration=_parse_number(section, "duration", float, NotifySettings.duration),
+        )
+    except ValueError as e:
+        if isinstance(e, ConfigError):
+            raise
+        raise ConfigError(f"[{section.name}] modal/sound 必须是 true 或 false")
+    if notify.duration <= 0:
+        raise ConfigError(f"[{section.name}] duration 必须大于0")
+    return notify
+
+
+def _parse_csv_log(section):
+    try:
+        enabled = section.getboolean("enabled", CsvLogSettings.enabled)
+    except ValueError:
+        raise ConfigError(f"[{section.name}] enabled 必须是 true 或 false")
+    csv_log = CsvLogSettings(
+        enabled=enabled,
+        directory=section.get("directory", CsvLogSettings.directory).strip(),
+        max_size_mb=_parse_number(section, "max_size_mb", float, CsvLogSettings.max_size_mb),
+        flush_interval=_parse_number(section, "flush_interval", float, CsvLogSettings.flush_interval),
+    )
+    if csv_log.enabled and not csv_log.directory:
+        raise ConfigError(f"[{section.name}] directory 不能为空")
+    if csv_log.max_size_mb <= 0:
+        raise ConfigError(f"[{section.name}] max_size_mb 必须大于0")
+    if csv_log.flush_interval < 0:
+        raise ConfigError(f"[{section.name}] flush_interval 不能小于0")
+    return csv_log
+
+
+def _parse_archive(section):
+    try:
+        enabled = section.getboolean("enabled", ArchiveSettings.enabled)
+    except ValueError:
+        raise ConfigError(f"[{section.name}] enabled 必须是 true 或 false")
+    archive = ArchiveSettings(enabled=enabled, filename=section.get("filename", ArchiveSettings.filename).strip())
+    if archive.enabled and not archive.filename:
+        raise ConfigError(f"[{section.name}] filename 不能为空")
+    return archive
+
+
+def _parse_spec(section):
+    return SpecSettings(file=section.get("file", SpecSettings.file).strip(),
+                        sheet=section.get("sheet", SpecSettings.sheet).strip())
+
+
+def validate_serial(settings, source=SERIAL_SECTION):
+    """
+    校验串口参数
+    :param settings: SerialSettings
+    :param source: 出错时提示的配置节名称
+    :raises ConfigError: 参数无效
+    """
+    if not settings.port:
+        raise ConfigError(f"[{source}] port 不能为空")
+    if settings.baudrate <= 0:
+        raise ConfigError(f"[{source}] baudrate 必须大于0")
+    if settings.bytesize not in VALID_BYTESIZES:
+        raise ConfigError(f"[{source}] bytesize 必须是 {VALID_BYTESIZES} 之一")
+    if settings.stopbits not in VALID_STOPBITS:
+        raise ConfigError(f"[{source}] stopbits 必须是 {VALID_STOPBITS} 之一")
+    if settings.parity not in VALID_PARITIES:
+        raise ConfigError(f"[{source}] parity 必须是 {'/'.join(VALID_PARITIES)} 之一")
+    if settings.timeout <= 0:
+        raise ConfigError(f"[{source}] timeout 必须大于0")
+    if settings.max_attempts < 1:
+        raise ConfigError(f"[{source}] max_attempts 至少为1")
+
+
+def parse_config(parser):
+    """
+    从ConfigParser解析并校验配置
+    :param parser: 已读取内容的ConfigParser
+    :return: AppConfig
+    :raises ConfigError: 配置无效
+    """
+    base_section = parser[SERIAL_SECTION] if parser.has_section(SERIAL_SECTION) else parser[parser.default_section]
+    base_serial = _parse_serial(base_section, SerialSettings())
+
+    profiles = {"default": ProfileSettings()}
+    instruments = {}
+    for name in parser.sections():
+        if name.startswith(PROFILE_PREFIX):
+            profiles[name[len(PROFILE_PREFIX):].strip()] = _parse_profile(parser[name])
+    for name in parser.sections():
+        if name.startswith(INSTRUMENT_PREFIX):
+            instruments[name[len(INSTRUMENT_PREFIX):].strip()] = _parse_serial(parser[name], base_serial)
+
+    instrument = base_section.get("instrument", "").strip()
+    profile_name = base_section.get("profile", "default").strip() or "default"
+    serial_settings = base_serial
+    if instrument:
+        if instrument not in instruments:
+            raise ConfigError(f"[{SERIAL_SECTION}] 未定义的仪器: {instrument}")
+        serial_settings = instruments[instrument]
+        profile_name = parser[INSTRUMENT_PREFIX + instrument].get("profile", profile_name).strip() or profile_name
+    if profile_name not in profiles:
+        raise ConfigError(f"未定义的检测方案: {profile_name}")
+
+    notify = _parse_notify(parser[NOTIFY_SECTION]) if parser.has_section(NOTIFY_SECTION) else NotifySettings()
+    csv_log = _parse_csv_log(parser[CSV_LOG_SECTION]) if parser.has_section(CSV_LOG_SECTION) else CsvLogSettings()
+    archive = _parse_archive(parser[ARCHIVE_SECTION]) if parser.has_section(ARCHIVE_SECTION) else ArchiveSettings()
+    spec = _parse_spec(parser[SPEC_SECTION]) if parser.has_section(SPEC_SECTION) else SpecSettings()
+
+    return AppConfig(
+        serial=serial_settings,
+        profile=profiles[profile_name],
+        notify=notify,
+        csv_log=csv_log,
+        archive=archive,
+        spec=spec,
+        instrument=instrument,
+        profile_name=profile_name,
+        instruments=instruments,
+        profiles=profiles,
+    )
+
+
+def read_config_file(path=DEFAULT_CONFIG_FILE):
+    """
+    读取并校验配置文件，文件不存在时返回默认配置
+    :param path: 配置文件路径
+    :return: AppConfig
+    :raises ConfigError: 配置无效
+    """
+    parser = configparser.ConfigParser()
+    if os.path.exists(path):
+        parser.read(path, encoding="utf-8")
+    return parse_config(parser)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load_config(path=DEFAULT_CONFIG_FILE):
+    """
+    获取共享的配置对象
+    同一文件只在修改时间变化后重新解析，各模块拿到的是同一个实例
+    :param path: 配置文件路径
+    :return: AppConfig
+    :raises ConfigError: 配置无效
+    """
+    key = os.path.abspath(path)
+    mtime = os.path.getmtime(path) if os.path.exists(path) else None
+    with _cache_lock:
+        cached = _cache.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        config = read_config_file(path)
+        _cache[key] = (mtime, config)
+        return config
+
+
+def ensure_config_file(path=DEFAULT_CONFIG_FILE):
+    """配置文件不存在时按默认串口参数创建"""
+    if not os.path.exists(path):
+        save_serial_settings(SerialSettings(), path)
+
+
+def save_serial_settings(settings, path=DEFAULT_CONFIG_FILE):
+    """
+    校验后把串口参数写入[SerialConfig]，保留文件中的其它配置节和键
+    [SerialConfig]中选择了仪器（instrument）时写入该仪器的[Instrument:名称]节，否则仪器节中的参数会覆盖写入的值
+    :param settings: SerialSettings
+    :param path: 配置文件路径
+    :raises ConfigError: 参数无效
+    """
+    validate_serial(settings)
+    parser = configparser.ConfigParser()
+    if os.path.exists(path):
+        parser.read(path, encoding="utf-8")
+    if not parser.has_section(SERIAL_SECTION):
+        parser.add_section(SERIAL_SECTION)
+    section = parser[SERIAL_SECTION]
+    instrument = section.get("instrument", "").strip()
+    if instrument and parser.has_section(INSTRUMENT_PREFIX + instrument):
+        section = parser[INSTRUMENT_PREFIX + instrument]
+    section["port"] = settings.port
+    section["baudrate"] = str(settings.baudrate)
+    section["bytesize"] = str(settings.bytesize)
+    section["stopbits"] = str(settings.stopbits)
+    section["parity"] = settings.parity
+    section["timeout"] = str(settings.timeout)
+    section["max_attempts"] = str(settings.max_attempts)
+    with open(path, "w", encoding="utf-8") as f:
+        parser.write(f)
+
+
+class ConfigWatcher:
+    """
+    监视配置文件修改，重新加载并校验后回调
+    内容无效时保留原配置，通过on_error报告
+    """
+
+    def __init__(self, path, on_change, on_error=None, interval=1.0):
+        """
+        :param path: 配置文件路径
+        :param on_change: 配置变化时的回调 on_change(config)，在监视线程中调用
+        :param on_error: 配置无效时的回调 on_error(error)，在监视线程中调用
+        :param interval: 检查间隔（秒）
+        """
+        self.path = path
+        self.on_change = on_change
+        self.on_error = on_error
+        self.interval = interval
+        self._mtime = self._current_mtime()
+        self._lock = threading.Lock()  # 监视线程和手动调用check不会同时重新加载
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def _current_mtime(self):
+        return os.path.getmtime(self.path) if os.path.exists(self.path) else None
+
+    def check(self):
+        """检查一次文件是否修改，修改且有效时返回新配置"""
+        with self._lock:
+            try:
+                mtime = self._current_mtime()
+                if mtime == self._mtime:
+                    return None
+                self._mtime = mtime
+                config = load_config(self.path)
+            except (ConfigError, configparser.Error, UnicodeDecodeError, OSError) as e:
+                # 编辑器保存到一半、编码错误或文件被占用时保留原配置，下次修改后再加载
+                if self.on_error:
+                    self.on_error(e)
+                return None
+            self.on_change(config)
+            return config
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                print(f"检查配置文件失败: {e}")
@@ -0,0 +1,279 @@
+"""
+串口连接监控
+
+SerialSupervisor 在后台线程中保持串口常开并持续读取，把收到的数据按帧（一次测量的输出）排队。
+读取超时只表示仪器暂时没有输出；串口异常（拔线、设备消失）才视为断开，
+断开后按指数退避重连，设备重新出现（包括COM号变化）后自动恢复，检测流程无需人工干预。
+"""
+
+import collections
+import queue
+import threading
+import time
+
+from .acquisition import open_serial_port
+
+STATE_CONNECTING = "连接中"
+STATE_CONNECTED = "已连接"
+STATE_DISCONNECTED = "已断开"
+STATE_PAUSED = "已暂停"
+STATE_STOPPED = "已停止"
+
+
+class FrameSplitter:
+    """把串口字节流拆分为帧：每帧以Density行结束，调用方也可以在数据停顿时用flush结束当前帧"""
+
+    def __init__(self):
+        self._text = ""
+        self._lines = []
+
+    @property
+    def pending(self):
+        """是否有未结束的帧"""
+        return bool(self._lines or self._text.strip())
+
+    def feed(self, data):
+        """
+        追加收到的字节
+        :param data: bytes
+        :return: 已完整的帧列表
+        """
+        frames = []
+        self._text += data.decode("utf-8", errors="ignore")
+        *lines, self._text = self._text.split("\n")
+        for line in lines:
+            line = line.strip()
+            if line:
+                self._lines.append(line)
+                # 仪器每次测量以Density行结束
+                if "Density" in line:
+                    frames.append(self.flush())
+        return frames
+
+    def flush(self):
+        """结束当前帧（包括未换行的剩余数据），没有数据时返回None"""
+        tail = self._text.strip()
+        self._text = ""
+        if tail:
+            self._lines.append(tail)
+        if not self._lines:
+            return None
+        frame = "\n".join(self._lines) + "\n"
+        self._lines = []
+        return frame
+
+
+class SerialSupervisor:
+    """串口连接监控：常开读取、断线重连、速率和帧间隔统计"""
+
+    # 重连间隔（秒）
+    RECONNECT_MIN_DELAY = 0.5
+    RECONNECT_MAX_DELAY = 8.0
+    # 串口单次读取超时（秒），决定停止和切换参数的响应速度
+    POLL_TIMEOUT = 0.2
+    # 没有Density行时，数据停顿超过该时间（秒）视为一帧结束
+    FRAME_GAP = 0.3
+    # 速率统计窗口（秒）
+    RATE_WINDOW = 5.0
+    MAX_QUEUED_FRAMES = 100
+
+    def __init__(self, settings_provider, on_state=None, relocate=None, opener=open_serial_port,
+                 clock=time.monotonic):
+        """
+        :param settings_provider: 无参数函数，返回当前的串口参数（SerialSettings），每次连接前读取
+        :param on_state: 连接状态变化的回调 on_state(state, message)，在监控线程中调用
+        :param relocate: 重连失败时查找设备新位置的函数，返回 {"port": ...} 或None
+        :param opener: 打开串口的函数，参数同open_serial_port
+        :param clock: 单调时钟
+        """
+        self.settings_provider = settings_provider
+        self.on_state = on_state
+        self.relocate = relocate
+        self.opener = opener
+        self.clock = clock
+        self.state = STATE_DISCONNECTED
+        self.state_message = ""
+        self.port = None
+        self._frames = queue.Queue(self.MAX_QUEUED_FRAMES)
+        self._listeners = []
+        self._serial = None
+        self._opened_settings = None
+        self._port_override = None
+        self._stop = threading.Event()
+        self._paused = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._byte_samples = collections.deque()  # (时间, 字节数)
+        self._total_bytes = 0
+        self._last_frame_time = None
+        self._splitter = FrameSplitter()
+        self._last_data_time = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+        self._close()
+        self._set_state(STATE_STOPPED, "")
+
+    def pause(self):
+        """释放串口（例如自动检测串口时需要独占），resume后重新连接"""
+        self._paused.set()
+
+    def resume(self):
+        self._paused.clear()
+
+    def add_listener(self, listener):
+        """注册原始数据监听 listener(timestamp, data_bytes)，在监控线程中调用"""
+        self._listeners.append(listener)
+
+    def clear(self):
+        """丢弃已排队的帧，开始新的样品时调用，避免用到之前的测量"""
+        while True:
+            try:
+                self._frames.get_nowait()
+            except queue.Empty:
+                return
+
+    def read_frame(self, timeout=3):
+        """
+        等待下一帧数据
+        :param timeout: 最长等待时间（秒）
+        :return: 一帧原始数据字符串，超时或未连接时返回""
+        """
+        try:
+            return self._frames.get(timeout=timeout)
+        except queue.Empty:
+            return ""
+
+    def stats(self):
+        """
+        连接统计
+        :return: {"state", "port", "bytes_per_sec", "last_frame_age", "total_bytes"}
+        """
+        now = self.clock()
+        with self._lock:
+            self._trim_samples(now)
+            recent = sum(count for _, count in self._byte_samples)
+            last_frame_age = now - self._last_frame_time if self._last_frame_time is not None else None
+            return {
+                "state": self.state,
+                "port": self.port,
+                "bytes_per_sec": recent / self.RATE_WINDOW,
+                "last_frame_age": last_frame_age,
+                "total_bytes": self._total_bytes,
+            }
+
+    def _set_state(self, state, message):
+        if state == self.state and message == self.state_message:
+            return
+        self.state = state
+        self.state_message = message
+        if self.on_state:
+            self.on_state(state, message)
+
+    def _run(self):
+        delay = self.RECONNECT_MIN_DELAY
+        while not self._stop.is_set():
+            if self._paused.is_set():
+                self._close()
+                self._set_state(STATE_PAUSED, "串口已释放")
+                self._stop.wait(self.POLL_TIMEOUT)
+                continue
+
+            if self._serial is None:
+                if self._connect():
+                    delay = self.RECONNECT_MIN_DELAY
+                else:
+                    self._stop.wait(delay)
+                    delay = min(delay * 2, self.RECONNECT_MAX_DELAY)
+                continue
+
+            # 配置修改后用新参数重新打开串口
+            if self.settings_provider() != self._opened_settings:
+                self._close()
+                self._port_override = None
+                continue
+
+            try:
+                waiting = self._serial.in_waiting
+                data = self._serial.read(waiting if waiting > 0 else 1)
+            except Exception as e:
+                # 读取超时不会抛出异常，这里是串口断开或设备消失
+                self._close()
+                self._set_state(STATE_DISCONNECTED, f"串口断开: {e}")
+                continue
+
+            now = self.clock()
+            if data:
+                self._feed(now, data)
+            elif self._splitter.pending and now - self._last_data_time >= self.FRAME_GAP:
+                self._emit_frame(now, self._splitter.flush())
+
+    def _connect(self):
+        settings = self.settings_provider()
+        port = self._port_override or settings.port
+        self._set_state(STATE_CONNECTING, f"正在连接 {port}")
+        try:
+            self._serial = self.opener(port, settings.baudrate, settings.bytesize, settings.stopbits,
+                                       settings.parity, self.POLL_TIMEOUT)
+        except Exception as e:
+            self._serial = None
+            # 设备可能以新的COM号重新出现
+            if self.relocate is not None:
+                try:
+                    found = self.relocate()
+                except Exception:
+                    found = None
+                if found and found.get("port") and found["port"] != port:
+                    self._port_override = found["port"]
+            self._set_state(STATE_DISCONNECTED, f"无法打开 {port}: {e}")
+            return False
+        self._opened_settings = settings
+        self.port = port
+        self._splitter = FrameSplitter()
+        self._set_state(STATE_CONNECTED, f"已连接 {port}")
+        return True
+
+    def _close(self):
+        serial_port, self._serial = self._serial, None
+        if serial_port is not None:
+            try:
+                serial_port.close()
+            except Exception:
+                pass
+
+    def _trim_samples(self, now):
+        while self._byte_samples and now - self._byte_samples[0][0] > self.RATE_WINDOW:
+            self._byte_samples.popleft()
+
+    def _feed(self, now, data):
+        with self._lock:
+            self._byte_samples.append((now, len(data)))
+            self._total_bytes += len(data)
+            self._trim_samples(now)
+        for listener in self._listeners:
+            try:
+                listener(time.time(), data)
+            except Exception as e:
+                print(f"串口数据监听错误: {e}")
+
+        self._last_data_time = now
+        for frame in self._splitter.feed(data):
+            self._emit_frame(now, frame)
+
+    def _emit_frame(self, now, frame):
+        with self._lock:
+            self._last_frame_time = now
+        if self._frames.full():
+            try:
+                self._frames.get_nowait()
+            except queue.Empty:
+                pass
+        self._frames.put(frame)
@@ -0,0 +1,238 @@
+"""
+命令行检测流程
+"""
+
+from datetime import datetime
+
+from .acquisition import read_serial_data
+from .archive import ResultArchive
+from .config import AppConfig, ConfigError, load_config
+from .engine import DetectionEngine
+from .parsing import extract_density_value
+from .spec import load_spec_table
+from .summary import SummaryStore, format_report
+from .storage import (CsvSink, ExcelWriteWorker, read_product_models_from_excel,
+                      update_excel_with_test_results)
+
+
+def main():
+    # 读取配置文件（与图形界面共用同一个配置对象）
+    try:
+        config = load_config()
+    except ConfigError as e:
+        print(f"配置文件无效，使用默认配置: {e}")
+        config = AppConfig()
+    serial_settings = config.serial
+    
+    excel_filename = "density_data.xlsx"
+    csv_sink = CsvSink.from_settings(config.csv_log)
+    result_archive = ResultArchive.from_settings(config.archive)
+    spec_table = load_spec_table(config)
+    summaries = SummaryStore(judge=spec_table.judge)
+    writer = ExcelWriteWorker(on_done=lambda model, success: None if success else print(f"{model} 写入Excel失败"),
+                              write_mode=config.profile.write_mode, summaries=summaries)
+    
+    print("密度检测系统启动")
+    
+    try:
+        # 从Excel中读取所有产品型号
+        product_info_list = read_product_models_from_excel(excel_filename)
+        
+        if not product_info_list:
+            print("未从Excel文件中读取到产品型号，程序结束")
+            return
+        
+        print(f"\n从Excel文件中读取到 {len(product_info_list)} 个产品型号:")
+        for info in product_info_list:
+            print(f"- {info['产品型号']} (机台号: {info['机台号']})")
+        
+        # 采集循环与图形界面、HTTP服务相同（DetectionEngine），这里只负责提示和输出
+        progress = {"readings": 0}
+        
+        def before_reading():
+            # 等待用户准备好
+            if progress["readings"]:
+                input(f"第 {progress['readings']} 次测试完成，请准备下一次测试，按回车继续...")
+            else:
+                input("准备就绪后按回车开始测试...")
+            print(f"\n开始第 {progress['readings'] + 1} 次测试...")
+        
+        def on_event(event):
+            kind = event["type"]
+            if kind == "product_started":
+                progress["readings"] = event["resumed"]
+                print(f"\n=== 开始处理第 {event['index'] + 1}/{len(product_info_list)} 个产品: {event['product']} ===")
+                print(f"请放入 {event['product']} 型号的样块...")
+            elif kind == "raw":
+                print(f"读取到的原始数据:\n{event['data']}")
+            elif kind == "reading":
+                progress["readings"] = event["reading"]
+                if event["density"] is None:
+                    print(f"第 {event['reading']} 次测试失败，将使用None值")
+                elif event["in_spec"] is False:
+                    print(f"第 {event['reading']} 次测试 {event['density']} g/ccm 超出规格")
+            elif kind == "product_done":
+                # 显示测试结果
+                print("\n=== 测试结果 ===")
+                print(f"产品型号: {event['product']}")
+                for j, d in enumerate(event["densities"], 1):
+                    print(f"密度{j}: {d} g/ccm" if d is not None else f"密度{j}: 测试失败")
+                average = event["average"]
+                print(f"平均值: {average} g/ccm" if average is not None else "平均值: 无法计算")
+                if event["judgement"] is not None:
+                    print(f"判定: {event['judgement']}")
+                print("===============")
+            elif kind == "error":
+                print(f"程序运行出错: {event['message']}" if event.get("fatal") else event["message"])
+        
+        engine = DetectionEngine(
+            lambda: read_serial_data(
+                serial_settings.port,
+                baudrate=serial_settings.baudrate,
+                bytesize=serial_settings.bytesize,
+                stopbits=serial_settings.stopbits,
+                parity=serial_settings.parity,
+                timeout=serial_settings.timeout
+            ),
+            config,
+            writer,
+            on_event=on_event,
+            before_reading=before_reading,
+            archive=result_archive,
+            spec=spec_table,
+            csv_sink=csv_sink,
+            provenance=True,
+            log=print,
+        )
+        engine.start(product_info_list, excel_filename, background=False)
+        writer.wait_idle()
+        
+        print("\n所有产品型号测试完成！")
+        print("\n=== 班次、机台汇总 ===")
+        for line in format_report(summaries.report(excel_filename)):
+            print(line)
+        
+    except KeyboardInterrupt:
+        print("\n用户中断程序，退出测试系统")
+    except Exception as e:
+        print(f"程序运行出错: {e}")
+        import traceback
+        traceback.print_exc()
+    finally:
+        writer.close()
+        if csv_sink is not None:
+            csv_sink.close()
+        if result_archive is not None:
+            result_archive.close()
+
+
+# 测试用：模拟完整的测试流程
+def test_with_fixed_data():
+    """模拟从Excel读取产品型号并进行测试的完整流程"""
+    # 首先显示当前Excel文件内容
+    print("=== 测试前Excel文件内容 ===")
+    product_info_list = read_product_models_from_excel()
+    for info in product_info_list:
+        print(info)
+    
+    # 模拟测试数据
+    test_data_str = """Air          :    +   7.5262 g
+Liquid       :    +   1.8717 g
+Volume       :         5.663 ccm
+Density      :         1.329 g/ccm"""
+    
+    print("\n=== 开始模拟测试流程 ===")
+    
+    # 从Excel读取产品型号
+    product_info_list = read_product_models_from_excel()
+    
+    if not product_info_list:
+        print("未从Excel文件中读取到产品型号")
+        return
+    
+    print(f"从Excel文件中读取到 {len(product_info_list)} 个产品型号:")
+    for info in product_info_list:
+        print(f"- {info['产品型号']} (机台号: {info['机台号']})")
+    
+    # 模拟处理前3个产品型号
+    for i, product_info in enumerate(product_info_list[:3], 1):
+        product_model = product_info["产品型号"]
+        machine_id = product_info["机台号"]
+        sample_time = product_info["来样时间"]
+        shift = product_info["班次"]
+        
+        print(f"\n=== 模拟处理第 {i}/{len(product_info_list)} 个产品: {product_model} ===")
+        print(f"请放入 {product_model} 型号的样块...")
+        
+        # 模拟用户准备就绪
+        print("准备就绪后按回车开始测试... (模拟回车)")
+        
+        # 模拟5次密度测试
+        density_values = []
+        test_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        
+        for test_num in range(1, 6):
+            print(f"\n开始第 {test_num} 次测试...")
+            
+            # 模拟读取串口数据
+            print("读取到的原始数据:")
+            print(test_data_str)
+            
+            # 提取密度值
+            density = extract_density_value(test_data_str)
+            if density is not None:
+                print(f"第 {test_num} 次测试成功提取密度值: {density} g/ccm")
+                # 添加一些随机波动使数据更真实
+                import random
+                density_with_variation = density + (random.random() - 0.5) * 0.05
+                density_values.append(round(density_with_variation, 4))
+            else:
+                print(f"第 {test_num} 次测试失败")
+                density_values.append(None)
+            
+            # 模拟用户准备下一次测试
+            if test_num < 5:
+                print(f"第 {test_num} 次测试完成，请准备下一次测试，按回车继续... (模拟回车)")
+        
+        # 计算平均值
+        valid_densities = [d for d in density_values if d is not None]
+        average_density = sum(valid_densities) / len(valid_densities) if valid_densities else None
+        
+        # 准备测试数据
+        test_data = {
+            "来样时间": sample_time,
+            "测试时间": test_time,
+            "机台号": machine_id,
+            "产品型号": product_model,
+            "班次": shift,
+            "密度1": density_values[0],
+            "密度2": density_values[1],
+            "密度3": density_values[2],
+            "密度4": density_values[3],
+            "密度5": density_values[4],
+            "平均值": round(average_density, 4) if average_density is not None else None
+        }
+        
+        # 更新Excel文件
+        update_excel_with_test_results("density_data.xlsx", product_model, test_data)
+        
+        # 显示测试结果
+        print("\n=== 测试结果 ===")
+        print(f"产品型号: {product_model}")
+        for j, d in enumerate(density_values, 1):
+            print(f"密度{j}: {d} g/ccm" if d is not None else f"密度{j}: 测试失败")
+        print(f"平均值: {test_data['平均值']} g/ccm" if test_data['平均值'] is not None else "平均值: 无法计算")
+        print("===============")
+    
+    # 显示测试后Excel文件内容
+    print("\n=== 测试后Excel文件内容 ===")
+    from openpyxl import load_workbook
+    wb = load_workbook("density_data.xlsx")
+    ws = wb.active
+    print("表头:", [cell.value for cell in ws[1]])
+    print("数据行:")
+    for row in ws.iter_rows(min_row=2, max_row=5, values_only=True):
+        print(row)
+    wb.close()
+    
+    print("\n测试流程模拟完成！")
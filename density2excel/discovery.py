@@ -0,0 +1,173 @@
+"""
+串口自动发现与通信格式自动识别
+
+枚举本机串口，按常见的波特率/数据位/校验位组合试读，
+能解析出Density记录的组合即为仪器的通信格式。
+识别结果按USB的VID/PID/序列号缓存，转接器重新插拔后COM号变化也能直接找到。
+"""
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .acquisition import read_serial_data
+from .parsing import extract_density_value
+
+PORT_CACHE_FILE = "port_cache.json"
+
+# 常见的波特率和（数据位, 校验位）组合，按出现频率排序
+PROBE_BAUDRATES = (9600, 19200, 4800, 38400, 57600, 115200, 2400)
+PROBE_FRAMES = ((7, "NONE"), (8, "NONE"), (7, "EVEN"), (7, "ODD"), (8, "EVEN"), (8, "ODD"))
+
+# 合理的密度范围（g/ccm），用于排除错误波特率下碰巧解析出的数值
+MIN_DENSITY = 0.05
+MAX_DENSITY = 25.0
+
+_cache_lock = threading.Lock()
+
+
+def list_serial_ports():
+    """
+    枚举本机串口
+    :return: 串口信息列表，每项包含 device、description、vid、pid、serial_number
+    """
+    from serial.tools import list_ports
+
+    ports = []
+    for info in list_ports.comports():
+        ports.append({
+            "device": info.device,
+            "description": info.description or "",
+            "vid": info.vid,
+            "pid": info.pid,
+            "serial_number": info.serial_number,
+        })
+    return ports
+
+
+def device_key(port_info):
+    """
+    USB设备的唯一标识 "VID:PID:序列号"，非USB串口返回None
+    :param port_info: list_serial_ports返回的串口信息
+    """
+    if port_info.get("vid") is None or port_info.get("pid") is None:
+        return None
+    return f"{port_info['vid']:04X}:{port_info['pid']:04X}:{port_info.get('serial_number') or ''}"
+
+
+def probe_formats():
+    """所有待试的 (波特率, 数据位, 校验位) 组合"""
+    return [(baudrate, bytesize, parity) for baudrate in PROBE_BAUDRATES for bytesize, parity in PROBE_FRAMES]
+
+
+def is_valid_density_record(raw_data):
+    """原始数据中是否有合理的Density记录（严格匹配，不取任意浮点数）"""
+    if not raw_data:
+        return False
+    density = extract_density_value(raw_data, "strict")
+    return density is not None and MIN_DENSITY <= density <= MAX_DENSITY
+
+
+def probe_port(device, formats=None, timeout=1.5, reader=read_serial_data, should_continue=None):
+    """
+    在一个串口上依次试读各通信格式（同一串口不能同时打开，只能顺序试）
+    :param device: 串口名称
+    :param formats: (波特率, 数据位, 校验位) 列表，默认probe_formats()
+    :param timeout: 每种格式的读取时间（秒）
+    :param reader: 读取函数，参数同read_serial_data
+    :param should_continue: 无参数函数，返回False时放弃（其它串口已找到仪器）
+    :return: 识别出的 {"port", "baudrate", "bytesize", "parity", "stopbits"}，失败返回None
+    """
+    for baudrate, bytesize, parity in formats or probe_formats():
+        if should_continue is not None and not should_continue():
+            return None
+        raw_data = reader(device, baudrate=baudrate, bytesize=bytesize, stopbits=1, parity=parity, timeout=timeout)
+        if is_valid_density_record(raw_data):
+            return {"port": device, "baudrate": baudrate, "bytesize": bytesize, "parity": parity, "stopbits": 1}
+    return None
+
+
+def load_port_cache(cache_file=PORT_CACHE_FILE):
+    """读取识别结果缓存 {设备标识: 通信格式}"""
+    with _cache_lock:
+        if not os.path.exists(cache_file):
+            return {}
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+            return cache if isinstance(cache, dict) else {}
+        except Exception as e:
+            print(f"读取串口缓存错误: {e}")
+            return {}
+
+
+def save_port_cache(key, settings, cache_file=PORT_CACHE_FILE):
+    """记录一个设备的识别结果"""
+    cache = load_port_cache(cache_file)
+    cache[key] = dict(settings)
+    with _cache_lock:
+        try:
+            with open(cache_file, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"保存串口缓存错误: {e}")
+
+
+def find_cached_port(ports=None, cache_file=PORT_CACHE_FILE):
+    """
+    在当前串口中查找缓存过的仪器，COM号变化时返回新的串口名称
+    :param ports: list_serial_ports的结果，为None时重新枚举
+    :param cache_file: 缓存文件
+    :return: 通信格式字典（port为当前串口名称），未找到返回None
+    """
+    cache = load_port_cache(cache_file)
+    if not cache:
+        return None
+    for port_info in ports if ports is not None else list_serial_ports():
+        key = device_key(port_info)
+        if key and key in cache:
+            settings = dict(cache[key])
+            settings["port"] = port_info["device"]
+            return settings
+    return None
+
+
+def autodetect_serial(ports=None, formats=None, timeout=1.5, reader=read_serial_data,
+                      cache_file=PORT_CACHE_FILE, use_cache=True):
+    """
+    自动识别仪器所在的串口和通信格式
+    先查缓存；没有命中时各串口并行试读，任一串口识别成功后其它串口停止
+    :param ports: list_serial_ports的结果，为None时重新枚举
+    :param formats: 待试的通信格式
+    :param timeout: 每种格式的读取时间（秒）
+    :param reader: 读取函数，参数同read_serial_data
+    :param cache_file: 缓存文件
+    :param use_cache: 是否先查缓存
+    :return: 通信格式字典，未识别返回None
+    """
+    if ports is None:
+        ports = list_serial_ports()
+    if use_cache:
+        cached = find_cached_port(ports, cache_file)
+        if cached:
+            return cached
+    if not ports:
+        return None
+
+    found = threading.Event()
+
+    def probe(port_info):
+        result = probe_port(port_info["device"], formats, timeout, reader, should_continue=lambda: not found.is_set())
+        if result:
+            found.set()
+        return port_info, result
+
+    with ThreadPoolExecutor(max_workers=len(ports)) as executor:
+        for port_info, result in executor.map(probe, ports):
+            if result:
+                key = device_key(port_info)
+                if key:
+                    save_port_cache(key, result, cache_file)
+                return result
+    return None
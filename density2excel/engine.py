@@ -0,0 +1,232 @@
+"""
+无界面检测引擎
+
+按产品列表依次采集读数、计算平均值并交给回写线程，供HTTP服务和测试使用。
+采集、等待和时间都通过参数传入（read_raw、sleep、now），可以接串口连接监控、录制文件回放或内存中的模拟数据。
+进度以事件字典通过on_event报告，例如 {"type": "reading", "product": ..., "reading": 1, "density": 1.329}。
+图形界面、命令行和HTTP服务都通过这里采集：每个读数写入CSV日志，每个产品的原始数据写入读数记录，
+停止时中断的读数不计入、不记录，继续时沿用原来的检测时间。
+"""
+
+import threading
+import time
+from datetime import datetime
+
+from .acquisition import read_density
+from .config import AppConfig
+from .provenance import append_provenance, build_reading_provenance
+from .spec import JUDGEMENT_KEY
+from .storage import build_detect_data
+
+STATE_IDLE = "idle"
+STATE_RUNNING = "running"
+STATE_STOPPING = "stopping"
+
+
+class DetectionEngine:
+    """检测引擎：一次运行（run）处理一批产品，可以随时停止并从断点继续"""
+
+    def __init__(self, read_raw, config=None, writer=None, on_event=None, sleep=time.sleep, now=datetime.now,
+                 before_reading=None, archive=None, spec=None, csv_sink=None, provenance=False, log=None):
+        """
+        :param read_raw: 无参数函数，返回一帧原始数据（超时返回""）
+        :param config: AppConfig，为None时使用默认配置
+        :param writer: ExcelWriteWorker，为None时只报告结果不写Excel
+        :param on_event: 事件回调 on_event(event)，在引擎线程中调用
+        :param sleep: 重试等待函数
+        :param now: 返回当前时间（datetime）的函数
+        :param before_reading: 每次读数开始前调用的函数，例如SerialSupervisor.clear丢弃之前的数据
+        :param archive: ResultArchive，每个产品的结果追加到二进制归档
+        :param spec: SpecTable，每个读数和产品按规格判定（事件中的in_spec、judgement）
+        :param csv_sink: CsvSink，每个读数追加一行到CSV日志
+        :param provenance: 为True时每个产品的原始数据、尝试次数和耗时追加到工作簿旁的读数记录
+        :param log: 日志函数 log(message)，报告每次尝试读取的结果
+        """
+        self.read_raw = read_raw
+        self.config = config or AppConfig()
+        self.writer = writer
+        self.on_event = on_event
+        self.sleep = sleep
+        self.now = now
+        self.before_reading = before_reading
+        self.archive = archive
+        self.spec = spec
+        self.csv_sink = csv_sink
+        self.provenance = provenance
+        self.log = log
+        self.deferred = False  # 为True时结果只写入回写线程缓存的工作簿，等submit_flush时统一保存（批量队列）
+        self.state = STATE_IDLE
+        self.products = []
+        self.current_index = None
+        self.partial = []  # 停止时当前产品已采集的读数，用于继续
+        self.partial_time = None  # 停止时当前产品的检测时间，继续时沿用
+        self._partial_readings = []  # 停止时当前产品已采集读数的来源记录
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self.state != STATE_IDLE
+
+    def start(self, products, excel_filename=None, start_index=0, auto=True, resume_values=None, background=True,
+              resume_time=None):
+        """
+        开始一次运行
+        :param products: 产品列表（ProductRecord或含中文键的字典）
+        :param excel_filename: 结果写入的工作簿，产品自带"Excel文件"时以产品为准
+        :param start_index: 从第几个产品开始
+        :param auto: True时依次处理后续全部产品，False时只处理start_index一个产品
+        :param resume_values: 第一个产品已采集的读数（从断点继续时）
+        :param background: 在后台线程中运行，False时在当前线程中运行完再返回
+        :param resume_time: 第一个产品的检测时间（从断点继续时），为None时取当前时间
+        :raises RuntimeError: 已有运行未结束
+        """
+        with self._lock:
+            if self.running:
+                raise RuntimeError("检测正在进行")
+            self.state = STATE_RUNNING
+            self.products = list(products)
+            self._stop.clear()
+        args = (excel_filename, start_index, auto, list(resume_values or []), resume_time)
+        if not background:
+            self._run(*args)
+            return
+        self._thread = threading.Thread(target=self._run, args=args, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """请求停止，当前读数结束后停止，已采集的读数保存在partial中"""
+        with self._lock:
+            if self.state == STATE_RUNNING:
+                self.state = STATE_STOPPING
+                self._stop.set()
+
+    def wait(self, timeout=None):
+        """等待运行结束，返回是否已结束"""
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return not self.running
+
+    def resume(self, excel_filename=None, auto=True, background=True):
+        """从上次停止的产品和读数继续"""
+        if self.current_index is None:
+            raise RuntimeError("没有可以继续的运行")
+        self.start(self.products, excel_filename, self.current_index, auto, self.partial, background,
+                   resume_time=self.partial_time)
+
+    def _emit(self, event_type, **fields):
+        if self.on_event:
+            try:
+                self.on_event(dict(type=event_type, **fields))
+            except Exception as e:
+                print(f"检测事件处理错误: {e}")
+
+    def _record_reading(self, product, detect_num, density):
+        if self.csv_sink is None:
+            return
+        try:
+            self.csv_sink.write(product, detect_num, density, self.now())
+        except OSError as e:
+            self._emit("error", message=f"写入CSV日志失败: {e}")
+
+    def _run(self, excel_filename, start_index, auto, resume_values, resume_time):
+        profile = self.config.profile
+        end_index = len(self.products) if auto else min(start_index + 1, len(self.products))
+        completed = 0
+        self._emit("run_started", start=start_index, total=end_index - start_index)
+        try:
+            for index in range(start_index, end_index):
+                product = self.products[index]
+                model = product["产品型号"]
+                self.current_index = index
+                first = index == start_index
+                density_values = list(resume_values) if first else []
+                detect_time = resume_time if first and resume_time else self.now().strftime("%Y-%m-%d %H:%M:%S")
+                self.partial = list(density_values)
+                self.partial_time = detect_time
+                # 同一引擎停止后继续时接上已采集读数的来源记录（从断点文件恢复时只有之后的读数）
+                readings = []
+                if first and [reading["density"] for reading in self._partial_readings] == density_values:
+                    readings = list(self._partial_readings)
+                self._emit("product_started", index=index, product=model, machine=product.get("机台号"),
+                           resumed=len(density_values), values=list(density_values), detect_time=detect_time)
+
+                for detect_num in range(len(density_values) + 1, profile.readings_per_sample + 1):
+                    if self._stop.is_set():
+                        break
+                    if self.before_reading:
+                        self.before_reading()
+                    started = self.now()
+                    raw_frames = []
+
+                    def on_raw(raw_data):
+                        raw_frames.append(raw_data)
+                        self._emit("raw", index=index, data=raw_data)
+
+                    density, attempts = read_density(
+                        self.read_raw,
+                        self.config.serial.max_attempts,
+                        detect_num,
+                        parser_profile=profile.parser_profile,
+                        should_continue=lambda: not self._stop.is_set(),
+                        log=self.log,
+                        on_raw=on_raw,
+                        sleep=self.sleep,
+                    )
+                    if self._stop.is_set() and density is None:
+                        # 停止时中断的读数不计入也不记录，继续时重新读取
+                        break
+                    latency = (self.now() - started).total_seconds()
+                    readings.append(build_reading_provenance(detect_num, density, attempts, latency, raw_frames))
+                    self._record_reading(product, detect_num, density)
+                    density_values.append(density)
+                    self.partial = list(density_values)
+                    self._partial_readings = list(readings)
+                    self._emit("reading", index=index, product=model, machine=product.get("机台号"),
+                               reading=detect_num, density=density, attempts=attempts, latency=latency,
+                               in_spec=self.spec.check_reading(model, density) if self.spec else None,
+                               values=list(density_values), detect_time=detect_time)
+
+                if self._stop.is_set():
+                    break
+
+                detect_data = build_detect_data(product, detect_time, density_values, spec=self.spec)
+                filename = product.get("Excel文件") or excel_filename
+                if self.writer is not None and filename:
+                    self.writer.submit(filename, model, detect_data, sheet_name=product.get("工作表"),
+                                       deferred=self.deferred, row=product.get("行号"))
+                if self.provenance and filename:
+                    try:
+                        append_provenance(filename, product, detect_time, readings)
+                    except Exception as e:
+                        self._emit("error", message=f"保存读数记录失败: {e}")
+                if self.archive is not None:
+                    try:
+                        self.archive.append(detect_data)
+                    except OSError as e:
+                        self._emit("error", message=f"写入结果归档失败: {e}")
+                completed += 1
+                self.partial = []
+                self.partial_time = None
+                self._partial_readings = []
+                self._emit("product_done", index=index, product=model, average=detect_data["平均值"],
+                           densities=density_values, judgement=detect_data.get(JUDGEMENT_KEY))
+        except Exception as e:
+            # 采集过程出错，本次运行结束（写CSV、归档等失败只报告，不结束运行）
+            self._emit("error", message=str(e), fatal=True)
+        finally:
+            if self.csv_sink is not None:
+                # 运行结束时刷新，空闲时不会有读数留在缓冲中
+                try:
+                    self.csv_sink.flush()
+                except OSError as e:
+                    self._emit("error", message=f"写入CSV日志失败: {e}")
+            stopped = self._stop.is_set()
+            if not stopped:
+                self.current_index = None
+            with self._lock:
+                self.state = STATE_IDLE
+            self._emit("run_stopped" if stopped else "run_finished", completed=completed,
+                       index=self.current_index, partial=list(self.partial))
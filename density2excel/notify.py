@@ -0,0 +1,64 @@
+"""
+界面内的非模态提示
+
+检测完成、出错等消息显示在窗口底部的提示区，几秒后自动消失（点击可提前关闭），
+不需要操作员确认，无人值守时检测流程不会停在对话框上。可选响铃提醒。
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+LEVEL_COLORS = {
+    "info": ("#e5f1ff", "#004a99"),
+    "success": ("#e3f9e5", "#1b7a2b"),
+    "warning": ("#fff4e0", "#8a5300"),
+    "error": ("#ffe5e5", "#b00020"),
+}
+
+
+def beep(widget, level="info"):
+    """响铃：Windows上使用系统提示音，其它系统使用Tk的bell"""
+    try:
+        import winsound
+        winsound.MessageBeep(winsound.MB_ICONHAND if level == "error" else winsound.MB_OK)
+    except ImportError:
+        widget.bell()
+
+
+class NotificationArea(ttk.Frame):
+    """提示区：新的提示显示在最上面，最多同时显示max_visible条"""
+
+    def __init__(self, parent, max_visible=3):
+        super().__init__(parent)
+        self.max_visible = max_visible
+        self._toasts = []
+
+    def show(self, message, level="info", duration=5.0):
+        """
+        显示一条提示
+        :param message: 提示内容
+        :param level: info/success/warning/error，决定颜色
+        :param duration: 显示的秒数
+        """
+        background, foreground = LEVEL_COLORS.get(level, LEVEL_COLORS["info"])
+        toast = tk.Label(self, text=message, background=background, foreground=foreground, anchor=tk.W,
+                         padx=10, pady=4, font=("Segoe UI", 10))
+        if self._toasts:
+            toast.pack(fill=tk.X, pady=1, before=self._toasts[-1])
+        else:
+            toast.pack(fill=tk.X, pady=1)
+        toast.bind("<Button-1>", lambda event: self.dismiss(toast))
+        self._toasts.append(toast)
+        while len(self._toasts) > self.max_visible:
+            self.dismiss(self._toasts[0])
+        self.after(int(duration * 1000), self.dismiss, toast)
+        return toast
+
+    def dismiss(self, toast):
+        if toast in self._toasts:
+            self._toasts.remove(toast)
+            toast.destroy()
+
+    def clear(self):
+        for toast in list(self._toasts):
+            self.dismiss(toast)
@@ -0,0 +1,44 @@
+"""
+串口原始数据解析
+"""
+
+import re
+
+# 解析方案：
+# default - 优先匹配 "Density : 1.329"，找不到时取第一个浮点数
+# strict  - 只接受 "Density : 1.329"，避免把重量、体积等数值误当成密度
+PARSER_PROFILES = ("default", "strict")
+
+
+def extract_density_value(data, profile="default"):
+    """
+    从串口数据中提取密度值（如1.329）
+    :param data: 串口读取的原始数据字符串
+    :param profile: 解析方案，见PARSER_PROFILES
+    :return: 提取到的密度值（浮点数），提取失败返回None
+    """
+    # 使用更灵活的正则表达式匹配密度值
+    # 匹配 "Density" 或 "density" 后跟冒号和数值
+    pattern = r'[Dd]ensity\s*:\s*(\d+\.\d+)\s*'
+    match = re.search(pattern, data)
+
+    if match:
+        try:
+            density_value = float(match.group(1))
+            return density_value
+        except ValueError:
+            print("密度值转换为浮点数失败")
+            return None
+    elif profile != "strict":
+        # 如果未找到Density关键字，尝试直接提取所有浮点数
+        number_pattern = r'(\d+\.\d+)'
+        numbers = re.findall(number_pattern, data)
+        if numbers:
+            try:
+                # 返回第一个匹配的浮点数
+                return float(numbers[0])
+            except ValueError:
+                print("密度值转换为浮点数失败")
+                return None
+    print("未找到密度值")
+    return None
@@ -0,0 +1,111 @@
+"""
+读数来源记录（审计用）
+
+Excel中只保存五个读数和平均值，每个读数的原始数据、尝试次数、耗时和时间保存在工作簿旁的
+<工作簿>.provenance.jsonl.gz 中，按 (工作表, 行号, 产品型号) 查找。
+每个产品追加一个gzip成员（gzip允许多个成员首尾相接），不改写已有内容，也不影响Excel回写。
+"""
+
+import gzip
+import json
+import os
+import threading
+import zlib
+from datetime import datetime
+
+_lock = threading.Lock()
+
+
+def provenance_filename(excel_filename):
+    """工作簿对应的读数记录文件"""
+    return os.path.abspath(excel_filename) + ".provenance.jsonl.gz"
+
+
+def build_reading_provenance(reading_index, density, attempts, latency, raw_frames):
+    """
+    一次读数的来源记录
+    :param reading_index: 第几次读数（1~5）
+    :param density: 密度值，失败为None
+    :param attempts: read_density的尝试次数
+    :param latency: 从开始读取到得到结果的耗时（秒）
+    :param raw_frames: 本次读数收到的全部原始数据
+    """
+    return {
+        "reading": reading_index,
+        "time": datetime.now().isoformat(timespec="milliseconds"),
+        "density": density,
+        "attempts": attempts,
+        "latency": round(latency, 3),
+        "raw": list(raw_frames),
+    }
+
+
+def append_provenance(excel_filename, product_info, detect_time, readings):
+    """
+    追加一个产品的读数记录
+    :param excel_filename: 工作簿文件
+    :param product_info: 产品信息（产品型号、行号、工作表）
+    :param detect_time: 检测时间
+    :param readings: build_reading_provenance的结果列表
+    """
+    record = {
+        "sheet": product_info.get("工作表"),
+        "row": product_info.get("行号"),
+        "model": product_info.get("产品型号"),
+        "detect_time": detect_time,
+        "readings": readings,
+    }
+    data = gzip.compress((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+    with _lock:
+        with open(provenance_filename(excel_filename), "ab") as f:
+            f.write(data)
+
+
+def read_provenance(excel_filename, sheet_name=None, row=None, product_model=None):
+    """
+    读取读数记录，按条件筛选（为None的条件不筛选），同一产品多次检测时按时间顺序全部返回
+    :return: 产品记录列表，每项包含 sheet、row、model、detect_time、readings
+    """
+    filename = provenance_filename(excel_filename)
+    if not os.path.exists(filename):
+        return []
+    records = []
+    with _lock:
+        try:
+            with gzip.open(filename, "rt", encoding="utf-8") as f:
+                lines = list(f)
+        except (OSError, EOFError) as e:
+            # 最后一个成员写了一半（例如断电）时保留已读出的内容
+            print(f"读数记录文件不完整: {e}")
+            lines = _read_complete_members(filename)
+    for line in lines:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if sheet_name is not None and record.get("sheet") not in (None, sheet_name):
+            continue
+        if row is not None and record.get("row") != row:
+            continue
+        if product_model is not None and record.get("model") != product_model:
+            continue
+        records.append(record)
+    return records
+
+
+def _read_complete_members(filename):
+    """逐个解压gzip成员，遇到损坏的成员停止"""
+    with open(filename, "rb") as f:
+        data = f.read()
+    lines = []
+    while data:
+        decompressor = zlib.decompressobj(16 + 15)
+        try:
+            text = decompressor.decompress(data)
+        except Exception:
+            break
+        if not decompressor.eof:
+            break
+        lines.extend(text.decode("utf-8", errors="ignore").splitlines())
+        data = decompressor.unused_data
+    return lines
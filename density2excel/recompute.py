@@ -0,0 +1,179 @@
+"""
+历史工作簿批量重算
+
+公差或异常值规则修改后，重新计算归档工作簿中的平均值（K列）和统计数据。
+给出规格表时按重算后的读数和平均值重新判定L列（与回写时使用同一个SpecTable），
+否则L列的判定保持原样，平均值变化的行可能与原判定不一致。
+各工作簿分配到多个进程并行处理：每个进程以只读流式方式读取，以只写方式输出重算后的副本，
+主进程合并各文件的统计结果，耗时随CPU核数缩短而不是逐个文件累加。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from .spec import JUDGEMENT_KEY
+from .stats import RunningStats, average_density, within_limits
+
+MODEL_INDEX = 3  # D列：产品型号
+DENSITY_COLUMNS = slice(5, 10)  # F~J列：密度1~密度5
+AVERAGE_INDEX = 10  # K列：平均值
+JUDGEMENT_INDEX = 11  # L列：规格判定
+
+
+def find_workbooks(paths):
+    """
+    展开命令行给出的文件和目录（目录中的*.xlsx，不递归），跳过Excel的临时文件
+    :param paths: 文件或目录列表
+    :return: 去重后的工作簿路径列表
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            candidates = sorted(os.path.join(path, name) for name in os.listdir(path))
+        else:
+            candidates = [path]
+        for filename in candidates:
+            name = os.path.basename(filename)
+            if not name.lower().endswith(".xlsx") or name.startswith(("~$", ".")):
+                continue
+            if filename not in filenames:
+                filenames.append(filename)
+    return filenames
+
+
+def _to_float(value):
+    if value is None or value == "":
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def recompute_workbook(filename, output_dir=None, low=None, high=None, spec=None):
+    """
+    重算一个工作簿中所有工作表的平均值（在工作进程中运行）
+    :param filename: 工作簿
+    :param output_dir: 输出目录，为None时只统计不输出
+    :param low: 读数下限，超出范围的读数不计入平均值
+    :param high: 读数上限
+    :param spec: SpecTable，有读数且有规格的行重新判定L列；为None时L列保持原样
+    :return: 统计结果 {"file", "rows", "measured", "changed", "rejudged", "averages", "readings", "output"}，
+             出错时为 {"file", "error"}
+    """
+    from openpyxl import Workbook, load_workbook
+
+    summary = {"file": filename, "rows": 0, "measured": 0, "changed": 0, "rejudged": 0,
+               "averages": RunningStats(), "readings": RunningStats(), "output": None}
+    source = None
+    try:
+        source = load_workbook(filename, read_only=True)
+        target = Workbook(write_only=True) if output_dir else None
+        for sheet in source.worksheets:
+            out_sheet = target.create_sheet(sheet.title) if target is not None else None
+            for row_number, row in enumerate(sheet.iter_rows(values_only=True), 1):
+                if row_number == 1:
+                    header = list(row)
+                    if spec is not None:
+                        # 与回写相同：L列表头为空时补上“判定”
+                        header.extend([None] * (JUDGEMENT_INDEX + 1 - len(header)))
+                        if header[JUDGEMENT_INDEX] in (None, ""):
+                            header[JUDGEMENT_INDEX] = JUDGEMENT_KEY
+                    if out_sheet is not None:
+                        out_sheet.append(header)
+                    continue
+                values = list(row)
+                if len(values) <= AVERAGE_INDEX:
+                    values.extend([None] * (AVERAGE_INDEX + 1 - len(values)))
+                if not any(value not in (None, "") for value in values):
+                    if out_sheet is not None:
+                        out_sheet.append(values)
+                    continue
+                summary["rows"] += 1
+
+                densities = within_limits([_to_float(value) for value in values[DENSITY_COLUMNS]], low, high)
+                average = average_density(densities)
+                average = round(average, 4) if average is not None else None
+                old_average = _to_float(values[AVERAGE_INDEX])
+                if any(d is not None for d in densities):
+                    summary["measured"] += 1
+                    for density in densities:
+                        if density is not None:
+                            summary["readings"].add(density)
+                if average is not None:
+                    summary["averages"].add(average)
+                if (average is None) != (old_average is None) or (
+                        average is not None and abs(average - old_average) > 1e-9):
+                    summary["changed"] += 1
+                values[AVERAGE_INDEX] = average
+                if spec is not None and any(d is not None for d in densities) and values[MODEL_INDEX] is not None:
+                    judgement = spec.judge(values[MODEL_INDEX], densities, average)
+                    if judgement is not None:
+                        values.extend([None] * (JUDGEMENT_INDEX + 1 - len(values)))
+                        if values[JUDGEMENT_INDEX] != judgement:
+                            summary["rejudged"] += 1
+                        values[JUDGEMENT_INDEX] = judgement
+                if out_sheet is not None:
+                    out_sheet.append(values)
+        if target is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            output = os.path.join(output_dir, os.path.basename(filename))
+            target.save(output)
+            summary["output"] = output
+        return summary
+    except Exception as e:
+        return {"file": filename, "error": str(e)}
+    finally:
+        if source is not None:
+            source.close()
+
+
+def merge_summaries(summaries):
+    """
+    合并各文件的统计结果（出错的文件只计数）
+    :return: {"files", "failed", "rows", "measured", "changed", "rejudged", "averages", "readings"}
+    """
+    merged = {"files": 0, "failed": 0, "rows": 0, "measured": 0, "changed": 0, "rejudged": 0,
+              "averages": RunningStats(), "readings": RunningStats()}
+    for summary in summaries:
+        merged["files"] += 1
+        if "error" in summary:
+            merged["failed"] += 1
+            continue
+        for key in ("rows", "measured", "changed", "rejudged"):
+            merged[key] += summary[key]
+        merged["averages"].merge(summary["averages"])
+        merged["readings"].merge(summary["readings"])
+    return merged
+
+
+def recompute_workbooks(filenames, output_dir=None, low=None, high=None, workers=None, on_result=None, spec=None):
+    """
+    多进程批量重算
+    :param filenames: 工作簿列表
+    :param output_dir: 输出目录，为None时只统计
+    :param low: 读数下限
+    :param high: 读数上限
+    :param workers: 进程数，默认CPU核数
+    :param on_result: 每完成一个文件的回调 on_result(summary)，按完成顺序调用
+    :param spec: SpecTable，重新判定L列；为None时L列保持原样
+    :return: (合并后的统计, 按输入顺序排列的各文件统计)
+    """
+    if not filenames:
+        return merge_summaries([]), []
+    if output_dir:
+        names = [os.path.basename(filename) for filename in filenames]
+        if len(set(names)) != len(names):
+            raise ValueError("不同目录中有同名工作簿，输出时会互相覆盖")
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(recompute_workbook, filename, output_dir, low, high, spec): filename
+                   for filename in filenames}
+        for future in as_completed(futures):
+            summary = future.result()
+            results[futures[future]] = summary
+            if on_result:
+                on_result(summary)
+    summaries = [results[filename] for filename in filenames]
+    return merge_summaries(summaries), summaries
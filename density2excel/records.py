@@ -0,0 +1,227 @@
+"""
+产品和检测记录
+
+大工作表（十万行级）的产品列表和检测历史常驻内存，用__slots__记录代替字典，
+机台号、班次、产品型号等重复出现的字符串经过sys.intern共享同一个对象。
+记录支持按原来的中文键读写（record["产品型号"]），原有代码不需要修改；
+写入Excel和JSON旁路文件时才用to_dict/to_detect_data转换为字典。
+"""
+
+import sys
+
+DENSITY_KEYS = ("密度1", "密度2", "密度3", "密度4", "密度5")
+
+
+def intern_text(value):
+    """字符串经过intern后返回，其它值原样返回"""
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class _Record:
+    """按中文键访问__slots__属性的基类，子类定义KEYS {中文键: 属性名}"""
+
+    __slots__ = ()
+    KEYS = {}
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, self.KEYS[key])
+        except KeyError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, self.KEYS[key], value)
+
+    def __contains__(self, key):
+        return key in self.KEYS
+
+    def get(self, key, default=None):
+        return getattr(self, self.KEYS[key]) if key in self.KEYS else default
+
+    def keys(self):
+        return self.KEYS.keys()
+
+    def to_dict(self):
+        return {key: getattr(self, name) for key, name in self.KEYS.items()}
+
+    def __eq__(self, other):
+        if isinstance(other, dict):
+            return self.to_dict() == other
+        if isinstance(other, type(self)):
+            return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class ProductRecord(_Record):
+    """工作表中待检测的一个产品（一行）"""
+
+    __slots__ = ("arrival_time", "machine", "model", "shift", "row", "completed", "filename", "sheet")
+    KEYS = {
+        "来样时间": "arrival_time",
+        "机台号": "machine",
+        "产品型号": "model",
+        "班次": "shift",
+        "行号": "row",
+        "已完成": "completed",
+        "Excel文件": "filename",
+        "工作表": "sheet",
+    }
+
+    def __init__(self, arrival_time="", machine="", model="", shift="", row=None, completed=False,
+                 filename=None, sheet=None):
+        self.arrival_time = arrival_time
+        self.machine = intern_text(machine)
+        self.model = intern_text(model)
+        self.shift = intern_text(shift)
+        self.row = row
+        self.completed = completed
+        self.filename = filename
+        self.sheet = sheet
+
+    @classmethod
+    def from_row(cls, row, row_number, filename=None, sheet=None):
+        """
+        从工作表一行（A~K列的值）创建，没有产品型号（D列）时返回None
+        :param row: iter_rows(values_only=True)得到的一行
+        :param row_number: 行号
+        """
+        if not row[3] or not str(row[3]).strip():
+            return None
+        return cls(
+            arrival_time=row[0] if row[0] else "",
+            machine=row[2] if row[2] else "",
+            model=str(row[3]).strip(),
+            shift=row[4] if row[4] else "",
+            row=row_number,
+            completed=len(row) > 10 and row[1] not in (None, "") and row[10] not in (None, ""),
+            filename=filename,
+            sheet=sheet,
+        )
+
+
+class DetectionRecord(_Record):
+    """一个产品的检测结果（一行的A~K列），五个读数保存为元组"""
+
+    __slots__ = ("arrival_time", "detect_time", "machine", "model", "shift", "densities", "average", "row")
+    KEYS = {
+        "来样时间": "arrival_time",
+        "检测时间": "detect_time",
+        "机台号": "machine",
+        "产品型号": "model",
+        "班次": "shift",
+        "平均值": "average",
+        "行号": "row",
+    }
+
+    def __init__(self, arrival_time="", detect_time=None, machine="", model="", shift="", densities=(),
+                 average=None, row=None):
+        self.arrival_time = arrival_time
+        self.detect_time = detect_time
+        self.machine = intern_text(machine)
+        self.model = intern_text(model)
+        self.shift = intern_text(shift)
+        self.densities = tuple(densities)
+        self.average = average
+        self.row = row
+
+    def __getitem__(self, key):
+        if key in DENSITY_KEYS:
+            index = DENSITY_KEYS.index(key)
+            return self.densities[index] if index < len(self.densities) else None
+        return super().__getitem__(key)
+
+    def __contains__(self, key):
+        return key in DENSITY_KEYS or key in self.KEYS
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def keys(self):
+        return [*self.KEYS.keys(), *DENSITY_KEYS]
+
+    def to_dict(self):
+        return self.to_detect_data()
+
+    def to_detect_data(self):
+        """转换为回写Excel使用的检测数据字典"""
+        data = {
+            "来样时间": self.arrival_time,
+            "检测时间": self.detect_time,
+            "机台号": self.machine,
+            "产品型号": self.model,
+            "班次": self.shift,
+        }
+        for key in DENSITY_KEYS:
+            data[key] = self[key]
+        data["平均值"] = self.average
+        return data
+
+    @classmethod
+    def from_detect_data(cls, detect_data):
+        return cls(
+            arrival_time=detect_data.get("来样时间", ""),
+            detect_time=detect_data.get("检测时间"),
+            machine=detect_data.get("机台号", ""),
+            model=detect_data.get("产品型号", ""),
+            shift=detect_data.get("班次", ""),
+            densities=[detect_data.get(key) for key in DENSITY_KEYS],
+            average=detect_data.get("平均值"),
+        )
+
+    @classmethod
+    def from_row(cls, row, row_number=None):
+        """
+        从工作表一行（A~K列的值）创建，没有产品型号时返回None
+        :param row_number: 行号
+        """
+        if len(row) < 4 or not row[3] or not str(row[3]).strip():
+            return None
+        row = tuple(row) + (None,) * max(0, 11 - len(row))
+        return cls(
+            arrival_time=row[0] if row[0] else "",
+            detect_time=row[1],
+            machine=row[2] if row[2] else "",
+            model=str(row[3]).strip(),
+            shift=row[4] if row[4] else "",
+            densities=row[5:10],
+            average=row[10],
+            row=row_number,
+        )
+
+
+def normalize_code(code):
+    """扫码内容和产品型号统一为去掉空白、大写的形式后比较"""
+    return str(code).strip().upper()
+
+
+def build_product_index(products):
+    """
+    按产品型号建立散列索引，扫码时直接定位，不必遍历列表
+    :param products: 产品列表
+    :return: {规范化的型号: [序号, ...]}，同一型号有多行时按行顺序排列
+    """
+    index = {}
+    for position, product in enumerate(products):
+        index.setdefault(normalize_code(product["产品型号"]), []).append(position)
+    return index
+
+
+def find_scanned_product(index, products, code):
+    """
+    查找扫码对应的产品，同一型号有多行时优先返回第一个未完成的
+    :return: 产品序号，未找到返回None
+    """
+    positions = index.get(normalize_code(code))
+    if not positions:
+        return None
+    for position in positions:
+        if not products[position]["已完成"]:
+            return position
+    return positions[0]
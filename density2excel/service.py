@@ -0,0 +1,269 @@
+"""
+内嵌HTTP服务（可选，只用标准库）
+
+MES等系统通过HTTP提交产品批次、开始/停止检测，并通过Server-Sent Events（SSE）实时接收读数：
+
+    POST /batches        {"excel_file": "...", "sheet": "...", "products": [{"产品型号": ..., "机台号": ...}, ...]}
+                         -> {"batch": 1, "count": 3}
+    POST /runs           {"batch": 1, "auto": true}   开始检测（已有检测在进行时返回409）
+    POST /runs/stop      停止检测（当前读数结束后停止）
+    POST /runs/resume    从停止的位置继续
+    GET  /status         引擎状态
+    GET  /events         SSE事件流（reading、product_done、run_finished等）
+
+每个SSE客户端有独立的有界队列，事件分发不等待客户端；客户端跟不上时丢弃该客户端，不影响采集。
+"""
+
+import json
+import queue
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .engine import DetectionEngine
+from .records import ProductRecord
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class EventHub:
+    """事件分发：每个订阅者一个有界队列，publish不阻塞"""
+
+    def __init__(self, max_queued=1000):
+        self.max_queued = max_queued
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = queue.Queue(self.max_queued)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def close(self):
+        """通知全部订阅者结束"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(None)
+            except queue.Full:
+                pass
+
+    def publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # 客户端跟不上，清空它的队列并放入结束标记（None），由连接线程断开
+                self.unsubscribe(subscriber)
+                while True:
+                    try:
+                        subscriber.get_nowait()
+                    except queue.Empty:
+                        break
+                subscriber.put_nowait(None)
+
+
+def _json_default(value):
+    return str(value)
+
+
+def _product_from_json(item, excel_file, sheet):
+    if not isinstance(item, dict) or not str(item.get("产品型号", "")).strip():
+        raise ValueError("每个产品必须包含产品型号")
+    return ProductRecord(
+        arrival_time=item.get("来样时间", ""),
+        machine=item.get("机台号", ""),
+        model=str(item["产品型号"]).strip(),
+        shift=item.get("班次", ""),
+        row=item.get("行号"),
+        filename=item.get("Excel文件", excel_file),
+        sheet=item.get("工作表", sheet),
+    )
+
+
+class DetectionService:
+    """HTTP服务：批次管理、引擎控制和事件流"""
+
+    KEEPALIVE_INTERVAL = 15.0
+
+    def __init__(self, read_raw, config=None, writer=None, host=DEFAULT_HOST, port=DEFAULT_PORT, engine=None):
+        """
+        :param read_raw: 无参数函数，返回一帧原始数据，通常为SerialSupervisor.read_frame
+        :param config: AppConfig
+        :param writer: ExcelWriteWorker，为None时结果只通过事件流输出
+        :param host: 监听地址，默认只监听本机
+        :param port: 端口，0表示自动分配
+        :param engine: 已创建的DetectionEngine（测试用），为None时新建
+        """
+        self.hub = EventHub()
+        self.engine = engine or DetectionEngine(read_raw, config, writer)
+        self.engine.on_event = self.hub.publish
+        self.batches = {}
+        self._next_batch = 1
+        self._run_batch = None
+        self._lock = threading.Lock()
+        self._closing = threading.Event()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def close(self):
+        self._closing.set()
+        self.engine.stop()
+        self.hub.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def add_batch(self, payload):
+        excel_file = payload.get("excel_file")
+        sheet = payload.get("sheet")
+        products = [_product_from_json(item, excel_file, sheet) for item in payload.get("products") or []]
+        if not products:
+            raise ValueError("products不能为空")
+        with self._lock:
+            batch_id = self._next_batch
+            self._next_batch += 1
+            self.batches[batch_id] = {"products": products, "excel_file": excel_file}
+        return {"batch": batch_id, "count": len(products)}
+
+    def start_run(self, payload):
+        with self._lock:
+            batch = self.batches.get(payload.get("batch"))
+        if batch is None:
+            raise KeyError("批次不存在")
+        self.engine.start(batch["products"], batch["excel_file"], int(payload.get("start", 0)),
+                          bool(payload.get("auto", True)))
+        self._run_batch = batch
+        return self.status()
+
+    def stop_run(self, payload):
+        self.engine.stop()
+        return self.status()
+
+    def resume_run(self, payload):
+        batch = self._run_batch
+        self.engine.resume(batch["excel_file"] if batch else None, bool(payload.get("auto", True)))
+        return self.status()
+
+    def status(self):
+        engine = self.engine
+        index = engine.current_index
+        product = engine.products[index]["产品型号"] if index is not None and index < len(engine.products) else None
+        return {
+            "state": engine.state,
+            "index": index,
+            "product": product,
+            "partial": list(engine.partial),
+            "batches": len(self.batches),
+            "clients": self.hub.subscriber_count(),
+        }
+
+    def _make_handler(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body, ensure_ascii=False, default=_json_default).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read_json(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                if not length:
+                    return {}
+                payload = json.loads(self.rfile.read(length).decode("utf-8"))
+                if not isinstance(payload, dict):
+                    raise ValueError("请求内容必须是JSON对象")
+                return payload
+
+            def do_GET(self):
+                if self.path == "/status":
+                    self._send_json(200, service.status())
+                elif self.path == "/events":
+                    self._stream_events()
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                routes = {
+                    "/batches": service.add_batch,
+                    "/runs": service.start_run,
+                    "/runs/stop": service.stop_run,
+                    "/runs/resume": service.resume_run,
+                }
+                handler = routes.get(self.path)
+                if handler is None:
+                    self._send_json(404, {"error": "not found"})
+                    return
+                try:
+                    self._send_json(200, handler(self._read_json()))
+                except RuntimeError as e:
+                    self._send_json(409, {"error": str(e)})
+                except KeyError as e:
+                    self._send_json(404, {"error": str(e.args[0]) if e.args else "not found"})
+                except (ValueError, TypeError) as e:
+                    self._send_json(400, {"error": str(e)})
+
+            def _stream_events(self):
+                subscriber = service.hub.subscribe()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.close_connection = True
+                try:
+                    self.wfile.write(b": connected\n\n")
+                    self.wfile.flush()
+                    while not service._closing.is_set():
+                        try:
+                            event = subscriber.get(timeout=service.KEEPALIVE_INTERVAL)
+                        except queue.Empty:
+                            self.wfile.write(b": keepalive\n\n")
+                            self.wfile.flush()
+                            continue
+                        if event is None:
+                            break
+                        data = json.dumps(event, ensure_ascii=False, default=_json_default)
+                        self.wfile.write(f"event: {event['type']}\ndata: {data}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    service.hub.unsubscribe(subscriber)
+
+        return Handler
@@ -0,0 +1,97 @@
+"""
+检测会话断点
+"""
+
+import json
+import os
+
+
+# 检测会话断点文件：每次读数后写入，崩溃或关闭窗口后可从断点继续
+SESSION_CHECKPOINT_FILE = "detect_session.json"
+
+
+def save_session_checkpoint(state, filename=SESSION_CHECKPOINT_FILE):
+    """
+    保存检测会话断点
+    先写临时文件再替换，保证断点文件不会因中途崩溃而损坏
+    :param state: 会话状态字典（工作簿、当前产品序号、已完成序号、当前产品的部分读数）
+    :param filename: 断点文件名
+    """
+    temp_filename = filename + ".tmp"
+    try:
+        with open(temp_filename, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_filename, filename)
+    except Exception as e:
+        print(f"保存检测断点错误: {e}")
+
+
+def load_session_checkpoint(filename=SESSION_CHECKPOINT_FILE):
+    """
+    读取检测会话断点
+    :param filename: 断点文件名
+    :return: 会话状态字典，不存在或损坏时返回None
+    """
+    if not os.path.exists(filename):
+        return None
+    try:
+        with open(filename, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        return state if isinstance(state, dict) else None
+    except Exception as e:
+        print(f"读取检测断点错误: {e}")
+        return None
+
+
+def clear_session_checkpoint(filename=SESSION_CHECKPOINT_FILE):
+    """删除检测会话断点"""
+    try:
+        if os.path.exists(filename):
+            os.remove(filename)
+    except Exception as e:
+        print(f"删除检测断点错误: {e}")
+
+
+class SessionCheckpointer:
+    """
+    按DetectionEngine的事件保存会话断点：产品开始、每个读数之后和产品完成时各保存一次，
+    on_event在引擎线程中调用，断点与已计入的读数一致（停止时中断的读数没有reading事件，不会写入断点）
+    """
+
+    def __init__(self, excel_filename, sheet_name=None, completed_indices=None, filename=SESSION_CHECKPOINT_FILE):
+        """
+        :param excel_filename: 当前工作簿
+        :param sheet_name: 当前工作表，为None时为活动工作表
+        :param completed_indices: 已完成的产品序号集合，产品完成时加入（与调用方共用同一个集合）
+        :param filename: 断点文件名
+        """
+        self.excel_filename = excel_filename
+        self.sheet_name = sheet_name
+        self.completed_indices = completed_indices if completed_indices is not None else set()
+        self.filename = filename
+
+    def save(self, index, product_model=None, detect_time=None, density_values=None):
+        """
+        :param index: 当前产品序号
+        :param product_model: 正在检测的产品型号，产品检测完成后为None
+        :param detect_time: 当前产品的检测时间
+        :param density_values: 当前产品已采集的读数
+        """
+        save_session_checkpoint({
+            "excel_filename": os.path.abspath(self.excel_filename),
+            "sheet_name": self.sheet_name,
+            "current_product_index": index,
+            "completed_indices": sorted(self.completed_indices),
+            "product_model": product_model,
+            "detect_time": detect_time,
+            "density_values": list(density_values or []),
+        }, self.filename)
+
+    def on_event(self, event):
+        if event["type"] in ("product_started", "reading"):
+            self.save(event["index"], event["product"], event["detect_time"], event["values"])
+        elif event["type"] == "product_done":
+            self.completed_indices.add(event["index"])
+            self.save(event["index"])
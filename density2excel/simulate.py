@@ -0,0 +1,341 @@
+"""
+模拟时钟、仪器和串口
+
+不接仪器、不等待真实时间地运行完整检测流程，用于测试和性能评估：
+- FakeClock：sleep立即返回并推进时间，重试退避和读数耗时按模拟时间计算
+- SimulatedInstrument：按脚本或固定种子的随机数输出测量帧，可以模拟超时和乱码
+- SimulatedSerialDevice / FakeSerialPort：内存中的串口，作为SerialSupervisor的opener使用，走完整的字节流和分帧
+- run_shift：用DetectionEngine无界面运行一个班次（全自动模式，可以中途停止再继续），输出吞吐量和读数延迟；
+  可以像图形界面一样写CSV日志、读数记录和会话断点，并从断点文件继续
+"""
+
+import math
+import random
+import threading
+import time
+from datetime import datetime, timedelta
+
+FRAME_TEMPLATE = ("Air          :    +   7.5262 g\n"
+                  "Liquid       :    +   1.8717 g\n"
+                  "Volume       :         5.663 ccm\n"
+                  "Density      :         {value:.4f} g/ccm\n")
+GARBAGE_FRAME = "Density      :        ------ g/ccm\n"  # 超量程时仪器不输出数值
+
+
+class FakeClock:
+    """手动推进的时钟，可以在多个线程中调用"""
+
+    def __init__(self, start=datetime(2024, 3, 1, 8, 0, 0)):
+        """
+        :param start: now()的起始时间
+        """
+        self.start = start
+        self._elapsed = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def elapsed(self):
+        """已经过的模拟秒数"""
+        return self._elapsed
+
+    def advance(self, seconds):
+        if seconds < 0:
+            raise ValueError("时间不能倒退")
+        with self._lock:
+            self._elapsed += seconds
+
+    def sleep(self, seconds):
+        """代替time.sleep：不等待，只推进时间"""
+        self.advance(seconds)
+
+    def monotonic(self):
+        """代替time.monotonic"""
+        return self._elapsed
+
+    def now(self):
+        """代替datetime.now"""
+        return self.start + timedelta(seconds=self._elapsed)
+
+
+class SimulatedInstrument:
+    """
+    模拟密度仪：每次测量输出一帧
+    script中的每一项对应一次测量：数值输出Density帧，None表示超时无输出，字符串原样输出（用于乱码、缺行）；
+    script用完后（或没有script时）按固定种子的正态分布生成读数，相同参数的两次运行结果完全一致
+    """
+
+    def __init__(self, clock, script=(), mean=1.33, sd=0.004, dropout=0.0, garbage=0.0, measure_time=2.0, seed=0):
+        """
+        :param clock: FakeClock，每次测量推进measure_time，超时推进读取的超时时间
+        :param script: 前若干次测量的结果
+        :param mean: 随机读数的均值
+        :param sd: 随机读数的标准差
+        :param dropout: 随机测量超时的概率
+        :param garbage: 随机测量输出乱码的概率
+        :param measure_time: 一次测量的模拟耗时（秒）
+        :param seed: 随机数种子
+        """
+        self.clock = clock
+        self.script = list(script)
+        self.mean = mean
+        self.sd = sd
+        self.dropout = dropout
+        self.garbage = garbage
+        self.measure_time = measure_time
+        self.measurements = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def next_output(self):
+        """
+        下一次测量的输出
+        :return: 帧文本，超时无输出时返回None
+        """
+        with self._lock:
+            index = self.measurements
+            self.measurements += 1
+            if index < len(self.script):
+                item = self.script[index]
+            else:
+                draw = self._random.random()
+                if draw < self.dropout:
+                    item = None
+                elif draw < self.dropout + self.garbage:
+                    item = GARBAGE_FRAME
+                else:
+                    item = round(self._random.gauss(self.mean, self.sd), 4)
+        if item is None:
+            return None
+        return item if isinstance(item, str) else FRAME_TEMPLATE.format(value=item)
+
+    def read_frame(self, timeout=3):
+        """
+        直接读取一帧（不经过串口），可以作为DetectionEngine的read_raw
+        :return: 帧文本，超时返回""
+        """
+        frame = self.next_output()
+        self.clock.advance(timeout if frame is None else self.measure_time)
+        return frame or ""
+
+
+class FakeSerialPort:
+    """内存中的串口，实现SerialSupervisor用到的serial.Serial接口（in_waiting、read、close）"""
+
+    def __init__(self, port, timeout=0.2):
+        self.port = port
+        self.timeout = timeout
+        self.is_open = True
+        self._buffer = bytearray()
+        self._broken = False
+        self._condition = threading.Condition()
+
+    def feed(self, data):
+        """仪器一侧写入字节"""
+        with self._condition:
+            self._buffer.extend(data)
+            self._condition.notify_all()
+
+    def disconnect(self):
+        """模拟拔线：之后的读取抛出异常"""
+        with self._condition:
+            self._broken = True
+            self._condition.notify_all()
+
+    @property
+    def connected(self):
+        return self.is_open and not self._broken
+
+    @property
+    def in_waiting(self):
+        if self._broken:
+            raise OSError(f"{self.port} 设备已断开")
+        return len(self._buffer)
+
+    def read(self, size=1):
+        """没有数据时最多等待timeout（真实时间，收到数据立即返回），与串口读取超时一致"""
+        with self._condition:
+            if not self._buffer and not self._broken and self.is_open:
+                self._condition.wait(self.timeout)
+            if self._broken:
+                raise OSError(f"{self.port} 设备已断开")
+            data = bytes(self._buffer[:size])
+            del self._buffer[:size]
+            return data
+
+    def reset_input_buffer(self):
+        with self._condition:
+            self._buffer.clear()
+
+    flushInput = reset_input_buffer
+
+    def close(self):
+        with self._condition:
+            self.is_open = False
+            self._condition.notify_all()
+
+
+class SimulatedSerialDevice:
+    """
+    接在模拟串口上的仪器，open方法作为SerialSupervisor的opener：
+    trigger()相当于操作员按下测量键，把下一次测量的输出写入当前打开的串口
+    """
+
+    def __init__(self, instrument, port="SIM1"):
+        self.instrument = instrument
+        self.port = port
+        self.available = True  # 为False时打开失败，模拟设备不存在
+        self.opened = []  # 打开过的FakeSerialPort
+        self._lock = threading.Lock()
+
+    def open(self, port, baudrate, bytesize, stopbits, parity, timeout):
+        """参数同acquisition.open_serial_port"""
+        with self._lock:
+            if not self.available or port != self.port:
+                raise OSError(f"无法打开串口 {port}")
+            serial_port = FakeSerialPort(port, timeout)
+            self.opened.append(serial_port)
+            return serial_port
+
+    @property
+    def current(self):
+        """当前打开的串口，没有时返回None"""
+        with self._lock:
+            if self.opened and self.opened[-1].connected:
+                return self.opened[-1]
+            return None
+
+    def trigger(self):
+        """测量一次并输出到串口，超时的测量不输出，串口未打开时输出丢失"""
+        frame = self.instrument.next_output()
+        self.instrument.clock.advance(self.instrument.measure_time)
+        serial_port = self.current
+        if frame is not None and serial_port is not None:
+            serial_port.feed(frame.encode("utf-8"))
+
+    def unplug(self):
+        """拔线：当前串口断开，重新插上前无法打开"""
+        with self._lock:
+            self.available = False
+            ports = list(self.opened)
+        for serial_port in ports:
+            serial_port.disconnect()
+
+    def plug(self):
+        with self._lock:
+            self.available = True
+
+
+class RecordingWriter:
+    """代替ExcelWriteWorker，只记录提交的结果（不写文件）"""
+
+    def __init__(self):
+        self.results = []  # [(文件名, 产品型号, 检测数据字典)]
+
+    def submit(self, filename, product_model, detect_data, sheet_name=None, deferred=False, row=None):
+        self.results.append((filename, product_model, dict(detect_data)))
+
+
+def percentile(values, fraction):
+    """最近秩百分位数，values为空时返回None"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(len(ordered) * fraction)) - 1]
+
+
+def make_products(count, machines=("1#", "2#", "3#"), shift="白班"):
+    """生成count个待检测产品"""
+    return [{"来样时间": "08:00", "机台号": machines[index % len(machines)], "产品型号": f"SIM{index + 1:04d}",
+             "班次": shift} for index in range(count)]
+
+
+def run_shift(products, read_raw, clock, config=None, writer=None, excel_filename="simulated.xlsx",
+              before_reading=None, spec=None, stop_at=(), stop_during=(), csv_sink=None, provenance=False,
+              checkpoint_file=None):
+    """
+    用DetectionEngine在当前线程中运行一个班次（全自动模式），与图形界面使用同一个采集循环
+    :param products: 产品列表
+    :param read_raw: 读取一帧的函数，例如SimulatedInstrument.read_frame
+    :param clock: FakeClock，重试等待和检测时间都用模拟时间
+    :param config: AppConfig
+    :param writer: 结果写入对象（ExcelWriteWorker或RecordingWriter），为None时不写入
+    :param before_reading: 每次读数开始前调用的函数
+    :param spec: SpecTable
+    :param stop_at: [(产品序号, 读数序号)]，读到该读数后停止，再从断点继续（模拟操作员停止后继续）
+    :param stop_during: [(产品序号, 读数序号)]，等待该读数时停止（串口读取超时），再从断点继续
+    :param csv_sink: CsvSink，每个读数追加一行到CSV日志
+    :param provenance: 为True时写读数记录
+    :param checkpoint_file: 会话断点文件，给出时按图形界面的方式保存断点（SessionCheckpointer），
+                            停止后从断点文件继续（模拟重新打开程序），否则由同一个引擎继续
+    :return: {"products", "readings", "failed_readings", "attempts", "resumes", "simulated_seconds",
+              "wall_seconds", "throughput"（每模拟小时的产品数）, "latency" {"mean", "p50", "p95", "max"}（模拟秒）,
+              "results"（product_done事件列表）, "errors"}
+    """
+    from .engine import DetectionEngine
+    from .session import SessionCheckpointer, load_session_checkpoint
+
+    stop_points = set(stop_at)
+    stop_reading_points = set(stop_during)
+    checkpointer = SessionCheckpointer(excel_filename, filename=checkpoint_file) if checkpoint_file else None
+    readings = []
+    results = []
+    errors = []
+
+    def read_frame():
+        point = (engine.current_index, len(engine.partial) + 1)
+        if point in stop_reading_points:
+            # 操作员在仪器输出之前按停止，本次读取超时
+            stop_reading_points.discard(point)
+            engine.stop()
+            return ""
+        return read_raw()
+
+    def on_event(event):
+        if checkpointer is not None:
+            checkpointer.on_event(event)
+        if event["type"] == "reading":
+            readings.append(event)
+            if (event["index"], event["reading"]) in stop_points:
+                stop_points.discard((event["index"], event["reading"]))
+                engine.stop()
+        elif event["type"] == "product_done":
+            results.append(event)
+        elif event["type"] == "error":
+            errors.append(event["message"])
+
+    engine = DetectionEngine(read_frame, config, writer, on_event=on_event, sleep=clock.sleep, now=clock.now,
+                             before_reading=before_reading, spec=spec, csv_sink=csv_sink, provenance=provenance)
+    started_wall = time.perf_counter()
+    started = clock.elapsed
+    resumes = 0
+    engine.start(products, excel_filename, background=False)
+    while engine.current_index is not None and not errors:
+        resumes += 1
+        if checkpointer is None:
+            engine.resume(excel_filename, background=False)
+            continue
+        state = load_session_checkpoint(checkpoint_file)
+        engine.start(products, excel_filename, state["current_product_index"],
+                     resume_values=state["density_values"], resume_time=state["detect_time"], background=False)
+    wall_seconds = time.perf_counter() - started_wall
+    simulated_seconds = clock.elapsed - started
+
+    latencies = [event["latency"] for event in readings]
+    return {
+        "products": len(results),
+        "readings": len(readings),
+        "failed_readings": sum(1 for event in readings if event["density"] is None),
+        "attempts": sum(event["attempts"] for event in readings),
+        "resumes": resumes,
+        "simulated_seconds": simulated_seconds,
+        "wall_seconds": wall_seconds,
+        "throughput": len(results) * 3600 / simulated_seconds if simulated_seconds else None,
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "max": max(latencies) if latencies else None,
+        },
+        "results": results,
+        "errors": errors,
+    }
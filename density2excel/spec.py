@@ -0,0 +1,181 @@
+"""
+产品规格表
+
+启动时从CSV或工作簿中的一个工作表读取各产品型号的规格，建立 {规范化的型号: 规格} 散列索引，
+每个读数和平均值到达时直接按型号查找判断，型号再多也不必遍历：
+
+    产品型号,密度下限,密度上限,极差上限
+    A1001,1.300,1.360,0.010
+    B2002,1.250,,0.015
+
+下限、上限、极差上限（一个产品各读数最大值与最小值之差）都可以留空，表示不限。
+规格表中没有的型号使用检测方案中的 spec_min / spec_max。
+产品判定为合格需要平均值在上下限之内且极差不超过极差上限；单个读数超出上下限只在界面中标出。
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from .records import normalize_code
+
+PASS = "合格"
+FAIL = "不合格"
+JUDGEMENT_KEY = "判定"  # 检测数据字典中的键，回写到L列
+SPEC_COLUMNS = {"产品型号": "model", "密度下限": "low", "密度上限": "high", "极差上限": "spread"}
+
+
+@dataclass(frozen=True)
+class SpecLimit:
+    """一个产品型号的规格，None表示不限"""
+    low: Optional[float] = None
+    high: Optional[float] = None
+    spread: Optional[float] = None
+
+    def contains(self, value):
+        """数值是否在上下限之内"""
+        return (self.low is None or value >= self.low) and (self.high is None or value <= self.high)
+
+
+def _number(value, row_number, name):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"规格表第 {row_number} 行的{name}不是数值: {value}")
+
+
+def _read_rows(filename, sheet_name=None):
+    """读取规格表的全部行（第一行为表头）"""
+    if os.path.splitext(filename)[1].lower() == ".csv":
+        import csv
+        with open(filename, encoding="utf-8-sig", newline="") as f:
+            yield from csv.reader(f)
+        return
+    from openpyxl import load_workbook
+    workbook = load_workbook(filename, read_only=True, data_only=True)
+    try:
+        if sheet_name:
+            if sheet_name not in workbook.sheetnames:
+                raise ValueError(f"规格表中没有工作表: {sheet_name}")
+            sheet = workbook[sheet_name]
+        else:
+            sheet = workbook.active
+        yield from sheet.iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def load_spec_file(filename, sheet_name=None):
+    """
+    读取规格表
+    :param filename: CSV文件或工作簿
+    :param sheet_name: 工作簿中的工作表名称，为None时使用活动工作表（CSV忽略）
+    :return: {规范化的产品型号: SpecLimit}
+    :raises ValueError: 缺少表头列、数值无效或下限大于上限
+    """
+    limits = {}
+    rows = _read_rows(filename, sheet_name)
+    header = [str(value).strip() if value is not None else "" for value in next(rows, ())]
+    missing = [name for name in SPEC_COLUMNS if name != "极差上限" and name not in header]
+    if missing:
+        raise ValueError(f"规格表缺少列: {'、'.join(missing)}")
+    positions = {key: header.index(name) for name, key in SPEC_COLUMNS.items() if name in header}
+    for row_number, row in enumerate(rows, 2):
+        values = {key: row[position] if position < len(row) else None for key, position in positions.items()}
+        model = values.pop("model")
+        if model is None or not str(model).strip():
+            continue
+        if isinstance(model, float) and model.is_integer():
+            model = int(model)
+        limit = SpecLimit(
+            low=_number(values.get("low"), row_number, "密度下限"),
+            high=_number(values.get("high"), row_number, "密度上限"),
+            spread=_number(values.get("spread"), row_number, "极差上限"),
+        )
+        if limit.low is not None and limit.high is not None and limit.low > limit.high:
+            raise ValueError(f"规格表第 {row_number} 行的密度下限大于密度上限")
+        limits[normalize_code(model)] = limit
+    return limits
+
+
+def profile_limit(profile):
+    """检测方案（ProfileSettings）中的spec_min/spec_max，都未设置时返回None"""
+    if profile.spec_min is None and profile.spec_max is None:
+        return None
+    return SpecLimit(profile.spec_min, profile.spec_max)
+
+
+class SpecTable:
+    """按产品型号查找规格并判定，查找为一次散列查询"""
+
+    def __init__(self, limits=None, default=None):
+        """
+        :param limits: {产品型号: SpecLimit}
+        :param default: 规格表中没有的型号使用的规格，为None时不判定
+        """
+        self._limits = {normalize_code(model): limit for model, limit in (limits or {}).items()}
+        self.default = default
+
+    @classmethod
+    def from_settings(cls, settings, profile):
+        """
+        按配置创建：settings为SpecSettings（规格表文件），profile为ProfileSettings（默认上下限）
+        :raises Exception: 规格表无法读取（文件不存在、格式错误等）
+        """
+        limits = load_spec_file(settings.file, settings.sheet or None) if settings.file else {}
+        return cls(limits, profile_limit(profile))
+
+    def __len__(self):
+        return len(self._limits)
+
+    def lookup(self, product_model):
+        """产品型号的规格，没有时返回None"""
+        return self._limits.get(normalize_code(product_model), self.default)
+
+    def limits(self, product_model):
+        """(下限, 上限)，没有规格时返回None"""
+        limit = self.lookup(product_model)
+        return (limit.low, limit.high) if limit is not None else None
+
+    def check_reading(self, product_model, value):
+        """
+        判断一个读数
+        :return: True在上下限之内，False超出，读数失败或没有规格时返回None
+        """
+        limit = self.lookup(product_model)
+        if limit is None or value is None:
+            return None
+        return limit.contains(value)
+
+    def judge(self, product_model, density_values, average):
+        """
+        判定一个产品
+        :param density_values: 读数列表，失败的读数为None
+        :param average: 平均值
+        :return: PASS / FAIL，没有规格时返回None
+        """
+        limit = self.lookup(product_model)
+        if limit is None:
+            return None
+        if average is None or not limit.contains(average):
+            return FAIL
+        if limit.spread is not None:
+            values = [value for value in density_values if value is not None]
+            if values and max(values) - min(values) > limit.spread + 1e-9:
+                return FAIL
+        return PASS
+
+
+def load_spec_table(config, log=print):
+    """
+    按AppConfig创建规格表，规格表文件无法读取时报告错误并只使用检测方案中的上下限
+    :param log: 报告错误的函数
+    :return: SpecTable
+    """
+    try:
+        return SpecTable.from_settings(config.spec, config.profile)
+    except Exception as e:
+        log(f"读取规格表失败，只使用检测方案中的规格: {e}")
+        return SpecTable(default=profile_limit(config.profile))
@@ -0,0 +1,103 @@
+"""
+检测数据统计
+"""
+
+
+def average_density(density_values):
+    """
+    计算平均值（仅包含有效数值）
+    :param density_values: 密度值列表，失败的读数为None
+    :return: 平均值，没有有效数值时返回None
+    """
+    valid_densities = [d for d in density_values if d is not None]
+    return sum(valid_densities) / len(valid_densities) if valid_densities else None
+
+
+def within_limits(density_values, low=None, high=None):
+    """
+    剔除超出[low, high]范围的读数（视为异常值，按失败处理）
+    :param density_values: 密度值列表，失败的读数为None
+    :param low: 下限，None表示不限
+    :param high: 上限，None表示不限
+    :return: 新的列表，超出范围的读数替换为None
+    """
+    return [
+        d if d is not None and (low is None or d >= low) and (high is None or d <= high) else None
+        for d in density_values
+    ]
+
+
+class RunningStats:
+    """
+    增量统计：数量、均值、方差（Welford算法）、最小值、最大值
+    两组统计可以用merge合并（Chan等人的并行合并公式），用于汇总多个文件或多个进程的结果
+    """
+
+    __slots__ = ("count", "mean", "m2", "minimum", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+
+    def remove(self, value):
+        """
+        去掉一个之前加入的数值（Welford算法的逆运算），用于重新检测的产品替换旧结果
+        最小值、最大值无法回退，保持不变
+        """
+        if self.count <= 1:
+            self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            self.minimum = self.maximum = None
+            return
+        mean = (self.count * self.mean - value) / (self.count - 1)
+        self.m2 = max(self.m2 - (value - mean) * (value - self.mean), 0.0)
+        self.mean = mean
+        self.count -= 1
+
+    def merge(self, other):
+        """合并另一组统计，返回self"""
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.mean, self.m2 = other.count, other.mean, other.m2
+            self.minimum, self.maximum = other.minimum, other.maximum
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.minimum = min(self.minimum, other.minimum)
+        self.maximum = max(self.maximum, other.maximum)
+        return self
+
+    @property
+    def variance(self):
+        """样本方差，少于两个数值时为None"""
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    @property
+    def stdev(self):
+        """样本标准差，少于两个数值时为None"""
+        variance = self.variance
+        return variance ** 0.5 if variance is not None else None
+
+    def to_dict(self):
+        return {"count": self.count, "mean": self.mean if self.count else None, "sd": self.stdev,
+                "min": self.minimum, "max": self.maximum}
+
+    def __getstate__(self):
+        return (self.count, self.mean, self.m2, self.minimum, self.maximum)
+
+    def __setstate__(self, state):
+        self.count, self.mean, self.m2, self.minimum, self.maximum = state
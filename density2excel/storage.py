@@ -0,0 +1,888 @@
+"""
+Excel/CSV 数据存储
+openpyxl、csv 在用到的函数内导入，界面启动时不必等待加载
+"""
+
+import errno
+import json
+import os
+import queue
+import threading
+import time
+
+from .records import DetectionRecord, ProductRecord
+from .spec import JUDGEMENT_KEY
+from .stats import average_density
+from .xlsx import JUDGEMENT_COLUMN, ROW_KEY, XlsxPatchError, detection_row, patch_detection_results
+
+
+def write_to_excel(data, filename="density_data.xlsx"):
+    """
+    将密度测试数据写入Excel文件
+    :param data: 包含所有测试信息的字典
+    :param filename: Excel文件名
+    """
+    from openpyxl import Workbook, load_workbook
+    try:
+        # 检查文件是否存在
+        file_exists = os.path.exists(filename)
+        
+        if file_exists:
+            # 加载现有文件
+            workbook = load_workbook(filename)
+            sheet = workbook.active
+        else:
+            # 创建新文件和工作表
+            workbook = Workbook()
+            sheet = workbook.active
+            # 设置表头
+            headers = ["来样时间", "测试时间", "机台号", "产品型号", "班次", 
+                      "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"]
+            sheet.append(headers)
+        
+        # 准备要写入的数据行
+        row_data = [
+            data.get("来样时间", ""),
+            data.get("测试时间", ""),
+            data.get("机台号", ""),
+            data.get("产品型号", ""),
+            data.get("班次", ""),
+            data.get("密度1", ""),
+            data.get("密度2", ""),
+            data.get("密度3", ""),
+            data.get("密度4", ""),
+            data.get("密度5", ""),
+            data.get("平均值", "")
+        ]
+        
+        # 写入数据行
+        sheet.append(row_data)
+        
+        # 保存文件
+        workbook.save(filename)
+        print(f"成功将测试数据写入Excel文件: {filename}")
+
+    except Exception as e:
+        print(f"写入Excel文件错误: {e}")
+        # 打印更详细的错误信息
+        import traceback
+        traceback.print_exc()
+
+
+def is_file_lock_error(error):
+    """
+    判断异常是否由文件被占用引起（如工作簿正在Excel中打开）
+    :param error: 异常对象
+    :return: 是占用错误返回True
+    """
+    if isinstance(error, PermissionError):
+        return True
+    # Windows: 32 = 文件被另一进程使用，33 = 文件的一部分被锁定
+    if isinstance(error, OSError) and getattr(error, "winerror", None) in (32, 33):
+        return True
+    return isinstance(error, OSError) and error.errno in (errno.EACCES, errno.EBUSY)
+
+
+def save_workbook_atomic(workbook, filename):
+    """
+    先保存到同目录下的临时文件再替换原文件
+    读取方不会读到写了一半的文件；原文件被占用时替换失败，原文件保持不变
+    :param workbook: 工作簿
+    :param filename: Excel文件名
+    """
+    directory, name = os.path.split(os.path.abspath(filename))
+    temp_filename = os.path.join(directory, f".{name}.saving.xlsx")
+    try:
+        workbook.save(temp_filename)
+        os.replace(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
+
+
+def pending_updates_filename(filename):
+    """工作簿对应的旁路文件名，保存因占用未写入的结果"""
+    return os.path.abspath(filename) + ".pending.jsonl"
+
+
+def append_pending_update(filename, sheet_name, product_model, detect_data):
+    """
+    追加一条未写入的结果到旁路文件
+    :param filename: Excel文件名
+    :param sheet_name: 工作表名称
+    :param product_model: 产品型号
+    :param detect_data: 检测数据字典
+    """
+    record = {"sheet_name": sheet_name, "product_model": product_model, "detect_data": detect_data}
+    with open(pending_updates_filename(filename), 'a', encoding='utf-8') as f:
+        f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+
+def read_pending_updates(filename):
+    """
+    读取旁路文件中未写入的结果
+    :param filename: Excel文件名
+    :return: [(sheet_name, product_model, detect_data)]
+    """
+    pending_filename = pending_updates_filename(filename)
+    updates = []
+    if not os.path.exists(pending_filename):
+        return updates
+    with open(pending_filename, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # 写到一半的最后一行
+                continue
+            updates.append((record.get("sheet_name"), record.get("product_model"), record.get("detect_data") or {}))
+    return updates
+
+
+def clear_pending_updates(filename):
+    """结果已保存到工作簿后删除旁路文件"""
+    pending_filename = pending_updates_filename(filename)
+    if os.path.exists(pending_filename):
+        os.remove(pending_filename)
+
+
+class WorkbookCache:
+    """
+    工作簿缓存
+    批量检测时同一个文件只解析一次，结果先写入内存中的工作簿，
+    由调用方在该文件处理完后统一保存一次
+    界面线程读取产品列表和回写线程写入结果共用同一个锁
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._workbooks = {}
+        self._dirty = set()
+
+    def get(self, filename):
+        """获取工作簿，首次访问时加载"""
+        from openpyxl import load_workbook
+        key = os.path.abspath(filename)
+        with self.lock:
+            if key not in self._workbooks:
+                self._workbooks[key] = load_workbook(filename)
+            return self._workbooks[key]
+
+    def sheet(self, filename, sheet_name=None):
+        """获取工作表，未指定名称时返回活动工作表"""
+        workbook = self.get(filename)
+        return workbook[sheet_name] if sheet_name else workbook.active
+
+    def mark_dirty(self, filename):
+        """标记工作簿有未保存的修改"""
+        with self.lock:
+            self._dirty.add(os.path.abspath(filename))
+
+    def is_dirty(self, filename):
+        with self.lock:
+            return os.path.abspath(filename) in self._dirty
+
+    def save(self, filename, release=True):
+        """
+        保存工作簿
+        :param filename: Excel文件名
+        :param release: 保存后是否释放缓存的工作簿
+        :return: 保存成功（或无需保存）返回True，否则返回False
+        """
+        key = os.path.abspath(filename)
+        with self.lock:
+            workbook = self._workbooks.get(key)
+            try:
+                if workbook is not None and key in self._dirty:
+                    save_workbook_atomic(workbook, key)
+                    self._dirty.discard(key)
+            except Exception as e:
+                # 文件被占用时交给调用方重试，工作簿保留在缓存中
+                if is_file_lock_error(e):
+                    raise
+                print(f"保存Excel文件错误: {e}")
+                return False
+            if release and workbook is not None:
+                workbook.close()
+                del self._workbooks[key]
+            return True
+
+    def cached_files(self):
+        """缓存中的文件列表"""
+        with self.lock:
+            return list(self._workbooks)
+
+    def save_all(self):
+        """保存并释放所有缓存的工作簿，被占用的文件保留在缓存中"""
+        with self.lock:
+            results = []
+            for key in list(self._workbooks):
+                try:
+                    results.append(self.save(key))
+                except Exception as e:
+                    if not is_file_lock_error(e):
+                        raise
+                    results.append(False)
+            return all(results)
+
+
+def list_excel_sheets(filename):
+    """
+    读取Excel文件中的工作表名称（只读模式，不解析单元格）
+    :param filename: Excel文件名
+    :return: 工作表名称列表
+    """
+    from openpyxl import load_workbook
+    try:
+        workbook = load_workbook(filename, read_only=True)
+        sheet_names = workbook.sheetnames
+        workbook.close()
+        return sheet_names
+    except Exception as e:
+        print(f"读取工作表名称错误: {e}")
+        return []
+
+
+def read_product_models_from_excel(filename="density_data.xlsx", sheet_name=None, cache=None):
+    """
+    从Excel文件中读取产品型号、机台号等信息
+    读取A~E列的同一次遍历中顺带读取检测时间（B列）和平均值（K列），
+    两者都已填写的行标记为已完成，便于只检测未完成的产品
+    :param filename: Excel文件名
+    :param sheet_name: 工作表名称，为None时读取活动工作表
+    :param cache: WorkbookCache，传入时复用缓存的工作簿且不关闭
+    :return: 产品型号列表（ProductRecord，可按中文键访问），每项包含"行号"和"已完成"
+    """
+    from openpyxl import load_workbook
+    workbook = None
+    try:
+        # 加载Excel文件
+        if cache is not None:
+            cache.lock.acquire()
+            sheet = cache.sheet(filename, sheet_name)
+        else:
+            workbook = load_workbook(filename)
+            sheet = workbook[sheet_name] if sheet_name else workbook.active
+        
+        product_info_list = []
+        
+        # 遍历所有行，从第2行开始（跳过表头），读到第11列（平均值）
+        # 没有产品型号（第4列）的行返回None
+        for row_number, row in enumerate(sheet.iter_rows(min_row=2, max_col=11, values_only=True), 2):
+            product_info = ProductRecord.from_row(row, row_number, filename, sheet_name)
+            if product_info is not None:
+                product_info_list.append(product_info)
+        
+        return product_info_list
+        
+    except Exception as e:
+        print(f"从Excel读取产品型号错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+    finally:
+        if cache is not None:
+            cache.lock.release()
+        elif workbook is not None:
+            workbook.close()
+
+
+def read_detection_history(filename, sheet_name=None):
+    """
+    流式读取工作表中的全部检测记录（只读模式，适合十万行级的历史文件）
+    :param filename: Excel文件名
+    :param sheet_name: 工作表名称，为None时读取活动工作表
+    :return: DetectionRecord列表（含未检测的行，读数为None）
+    """
+    from openpyxl import load_workbook
+    workbook = load_workbook(filename, read_only=True)
+    try:
+        sheet = workbook[sheet_name] if sheet_name else workbook.active
+        history = []
+        for row_number, row in enumerate(sheet.iter_rows(min_row=2, max_col=11, values_only=True), 2):
+            record = DetectionRecord.from_row(row, row_number)
+            if record is not None:
+                history.append(record)
+        return history
+    finally:
+        workbook.close()
+
+
+def apply_detection_results(sheet, product_model, detect_data):
+    """
+    将检测结果写入工作表中对应产品的行（只修改内存，不保存）
+    :param sheet: 工作表
+    :param product_model: 产品型号
+    :param detect_data: 检测数据字典，带"行号"时优先写入该行
+    """
+    target_product = str(product_model).strip() if product_model is not None else ""
+    detection_time = detect_data.get("检测时间")
+    if detection_time is None:
+        detection_time = detect_data.get("测试时间")
+
+    # 有规格判定时写入L列，表头为空时补上“判定”
+    judged = JUDGEMENT_KEY in detect_data
+    if judged and target_product and sheet.cell(row=1, column=JUDGEMENT_COLUMN).value in (None, ""):
+        sheet.cell(row=1, column=JUDGEMENT_COLUMN).value = JUDGEMENT_KEY
+
+    # 已知产品所在的行（同一型号有多行时）且该行仍是该型号时直接写入，否则按型号查找第一个匹配的行
+    row_number = detection_row(detect_data)
+    if row_number is not None:
+        cell_value = sheet.cell(row=row_number, column=4).value
+        if not target_product or (str(cell_value).strip() if cell_value is not None else "") != target_product:
+            row_number = None
+    if row_number is None and target_product:
+        for row in sheet.iter_rows(min_row=2, max_col=4):
+            cell_value = row[3].value
+            current_product = str(cell_value).strip() if cell_value is not None else ""
+            if current_product == target_product:
+                row_number = row[3].row
+                break
+
+    if row_number is not None:
+        sheet.cell(row=row_number, column=2).value = detection_time
+        for column, key in enumerate(("密度1", "密度2", "密度3", "密度4", "密度5", "平均值"), 6):
+            sheet.cell(row=row_number, column=column).value = detect_data.get(key)
+        if judged:
+            sheet.cell(row=row_number, column=JUDGEMENT_COLUMN).value = detect_data[JUDGEMENT_KEY]
+    elif target_product:
+        values = [
+            detect_data.get("来样时间", ""),
+            detection_time,
+            detect_data.get("机台号", ""),
+            target_product,
+            detect_data.get("班次", ""),
+            detect_data.get("密度1"),
+            detect_data.get("密度2"),
+            detect_data.get("密度3"),
+            detect_data.get("密度4"),
+            detect_data.get("密度5"),
+            detect_data.get("平均值"),
+        ]
+        if judged:
+            values.append(detect_data[JUDGEMENT_KEY])
+        sheet.append(values)
+
+
+def save_detection_results(filename, updates, write_mode="workbook"):
+    """
+    将一批检测结果写入同一个工作簿并只保存一次
+    :param filename: Excel文件名
+    :param updates: [(工作表名称, 产品型号, 检测数据字典)]
+    :param write_mode: workbook：用openpyxl加载后完整保存；
+                       patch：只修改工作表XML中变化的单元格，其它内容原样保留，
+                       工作簿结构不支持时（例如要覆盖公式）自动改为完整保存
+    :raises Exception: 保存失败（文件被占用时由调用方判断is_file_lock_error）
+    """
+    if write_mode == "patch":
+        try:
+            patch_detection_results(filename, updates)
+            return
+        except XlsxPatchError as e:
+            print(f"无法只修改变化的单元格，改为完整保存: {e}")
+
+    from openpyxl import load_workbook
+    workbook = load_workbook(filename)
+    try:
+        for sheet_name, product_model, detect_data in updates:
+            sheet = workbook[sheet_name] if sheet_name else workbook.active
+            apply_detection_results(sheet, product_model, detect_data)
+        save_workbook_atomic(workbook, filename)
+    finally:
+        workbook.close()
+
+
+def update_excel_with_detection_results(filename, product_model, detect_data, sheet_name=None,
+                                        write_mode="workbook", summaries=None, row=None):
+    """
+    更新Excel文件中的检测结果
+    :param filename: Excel文件名
+    :param product_model: 产品型号
+    :param detect_data: 检测数据字典
+    :param sheet_name: 工作表名称，为None时写入活动工作表
+    :param write_mode: 回写方式，见save_detection_results
+    :param summaries: SummaryStore，写入成功后更新班次、机台汇总
+    :param row: 产品所在的行号（产品信息中的"行号"），同一型号有多行时写入该行
+    :return: 写入成功返回True，否则返回False
+    """
+    if row is not None:
+        detect_data = {**detect_data, ROW_KEY: row}
+    try:
+        save_detection_results(filename, [(sheet_name, product_model, detect_data)], write_mode)
+        if summaries is not None:
+            summaries.record(filename, sheet_name, product_model, detect_data)
+        return True
+
+    except Exception as e:
+        print(f"更新Excel文件错误: {e}")
+        import traceback
+        traceback.print_exc()
+        return False
+
+
+def update_excel_with_test_results(filename, product_model, test_data, write_mode="workbook", summaries=None,
+                                   row=None):
+    detection_data = dict(test_data) if test_data is not None else {}
+    if "检测时间" not in detection_data and "测试时间" in detection_data:
+        detection_data["检测时间"] = detection_data.get("测试时间")
+    return update_excel_with_detection_results(filename, product_model, detection_data, write_mode=write_mode,
+                                               summaries=summaries, row=row)
+
+
+def build_detect_data(product_info, detect_time, density_values, spec=None):
+    """
+    组装一个产品的检测数据字典（回写Excel时使用的格式）
+    :param product_info: 产品信息字典
+    :param detect_time: 检测时间字符串
+    :param density_values: 密度值列表，失败的读数为None
+    :param spec: SpecTable，该产品有规格时加入"判定"（合格/不合格）
+    :return: 检测数据字典
+    """
+    average = average_density(density_values)
+    detect_data = {
+        "来样时间": product_info["来样时间"],
+        "检测时间": detect_time,
+        "机台号": product_info["机台号"],
+        "产品型号": product_info["产品型号"],
+        "班次": product_info["班次"],
+        "密度1": density_values[0] if len(density_values) > 0 else None,
+        "密度2": density_values[1] if len(density_values) > 1 else None,
+        "密度3": density_values[2] if len(density_values) > 2 else None,
+        "密度4": density_values[3] if len(density_values) > 3 else None,
+        "密度5": density_values[4] if len(density_values) > 4 else None,
+        "平均值": round(average, 4) if average is not None else None
+    }
+    if spec is not None:
+        judgement = spec.judge(product_info["产品型号"], density_values, detect_data["平均值"])
+        if judgement is not None:
+            detect_data[JUDGEMENT_KEY] = judgement
+    return detect_data
+
+
+class ExcelWriteWorker:
+    """
+    Excel回写工作线程
+    检测线程只负责提交结果，保存工作簿在独立线程中完成，
+    这样下一个样品的采集不必等待磁盘写入
+    工作簿被Excel等程序占用时，结果暂存在内存并追加到旁路文件（*.pending.jsonl），
+    后台按指数退避重试，占用解除后一次性写入并保存
+    """
+
+    # 重试间隔（秒）：首次重试等待时间和最大等待时间
+    RETRY_MIN_DELAY = 1.0
+    RETRY_MAX_DELAY = 30.0
+
+    def __init__(self, on_done=None, cache=None, on_backlog=None, write_mode="workbook", summaries=None):
+        """
+        :param on_done: 每条结果写入后的回调 on_done(product_model, success)，在写入线程中调用；
+                        转入积压的结果重试时遇到占用以外的错误而放弃时，再以success=False回调一次
+        :param cache: WorkbookCache，延迟保存的结果写入其中缓存的工作簿
+        :param on_backlog: 积压数量变化时的回调 on_backlog(count)，在写入线程中调用
+        :param write_mode: 立即保存的结果的回写方式，见save_detection_results（缓存的工作簿总是完整保存）
+        :param summaries: SummaryStore，每条结果写入（或转入积压等待写入）后更新班次、机台汇总
+        """
+        self.on_done = on_done
+        self.write_mode = write_mode
+        self.summaries = summaries
+        self.on_backlog = on_backlog
+        self.cache = cache if cache is not None else WorkbookCache()
+        self._queue = queue.Queue()
+        self._pending = {}  # 文件 -> 因占用未写入的结果列表 [(sheet_name, product_model, detect_data)]
+        self._unsaved = set()  # 缓存中因占用未能保存的文件
+        self._journal_counts = {}  # 文件 -> 旁路文件中的记录数
+        self._retry_delay = self.RETRY_MIN_DELAY
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def submit(self, filename, product_model, detect_data, sheet_name=None, deferred=False, row=None):
+        """
+        提交一条检测结果，立即返回
+        :param deferred: 为True时只写入缓存的工作簿，等submit_flush时统一保存
+        :param row: 产品所在的行号（产品信息中的"行号"），同一型号有多行时写入该行，为None时按型号查找
+        """
+        detect_data = dict(detect_data)
+        if row is not None:
+            detect_data[ROW_KEY] = row
+        self._queue.put(("update", filename, sheet_name, product_model, detect_data, deferred))
+
+    def submit_flush(self, filename=None):
+        """
+        保存缓存中有修改的工作簿
+        :param filename: Excel文件名，为None时保存全部
+        """
+        self._queue.put(("flush", filename))
+
+    def recover(self, filename):
+        """
+        读取上次未写入的旁路文件（程序在文件被占用期间退出时留下），重新排队写入
+        :param filename: Excel文件名
+        :return: 恢复的结果数量
+        """
+        updates = read_pending_updates(filename)
+        for sheet_name, product_model, detect_data in updates:
+            self._queue.put(("recover", filename, sheet_name, product_model, detect_data, False))
+        return len(updates)
+
+    def backlog_count(self):
+        """因文件被占用而尚未保存的结果数量"""
+        return sum(self._journal_counts.values())
+
+    def pending_count(self):
+        """尚未写完的结果数量（队列中的和积压的）"""
+        return self._queue.unfinished_tasks + self.backlog_count()
+
+    def wait_idle(self):
+        """阻塞直到所有已提交的任务处理完成（积压的结果仍在后台重试）"""
+        self._queue.join()
+
+    def close(self):
+        """处理完队列后再尝试写入一次积压的结果，然后结束工作线程"""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            waiting = bool(self._pending or self._unsaved)
+            try:
+                job = self._queue.get(timeout=self._retry_delay if waiting else None)
+            except queue.Empty:
+                self._retry()
+                continue
+            try:
+                if job is None:
+                    self._retry()
+                    return
+                if job[0] == "flush":
+                    self._flush_cache(job[1])
+                    continue
+                kind, filename, sheet_name, product_model, detect_data, deferred = job
+                key = os.path.abspath(filename)
+                if deferred:
+                    with self.cache.lock:
+                        apply_detection_results(self.cache.sheet(filename, sheet_name), product_model, detect_data)
+                        self.cache.mark_dirty(filename)
+                    # 保存前先记入旁路文件，程序意外退出时不会丢失
+                    self._journal(key, sheet_name, product_model, detect_data)
+                    success = True
+                elif key in self._pending:
+                    # 文件仍被占用，排在已积压的结果后面，保证写入顺序
+                    self._journal(key, sheet_name, product_model, detect_data, write=kind != "recover")
+                    self._pending[key].append((sheet_name, product_model, detect_data))
+                    success = True
+                else:
+                    if kind == "recover":
+                        self._journal(key, sheet_name, product_model, detect_data, write=False)
+                    success = self._write(key, [(sheet_name, product_model, detect_data)], journaled=kind == "recover")
+                # 恢复的结果在首次提交时已经计入汇总
+                if success and kind == "update" and self.summaries is not None:
+                    try:
+                        self.summaries.record(filename, sheet_name, product_model, detect_data)
+                    except Exception as e:
+                        print(f"更新汇总错误: {e}")
+                if self.on_done:
+                    self.on_done(product_model, success)
+            except Exception as e:
+                print(f"Excel回写线程错误: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, key, updates, journaled):
+        """
+        将一批结果写入同一个文件并只保存一次
+        :param journaled: 这些结果是否已记入旁路文件
+        :return: 写入成功或已转入积压返回True，其它错误返回False
+        """
+        try:
+            save_detection_results(key, updates, self.write_mode)
+        except Exception as e:
+            if not is_file_lock_error(e):
+                print(f"更新Excel文件错误: {e}")
+                return False
+            if key not in self._pending:
+                print(f"Excel文件被占用，结果暂存等待重试: {key}")
+            if not journaled:
+                for update in updates:
+                    self._journal(key, *update)
+            self._pending[key] = list(updates) + self._pending.get(key, [])
+            return True
+        
+        if journaled:
+            self._clear_journal(key)
+        return True
+
+    def _flush_cache(self, filename):
+        """保存缓存中的工作簿，被占用的文件留待重试"""
+        keys = [os.path.abspath(filename)] if filename else self.cache.cached_files()
+        for key in keys:
+            try:
+                if self.cache.save(key):
+                    self._unsaved.discard(key)
+                    if key not in self._pending:
+                        self._clear_journal(key)
+            except Exception as e:
+                if not is_file_lock_error(e):
+                    raise
+                if key not in self._unsaved:
+                    print(f"Excel文件被占用，缓存的结果等待重试: {key}")
+                self._unsaved.add(key)
+
+    def _retry(self):
+        """重试积压的文件，全部成功后恢复最小重试间隔，否则间隔加倍"""
+        for key in list(self._pending):
+            updates = self._pending.pop(key)
+            if not self._write(key, updates, journaled=True):
+                # 不是文件占用的错误（例如工作簿已损坏），再重试也不会成功：放弃这些结果并删除旁路文件中的记录，
+                # 缓存中还有未保存的结果时旁路文件留到缓存保存后删除
+                if key not in self._unsaved:
+                    self._clear_journal(key)
+                if self.on_done:
+                    for _, product_model, _ in updates:
+                        self.on_done(product_model, False)
+        for key in list(self._unsaved):
+            self._flush_cache(key)
+        if self._pending or self._unsaved:
+            self._retry_delay = min(self._retry_delay * 2, self.RETRY_MAX_DELAY)
+        else:
+            self._retry_delay = self.RETRY_MIN_DELAY
+
+    def _journal(self, key, sheet_name, product_model, detect_data, write=True):
+        """记入旁路文件并更新积压数量；write为False时记录已在旁路文件中"""
+        if write:
+            append_pending_update(key, sheet_name, product_model, detect_data)
+        self._journal_counts[key] = self._journal_counts.get(key, 0) + 1
+        self._report_backlog()
+
+    def _clear_journal(self, key):
+        clear_pending_updates(key)
+        if self._journal_counts.pop(key, None):
+            self._report_backlog()
+
+    def _report_backlog(self):
+        if self.on_backlog:
+            self.on_backlog(self.backlog_count())
+
+
+class BatchQueue:
+    """
+    多工作簿/多工作表批量检测队列
+    每个来源是一个（Excel文件, 工作表）组合，产品列表在轮到该来源时才读取，
+    工作簿通过WorkbookCache共享，同一文件的多个工作表只解析一次
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.sources = []
+        self.position = -1
+
+    def __len__(self):
+        return len(self.sources)
+
+    def add(self, filename, sheet_name=None):
+        """添加一个来源"""
+        self.sources.append({"filename": filename, "sheet_name": sheet_name, "products": None})
+
+    def clear(self):
+        self.sources = []
+        self.position = -1
+
+    def current(self):
+        """当前来源，尚未开始时返回None"""
+        if 0 <= self.position < len(self.sources):
+            return self.sources[self.position]
+        return None
+
+    def has_next(self):
+        return self.position + 1 < len(self.sources)
+
+    def advance(self):
+        """
+        切换到下一个来源并读取其产品列表
+        :return: 新的当前来源，没有更多来源时返回None
+        """
+        if not self.has_next():
+            return None
+        self.position += 1
+        source = self.sources[self.position]
+        if source["products"] is None:
+            source["products"] = read_product_models_from_excel(
+                source["filename"], source["sheet_name"], cache=self.cache)
+        return source
+
+    def used_later(self, filename):
+        """当前来源之后是否还会用到该文件（用于决定何时保存）"""
+        key = os.path.abspath(filename)
+        return any(os.path.abspath(source["filename"]) == key
+                   for source in self.sources[self.position + 1:])
+
+
+# 保留原有的CSV写入函数，便于向后兼容
+def write_to_csv(value, filename="density_data.csv", header=["密度值(g/ccm)"]):
+    """
+    将密度值写入CSV文件（向后兼容）
+    :param value: 要写入的密度值
+    :param filename: CSV文件名
+    :param header: CSV文件头
+    """
+    import csv
+    try:
+        # 检查文件是否存在
+        file_exists = os.path.exists(filename)
+        
+        # 写入数据
+        with open(filename, 'a', newline='', encoding='utf-8') as f:
+            # 使用明确的逗号分隔符
+            writer = csv.writer(f, delimiter=',')
+            # 如果文件是新的，先写入表头
+            if not file_exists:
+                writer.writerow(header)
+            # 写入密度值
+            writer.writerow([value])
+
+        print(f"成功将密度值 {value} 写入CSV文件: {filename}")
+
+    except Exception as e:
+        print(f"写入CSV文件错误: {e}")
+        # 打印更详细的错误信息
+        import traceback
+        traceback.print_exc()
+
+
+class CsvSink:
+    """
+    检测读数流式写入CSV
+    文件句柄保持打开并带缓冲，写满flush_bytes或距上次刷新超过flush_interval秒时刷新到磁盘
+    （没有新的写入时由flush_if_due定时检查）；
+    每天一个文件，单个文件超过max_bytes时换新文件（文件名加序号）。
+    每行一个读数：时间、产品型号、机台号、班次、读数序号、密度值。
+    """
+
+    HEADER = ["时间", "产品型号", "机台号", "班次", "读数序号", "密度值(g/ccm)"]
+
+    def __init__(self, directory="csv_logs", prefix="density_readings", max_bytes=10 * 1024 * 1024,
+                 flush_bytes=64 * 1024, flush_interval=5.0, clock=None):
+        """
+        :param directory: 输出目录，不存在时创建
+        :param prefix: 文件名前缀，文件名为 前缀_YYYYMMDD.csv、前缀_YYYYMMDD_1.csv ...
+        :param max_bytes: 单个文件的最大字节数
+        :param flush_bytes: 未刷新的数据达到该字节数时刷新
+        :param flush_interval: 距上次刷新超过该秒数时刷新
+        :param clock: 返回当前时间（datetime）的函数，默认datetime.now
+        """
+        from datetime import datetime
+        self.directory = directory
+        self.prefix = prefix
+        self.max_bytes = max_bytes
+        self.flush_bytes = flush_bytes
+        self.flush_interval = flush_interval
+        self.clock = clock or datetime.now
+        self.filename = None
+        self._file = None
+        self._day = None
+        self._size = 0
+        self._pending = 0
+        self._sequence = 0
+        self._last_flush = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, settings):
+        """按配置（CsvLogSettings）创建，未启用时返回None"""
+        if not settings.enabled:
+            return None
+        return cls(settings.directory, max_bytes=int(settings.max_size_mb * 1024 * 1024),
+                   flush_interval=settings.flush_interval)
+
+    def write(self, product_info, reading_index, value, timestamp=None):
+        """
+        写入一个读数
+        :param product_info: 产品信息（产品型号、机台号、班次）
+        :param reading_index: 第几次读数
+        :param value: 密度值，失败为None
+        :param timestamp: 读数时间（datetime），默认当前时间
+        """
+        timestamp = timestamp or self.clock()
+        row = [
+            timestamp.isoformat(sep=" ", timespec="milliseconds"),
+            product_info.get("产品型号", ""),
+            product_info.get("机台号", ""),
+            product_info.get("班次", ""),
+            reading_index,
+            "" if value is None else value,
+        ]
+        line = self._format(row)
+        with self._lock:
+            day = timestamp.strftime("%Y%m%d")
+            if self._file is None or day != self._day or self._size + len(line.encode("utf-8")) > self.max_bytes:
+                self._rotate(day)
+            self._file.write(line)
+            size = len(line.encode("utf-8"))
+            self._size += size
+            self._pending += size
+            now = time.monotonic()
+            if self._pending >= self.flush_bytes or now - self._last_flush >= self.flush_interval:
+                self._flush(now)
+
+    @staticmethod
+    def _format(row):
+        import csv
+        import io
+        buffer = io.StringIO()
+        csv.writer(buffer, lineterminator="\n").writerow(row)
+        return buffer.getvalue()
+
+    def _rotate(self, day):
+        if self._file is not None:
+            self._file.close()
+        os.makedirs(self.directory, exist_ok=True)
+        if day != self._day:
+            self._day = day
+            sequence = 0
+        else:
+            sequence = self._sequence + 1
+        # 跳过当天已写满的文件（例如程序重启后）
+        while True:
+            suffix = f"_{sequence}" if sequence else ""
+            filename = os.path.join(self.directory, f"{self.prefix}_{day}{suffix}.csv")
+            size = os.path.getsize(filename) if os.path.exists(filename) else 0
+            if size < self.max_bytes:
+                break
+            sequence += 1
+        self._sequence = sequence
+        self.filename = filename
+        self._file = open(filename, "a", newline="", encoding="utf-8", buffering=max(self.flush_bytes, 8192))
+        # 按打开后的实际大小计算，文件在检查后被其它程序追加过也不会超出max_bytes太多
+        size = self._size = os.path.getsize(filename)
+        if size == 0:
+            header = self._format(self.HEADER)
+            self._file.write(header)
+            self._size = len(header.encode("utf-8"))
+        self._pending = 0
+        self._last_flush = time.monotonic()
+
+    def _flush(self, now):
+        self._file.flush()
+        self._pending = 0
+        self._last_flush = now
+
+    def flush(self):
+        with self._lock:
+            if self._file is not None:
+                self._flush(time.monotonic())
+
+    def flush_if_due(self):
+        """
+        有未刷新的数据且距上次刷新超过flush_interval秒时刷新
+        write只在写入时检查刷新间隔，最后几个读数之后没有新的写入时由界面定时调用
+        """
+        with self._lock:
+            if self._file is not None and self._pending:
+                now = time.monotonic()
+                if now - self._last_flush >= self.flush_interval:
+                    self._flush(now)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+                self._day = None
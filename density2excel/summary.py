@@ -0,0 +1,207 @@
+"""
+班次、机台汇总
+
+回写线程每写入一个产品的结果，就按 (班次, 机台号) 增量更新该工作簿的统计：数量、均值、标准差（Welford算法）
+和超出规格（规格判定为不合格，与L列的判定一致）的数量。汇总随时可以直接读取，不必重新扫描工作表。
+每次更新同时追加到工作簿旁的 <工作簿>.summary.jsonl，程序重启后回放该文件恢复统计；
+同一产品（工作表 + 回写的行号，没有行号时为产品型号）重新检测时，先去掉旧结果再计入新结果，
+同一型号的多行各自计入。
+"""
+
+import json
+import os
+import threading
+import zipfile
+
+from .records import DENSITY_KEYS
+from .spec import FAIL, JUDGEMENT_KEY
+from .stats import RunningStats
+from .xlsx import detection_row
+
+
+def summary_filename(excel_filename):
+    """工作簿对应的汇总记录文件"""
+    return os.path.abspath(excel_filename) + ".summary.jsonl"
+
+
+def resolve_sheet_name(filename, sheet_name):
+    """
+    汇总中使用的工作表名称：为None时取活动工作表的名称，
+    回写时未指定工作表和重新统计活动工作表得到同一个键，同一产品不会重复计入
+    """
+    if sheet_name:
+        return sheet_name
+    from .xlsx import active_sheet_name
+    try:
+        return active_sheet_name(filename)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return ""
+
+
+class GroupSummary:
+    """一组产品（同一班次、同一机台）平均值的统计"""
+
+    __slots__ = ("stats", "out_of_spec")
+
+    def __init__(self):
+        self.stats = RunningStats()
+        self.out_of_spec = 0
+
+    def add(self, value, out_of_spec):
+        self.stats.add(value)
+        self.out_of_spec += bool(out_of_spec)
+
+    def remove(self, value, out_of_spec):
+        self.stats.remove(value)
+        self.out_of_spec -= bool(out_of_spec)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.out_of_spec += other.out_of_spec
+        return self
+
+    def to_dict(self):
+        stats = self.stats
+        return {"count": stats.count, "mean": stats.mean if stats.count else None, "sd": stats.stdev,
+                "out_of_spec": self.out_of_spec}
+
+
+class SummaryStore:
+    """各工作簿的增量汇总，可以在多个线程中调用"""
+
+    def __init__(self, judge=None):
+        """
+        :param judge: 判定函数 judge(product_model, density_values, average) -> 合格/不合格/None（SpecTable.judge），
+                      检测数据中已有判定（回写到L列的"判定"）时直接使用，为None时只统计已有的判定
+        """
+        self.judge = judge
+        self._books = {}
+        self._lock = threading.Lock()
+
+    def _book(self, key):
+        """工作簿的统计，首次访问时回放汇总记录文件"""
+        book = self._books.get(key)
+        if book is None:
+            book = self._books[key] = {"groups": {}, "products": {}}
+            try:
+                with open(summary_filename(key), encoding="utf-8") as f:
+                    for line in f:
+                        try:
+                            self._apply(book, json.loads(line))
+                        except (ValueError, KeyError, TypeError):
+                            continue  # 写入中断留下的不完整行
+            except FileNotFoundError:
+                pass
+        return book
+
+    @staticmethod
+    def _apply(book, entry):
+        product_key = (entry["sheet"], entry.get("row") or entry["model"])
+        previous = book["products"].pop(product_key, None)
+        if previous is not None:
+            book["groups"][previous["group"]].remove(previous["average"], previous["out"])
+        if entry["average"] is None:
+            return
+        group = (entry["shift"], entry["machine"])
+        summary = book["groups"].get(group)
+        if summary is None:
+            summary = book["groups"][group] = GroupSummary()
+        summary.add(entry["average"], entry["out"])
+        book["products"][product_key] = {"group": group, "average": entry["average"], "out": entry["out"]}
+
+    def _entry(self, sheet_name, product_model, detect_data):
+        model = str(product_model).strip()
+        average = detect_data.get("平均值")
+        average = float(average) if isinstance(average, (int, float)) else None
+        judgement = detect_data.get(JUDGEMENT_KEY)
+        if judgement is None and self.judge is not None and average is not None:
+            judgement = self.judge(model, [detect_data.get(key) for key in DENSITY_KEYS], average)
+        return {
+            "sheet": sheet_name or "",
+            "row": detection_row(detect_data),
+            "model": model,
+            "shift": str(detect_data.get("班次") or ""),
+            "machine": str(detect_data.get("机台号") or ""),
+            "average": average,
+            "out": judgement == FAIL,
+        }
+
+    def record(self, filename, sheet_name, product_model, detect_data):
+        """
+        计入一个产品的结果（回写时调用）
+        :param filename: Excel文件名
+        :param sheet_name: 工作表名称，为None时为活动工作表
+        :param product_model: 产品型号
+        :param detect_data: 检测数据字典
+        """
+        entry = self._entry(resolve_sheet_name(filename, sheet_name), product_model, detect_data)
+        key = os.path.abspath(filename)
+        with self._lock:
+            self._apply(self._book(key), entry)
+            with open(summary_filename(key), "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def rebuild(self, filename, sheet_name=None):
+        """
+        扫描一次工作表重建汇总（用于启用汇总之前已有的检测结果），替换原有的汇总记录
+        :return: 计入的产品数
+        """
+        from .storage import read_detection_history
+        sheet_name = resolve_sheet_name(filename, sheet_name)
+        entries = [self._entry(sheet_name, record.model, record) for record in
+                   read_detection_history(filename, sheet_name)]
+        key = os.path.abspath(filename)
+        with self._lock:
+            book = self._books[key] = {"groups": {}, "products": {}}
+            journal = summary_filename(key)
+            temp_filename = journal + ".tmp"
+            with open(temp_filename, "w", encoding="utf-8") as f:
+                for entry in entries:
+                    self._apply(book, entry)
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            os.replace(temp_filename, journal)
+        return len(book["products"])
+
+    def report(self, filename):
+        """
+        汇总报表
+        :return: {"groups": [{"shift", "machine", "count", "mean", "sd", "out_of_spec"}, ...]（按班次、机台排序）,
+                  "shifts": {班次: 统计}, "machines": {机台号: 统计}, "total": 统计}
+        """
+        with self._lock:
+            groups = self._book(os.path.abspath(filename))["groups"]
+            shifts, machines, total = {}, {}, GroupSummary()
+            rows = []
+            for (shift, machine), summary in sorted(groups.items()):
+                if not summary.stats.count:
+                    continue
+                rows.append({"shift": shift, "machine": machine, **summary.to_dict()})
+                shifts.setdefault(shift, GroupSummary()).merge(summary)
+                machines.setdefault(machine, GroupSummary()).merge(summary)
+                total.merge(summary)
+            return {
+                "groups": rows,
+                "shifts": {shift: summary.to_dict() for shift, summary in shifts.items()},
+                "machines": {machine: summary.to_dict() for machine, summary in machines.items()},
+                "total": total.to_dict(),
+            }
+
+
+def format_report(report):
+    """汇总报表转换为文本行（命令行输出用）"""
+
+    def describe(stats):
+        mean = f"{stats['mean']:.4f}" if stats["mean"] is not None else "--"
+        sd = f"{stats['sd']:.4f}" if stats["sd"] is not None else "--"
+        return f"{stats['count']} 个，均值 {mean}，标准差 {sd}，超出规格 {stats['out_of_spec']}"
+
+    lines = []
+    for shift in sorted(report["shifts"]):
+        lines.append(f"班次 {shift or '--'}: {describe(report['shifts'][shift])}")
+        for group in report["groups"]:
+            if group["shift"] == shift:
+                lines.append(f"  机台 {group['machine'] or '--'}: {describe(group)}")
+    for machine in sorted(report["machines"]):
+        lines.append(f"机台 {machine or '--'} 合计: {describe(report['machines'][machine])}")
+    lines.append(f"合计: {describe(report['total'])}")
+    return lines
@@ -0,0 +1,228 @@
+"""
+读数趋势图
+
+每个机台一条读数序列，按画布的像素列抽稀：每列只保存该列读数的最小值和最大值，
+列数超过画布宽度时相邻两列合并，内存和绘制量只与画布宽度有关，与读数数量无关。
+画布大小变化时按新的宽度确定列数：变窄时立即合并，变宽时已合并的列无法拆开，之后的读数用上增加的宽度。
+新读数只修改最后一列的图形（或新增一列），控制限（均值±3倍标准差）随读数增量更新，
+只有列合并或纵轴范围不够时才整体重绘。
+"""
+
+import tkinter as tk
+from tkinter import ttk
+
+from .stats import RunningStats
+
+
+class DecimatedSeries:
+    """按列抽稀的读数序列，每列为 [最小值, 最大值]"""
+
+    __slots__ = ("max_columns", "bucket", "columns", "count", "stats")
+
+    def __init__(self, max_columns=400):
+        self.max_columns = max_columns
+        self.bucket = 1  # 每列包含的读数数量
+        self.columns = []
+        self.count = 0
+        self.stats = RunningStats()
+
+    def add(self, value):
+        """
+        追加一个读数
+        :return: "update"（修改了最后一列）、"append"（新增一列）或 "rebuild"（列已合并，需要重绘）
+        """
+        self.stats.add(value)
+        if self.count % self.bucket:
+            column = self.columns[-1]
+            column[0] = min(column[0], value)
+            column[1] = max(column[1], value)
+            action = "update"
+        else:
+            self.columns.append([value, value])
+            action = "append"
+        self.count += 1
+        if self._merge():
+            action = "rebuild"
+        return action
+
+    def resize(self, max_columns):
+        """
+        按画布的新宽度设置列数，列数超出时合并
+        :return: 是否合并了列
+        """
+        self.max_columns = max_columns
+        return self._merge()
+
+    def _merge(self):
+        """相邻两列合并，直到列数不超过max_columns"""
+        merged = False
+        while len(self.columns) > self.max_columns:
+            self.columns = [
+                [min(column[0] for column in pair), max(column[1] for column in pair)]
+                for pair in (self.columns[i:i + 2] for i in range(0, len(self.columns), 2))
+            ]
+            self.bucket *= 2
+            merged = True
+        return merged
+
+    def limits(self):
+        """
+        控制限
+        :return: (中心线, 下控制限, 上控制限)，少于两个读数时为None
+        """
+        if self.stats.count < 2:
+            return None
+        sd = self.stats.stdev
+        return self.stats.mean, self.stats.mean - 3 * sd, self.stats.mean + 3 * sd
+
+
+class TrendChart(ttk.Frame):
+    """每个机台一张读数趋势图，add在界面线程中调用"""
+
+    PADDING = 30
+    MIN_COLUMNS = 50  # 窗口最小化等极窄的画布不按实际宽度合并，避免丢失已有的细节
+    LIMIT_COLORS = {"center": "#34c759", "lower": "#ff3b30", "upper": "#ff3b30"}
+
+    def __init__(self, parent, width=400, height=150):
+        super().__init__(parent)
+        self.max_columns = self._columns_for(width)
+        self.series = {}
+        self.current = None
+        self._column_items = []
+        self._limit_items = {}
+        self._y_range = None
+
+        header = ttk.Frame(self)
+        header.pack(fill=tk.X)
+        ttk.Label(header, text="机台:").pack(side=tk.LEFT, padx=5)
+        self.machine_var = tk.StringVar()
+        self.machine_combo = ttk.Combobox(header, textvariable=self.machine_var, state="readonly", width=10)
+        self.machine_combo.pack(side=tk.LEFT)
+        self.machine_combo.bind("<<ComboboxSelected>>", lambda event: self.show(self.machine_var.get()))
+        self.follow_var = tk.BooleanVar(value=True)
+        ttk.Checkbutton(header, text="跟随当前机台", variable=self.follow_var).pack(side=tk.LEFT, padx=5)
+        ttk.Button(header, text="清空", command=self.clear).pack(side=tk.RIGHT, padx=5)
+        self.summary_var = tk.StringVar(value="")
+        ttk.Label(header, textvariable=self.summary_var).pack(side=tk.RIGHT, padx=5)
+
+        self.canvas = tk.Canvas(self, width=width, height=height, background="#ffffff", highlightthickness=0)
+        self.canvas.pack(fill=tk.BOTH, expand=True)
+        self.canvas.bind("<Configure>", self._on_resize)
+
+    def add(self, machine, value):
+        """追加一个读数（机台号为空时归入"未知"）"""
+        machine = str(machine) if machine not in (None, "") else "未知"
+        series = self.series.get(machine)
+        if series is None:
+            series = self.series[machine] = DecimatedSeries(self.max_columns)
+            self.machine_combo.config(values=sorted(self.series))
+        action = series.add(value)
+        if machine != self.current:
+            if self.current is None or self.follow_var.get():
+                self.show(machine)
+            return
+        if action == "rebuild" or not self._fits(series, value):
+            self.redraw()
+            return
+        if action == "append":
+            self._column_items.append(self._draw_column(len(series.columns) - 1, series.columns[-1]))
+        else:
+            self.canvas.coords(self._column_items[-1],
+                               *self._column_coords(len(series.columns) - 1, series.columns[-1]))
+        self._update_limits(series)
+
+    def show(self, machine):
+        """切换显示的机台"""
+        self.current = machine
+        self.machine_var.set(machine)
+        self.redraw()
+
+    def clear(self):
+        """清空全部机台的读数（例如换班时）"""
+        self.series.clear()
+        self.current = None
+        self.machine_var.set("")
+        self.machine_combo.config(values=[])
+        self.redraw()
+
+    def _columns_for(self, width):
+        """画布宽度对应的列数：纵轴标签右侧每个像素一列"""
+        return max(self.MIN_COLUMNS, int(width) - self.PADDING)
+
+    def _on_resize(self, event):
+        """画布大小变化时按新的宽度确定各机台的列数，再整体重绘"""
+        self.max_columns = self._columns_for(event.width)
+        for series in self.series.values():
+            series.resize(self.max_columns)
+        self.redraw()
+
+    def _fits(self, series, value):
+        limits = series.limits() or ()
+        low, high = self._y_range or (None, None)
+        return low is not None and all(low <= v <= high for v in (value, *limits))
+
+    def _canvas_size(self):
+        """画布当前的实际大小，尚未显示（winfo为1）时使用创建时的大小"""
+        width, height = self.canvas.winfo_width(), self.canvas.winfo_height()
+        if width <= 1 or height <= 1:
+            return int(self.canvas["width"]), int(self.canvas["height"])
+        return width, height
+
+    def _y(self, value):
+        low, high = self._y_range
+        height = self._canvas_size()[1]
+        usable = height - 2 * self.PADDING / 3
+        return self.PADDING / 3 + (high - value) / (high - low) * usable
+
+    def _x(self, index):
+        """第index列的横坐标：max_columns列均匀铺满画布当前宽度（调整大小后每列一个像素）"""
+        width = self._canvas_size()[0]
+        return self.PADDING + index * (width - self.PADDING) / self.max_columns
+
+    def _column_coords(self, index, column):
+        x = self._x(index)
+        top, bottom = self._y(column[1]), self._y(column[0])
+        if bottom - top < 2:
+            top, bottom = top - 1, bottom + 1
+        return x, top, x, bottom
+
+    def _draw_column(self, index, column):
+        return self.canvas.create_line(*self._column_coords(index, column), fill="#007aff", width=2, tags="series")
+
+    def _update_limits(self, series):
+        limits = series.limits()
+        if limits is None:
+            return
+        width = self._canvas_size()[0]
+        for name, value in zip(("center", "lower", "upper"), limits):
+            y = self._y(value)
+            item = self._limit_items.get(name)
+            if item is None:
+                self._limit_items[name] = self.canvas.create_line(
+                    self.PADDING, y, width, y, fill=self.LIMIT_COLORS[name], dash=(4, 2), tags="limits")
+            else:
+                self.canvas.coords(item, self.PADDING, y, width, y)
+        mean, lower, upper = limits
+        self.summary_var.set(f"n={series.count}  均值 {mean:.4f}  控制限 {lower:.4f}~{upper:.4f}")
+
+    def redraw(self):
+        """整体重绘当前机台（切换机台、列合并、纵轴范围变化或画布大小变化时）"""
+        self.canvas.delete("all")
+        self._column_items = []
+        self._limit_items = {}
+        series = self.series.get(self.current)
+        if series is None or not series.columns:
+            self._y_range = None
+            self.summary_var.set("")
+            return
+        values = [v for column in series.columns for v in column] + list(series.limits() or ())
+        low, high = min(values), max(values)
+        margin = (high - low) * 0.25 or max(abs(high) * 0.01, 0.001)
+        self._y_range = (low - margin, high + margin)
+        for label_value in self._y_range:
+            self.canvas.create_text(2, self._y(label_value), text=f"{label_value:.3f}", anchor=tk.W,
+                                    font=("Segoe UI", 7), fill="#8e8e93")
+        self._column_items = [self._draw_column(index, column) for index, column in enumerate(series.columns)]
+        self._update_limits(series)
+        if series.limits() is None:
+            self.summary_var.set(f"n={series.count}")
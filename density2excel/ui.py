@@ -0,0 +1,1521 @@
+"""
+密度检测系统图形界面
+"""
+
+import os
+import threading
+import time
+import tkinter as tk
+from dataclasses import replace
+from datetime import datetime
+from tkinter import ttk, scrolledtext, messagebox
+from tkinter import filedialog
+
+from . import STARTUP_T0
+from .capture import CaptureRecorder
+from .config import (
+    DEFAULT_CONFIG_FILE,
+    AppConfig,
+    ConfigWatcher,
+    SerialSettings,
+    ensure_config_file,
+    load_config,
+    save_serial_settings,
+)
+from .connection import STATE_CONNECTED, SerialSupervisor
+from .discovery import autodetect_serial, find_cached_port
+from .notify import NotificationArea, beep
+from .archive import ResultArchive
+from .engine import DetectionEngine
+from .provenance import read_provenance
+from .records import build_product_index, find_scanned_product
+from .session import SessionCheckpointer, load_session_checkpoint, clear_session_checkpoint
+from .spec import FAIL, load_spec_table
+from .storage import (
+    BatchQueue,
+    CsvSink,
+    ExcelWriteWorker,
+    list_excel_sheets,
+    read_product_models_from_excel,
+)
+from .summary import SummaryStore
+from .trend import TrendChart
+
+
+class DensityDetectGUI:
+    def __init__(self, root, measure_startup=False):
+        """
+        :param root: Tk根窗口
+        :param measure_startup: 启动计时模式，输出首次绘制和产品列表加载耗时后自动退出
+        """
+        self.root = root
+        self.measure_startup = measure_startup
+        self.root.title("密度检测系统")
+        self.root.geometry("1000x700")
+        self.root.resizable(True, True)
+        
+        # 设置mac风格主题
+        self.configure_styles()
+        
+        # 读取配置文件（不存在时创建默认配置），串口参数和检测方案都从配置对象获取
+        self.config_file = DEFAULT_CONFIG_FILE
+        try:
+            ensure_config_file(self.config_file)
+            self.app_config = load_config(self.config_file)
+        except Exception as e:
+            print(f"配置文件无效，使用默认配置: {e}")
+            self.app_config = AppConfig()
+        
+        self.excel_filename = "density_data.xlsx"
+        self.product_info_list = []
+        self.product_index = {}  # 产品型号 -> 序号，扫码时查找
+        self.product_items = []  # 与product_info_list一一对应的列表项ID
+        self.current_product_index = 0
+        self.density_values = []
+        self.detect_time = None
+        self.completed_indices = set()  # 本次会话已完成的产品序号
+        self.resume_state = None  # 从断点恢复的当前产品部分读数
+        self.detecting = False
+        self.auto_mode = False  # 全自动模式标志
+        # 产品规格表（[Spec]配置）启动时读入散列索引，每个读数和平均值到达时直接查找判定
+        self.spec_table = load_spec_table(self.app_config)
+        self.spec_source = self.spec_key(self.app_config)
+        # 检测结果交给独立线程回写Excel，采集线程不等待磁盘；写入时顺带更新班次、机台汇总
+        self.summaries = SummaryStore(judge=self.spec_judge)
+        self.excel_writer = ExcelWriteWorker(on_done=self.on_excel_written, on_backlog=self.on_excel_backlog,
+                                             write_mode=self.app_config.profile.write_mode,
+                                             summaries=self.summaries)
+        # 多工作簿/多工作表批量队列，与回写线程共用工作簿缓存
+        self.batch_queue = BatchQueue(self.excel_writer.cache)
+        self.batch_active = False
+        
+        # 创建界面组件
+        self.create_widgets()
+        if self.app_config.spec.file:
+            self.log_message(f"规格表: {len(self.spec_table)} 个产品型号")
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # 配置文件修改后自动重新加载，下一次读取串口即使用新参数
+        self.config_watcher = ConfigWatcher(
+            self.config_file,
+            on_change=lambda config: self.root.after(0, self.apply_config, config),
+            on_error=lambda error: self.root.after(0, self.log_message, f"配置文件无效，继续使用原配置: {error}")
+        ).start()
+        
+        # 串口由监控线程常开读取，拔线后自动重连，设备换了COM号也能找回
+        self.serial_supervisor = SerialSupervisor(
+            lambda: self.app_config.serial,
+            on_state=lambda state, message: self.root.after(0, self.on_serial_state, state, message),
+            relocate=self.relocate_instrument
+        )
+        # 收到的原始字节全部录制到capture_dir，解析出错时可以回放复现
+        self.capture_recorder = None
+        self.serial_supervisor.add_listener(self.record_serial_data)
+        self.serial_supervisor.start()
+        self.root.after(1000, self.poll_connection)
+        # 每个读数追加一行到CSV日志（[CsvLog]配置）
+        self.csv_sink = None
+        self.csv_settings = None
+        # 每个产品的结果追加到二进制归档（[Archive]配置）
+        self.result_archive = None
+        self.archive_settings = None
+        # 采集循环由检测引擎执行（与命令行、HTTP服务相同），事件经root.after交给界面线程
+        self.engine = DetectionEngine(
+            self.read_serial_with_config, self.app_config, self.excel_writer, on_event=self.on_engine_event,
+            before_reading=self.serial_supervisor.clear, spec=self.spec_table, provenance=True,
+            log=lambda message: self.root.after(0, self.log_message, message)
+        )
+        self.checkpointer = None  # 当前运行的断点保存，开始检测时创建
+        
+        # 配置了扫描枪串口时在后台读取条码
+        self.scanner = None
+        self.update_scanner()
+        
+        # 先让窗口完成首次绘制，再在后台线程读取Excel文件，
+        # 读取完成后检查上次未写入的结果和未完成的会话
+        self.root.after_idle(self.on_first_paint)
+    
+    def configure_styles(self):
+        """配置mac风格的ttk样式"""
+        self.style = ttk.Style()
+        # 尝试使用clam主题，这是最接近mac风格的内置主题
+        try:
+            self.style.theme_use("clam")
+        except:
+            pass
+        
+        # Mac风格的颜色方案
+        self.mac_colors = {
+            "background": "#f2f2f7",
+            "surface": "#ffffff",
+            "text": "#000000",
+            "primary": "#007aff",
+            "secondary": "#8e8e93",
+            "border": "#c6c6c8",
+            "hover": "#0051d5",
+            "active": "#e5e5ea",
+            "danger": "#ff3b30"
+        }
+        
+        # 自定义mac风格颜色和字体
+        self.style.configure(
+            "TFrame"
+        )
+        
+        self.style.configure(
+            "TLabel", 
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10)
+        )
+        
+        self.style.configure(
+            "TButton", 
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10),
+            padding=8,
+            relief="flat",
+            borderwidth=0
+        )
+        
+        self.style.map(
+            "TButton", 
+            foreground=[
+                ("active", self.mac_colors["surface"]),
+                ("!active", self.mac_colors["text"])
+            ]
+        )
+        
+        self.style.configure(
+            "TEntry", 
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10),
+            relief="flat",
+            borderwidth=1,
+            bordercolor=self.mac_colors["border"],
+            lightcolor=self.mac_colors["primary"],
+            darkcolor=self.mac_colors["primary"]
+        )
+        
+        self.style.configure(
+            "TCombobox", 
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10),
+            relief="flat",
+            borderwidth=1,
+            bordercolor=self.mac_colors["border"]
+        )
+        
+        self.style.configure(
+            "TCombobox.Listbox",
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10),
+            relief="flat"
+        )
+        
+        self.style.map(
+            "TCombobox",
+            arrowcolor=[("active", self.mac_colors["primary"])]
+        )
+        
+        self.style.configure(
+            "TLabelFrame", 
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 11, "bold"),
+            relief="flat",
+            borderwidth=1,
+            bordercolor=self.mac_colors["border"]
+        )
+        
+        self.style.configure(
+            "Treeview",
+            font=("Segoe UI", 10)
+        )
+        
+        self.style.configure(
+            "Treeview.Heading",
+            font=("Segoe UI", 10, "bold")
+        )
+        
+
+        
+
+        
+        self.style.configure(
+            "Vertical.TScrollbar",
+            relief="flat",
+            borderwidth=0
+        )
+        
+        # 窗口背景色使用默认设置
+        
+        # 尝试设置窗口透明度（如果支持）
+        try:
+            self.root.attributes("-alpha", 0.98)
+        except:
+            pass
+        
+    def on_first_paint(self):
+        """窗口首次绘制后开始加载Excel文件"""
+        self.root.update_idletasks()
+        self.report_startup_time("首次绘制")
+        self.load_excel_file(on_loaded=self.on_startup_loaded)
+    
+    def on_startup_loaded(self):
+        """启动时的产品列表加载完成"""
+        self.report_startup_time("产品列表加载完成")
+        if self.measure_startup:
+            self.root.after_idle(self.on_close)
+            return
+        self.recover_pending_results()
+        self.offer_resume()
+    
+    def report_startup_time(self, stage):
+        """启动计时模式下输出从进程启动到当前阶段的耗时"""
+        if self.measure_startup:
+            elapsed = time.perf_counter() - STARTUP_T0
+            print(f"[startup] {stage}: {elapsed * 1000:.1f} ms")
+            self.log_message(f"启动计时 - {stage}: {elapsed * 1000:.1f} ms")
+    
+    def create_widgets(self):
+        # 创建主框架
+        main_frame = ttk.Frame(self.root, padding="10")
+        main_frame.grid(row=0, column=0, sticky=(tk.W, tk.E, tk.N, tk.S))
+        
+        # 配置网格布局
+        self.root.columnconfigure(0, weight=1)
+        self.root.rowconfigure(0, weight=1)
+        main_frame.columnconfigure(0, weight=1)
+        main_frame.rowconfigure(1, weight=1)
+        main_frame.rowconfigure(3, weight=1)
+        
+        # 1. 标题区域
+        title_frame = ttk.Frame(main_frame)
+        title_frame.grid(row=0, column=0, sticky=(tk.W, tk.E))
+        
+        self.title_label = ttk.Label(title_frame, text="密度检测系统", font=(("Segoe UI", 16, "bold")),
+                                    foreground=self.mac_colors["text"])
+        self.title_label.pack(side=tk.LEFT, padx=5)
+        
+        # 提示信息标签
+        self.prompt_label = ttk.Label(title_frame, text="", font=(("Segoe UI", 12, "bold")), foreground="red")
+        self.prompt_label.pack(side=tk.LEFT, padx=20)
+        
+        self.status_label = ttk.Label(title_frame, text="就绪", font=(("Segoe UI", 10)))
+        self.status_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 后台加载Excel文件时显示的进度条
+        self.load_progress = ttk.Progressbar(title_frame, mode="indeterminate", length=120)
+        
+        # 工作簿被占用时显示积压的结果数量
+        self.backlog_label = ttk.Label(title_frame, text="", font=(("Segoe UI", 10)), foreground="red")
+        self.backlog_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 串口连接状态、数据速率和距上一帧的时间
+        self.connection_label = ttk.Label(title_frame, text="串口: 连接中", font=(("Segoe UI", 10)))
+        self.connection_label.pack(side=tk.RIGHT, padx=5)
+        
+        # 2. 产品列表区域
+        product_frame = ttk.LabelFrame(main_frame, text="产品型号列表", padding="5")
+        product_frame.grid(row=1, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        
+        # Excel文件路径选择
+        file_frame = ttk.Frame(product_frame)
+        file_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        self.excel_path_var = tk.StringVar(value=self.excel_filename)
+        self.excel_path_entry = ttk.Entry(file_frame, textvariable=self.excel_path_var, width=60)
+        self.excel_path_entry.pack(side=tk.LEFT, padx=5)
+        
+        self.browse_button = ttk.Button(file_frame, text="浏览", command=self.browse_excel_file)
+        self.browse_button.pack(side=tk.LEFT, padx=5)
+        
+        self.load_button = ttk.Button(file_frame, text="加载", command=self.load_excel_file)
+        self.load_button.pack(side=tk.LEFT, padx=5)
+        
+        # 工作表选择和批量队列
+        ttk.Label(file_frame, text="工作表: ").pack(side=tk.LEFT, padx=5)
+        self.sheet_var = tk.StringVar(value="")
+        self.sheet_combo = ttk.Combobox(file_frame, textvariable=self.sheet_var, width=12, state="readonly")
+        self.sheet_combo.pack(side=tk.LEFT, padx=5)
+        self.sheet_combo.bind("<<ComboboxSelected>>", lambda event: self.load_excel_file())
+        
+        self.enqueue_button = ttk.Button(file_frame, text="加入队列", command=self.enqueue_source)
+        self.enqueue_button.pack(side=tk.LEFT, padx=5)
+        
+        self.start_batch_button = ttk.Button(file_frame, text="开始队列", command=self.start_batch)
+        self.start_batch_button.pack(side=tk.LEFT, padx=5)
+        
+        self.clear_queue_button = ttk.Button(file_frame, text="清空队列", command=self.clear_batch_queue)
+        self.clear_queue_button.pack(side=tk.LEFT, padx=5)
+        
+        self.queue_label = ttk.Label(file_frame, text="队列: 0 个来源")
+        self.queue_label.pack(side=tk.LEFT, padx=5)
+        
+        # 扫码选择产品：键盘式扫描枪直接输入到这里，回车后跳到对应的产品并开始检测
+        scan_frame = ttk.Frame(product_frame)
+        scan_frame.pack(fill=tk.X, padx=5)
+        ttk.Label(scan_frame, text="扫码:").pack(side=tk.LEFT, padx=5)
+        self.scan_var = tk.StringVar()
+        self.scan_entry = ttk.Entry(scan_frame, textvariable=self.scan_var, width=30)
+        self.scan_entry.pack(side=tk.LEFT, padx=5)
+        self.scan_entry.bind("<Return>", self.on_scan_entered)
+        
+        # 产品列表
+        list_frame = ttk.Frame(product_frame)
+        list_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        # 列表控件
+        self.product_list = ttk.Treeview(list_frame, columns=("产品型号", "机台号", "来样时间", "班次"), show="headings")
+        self.product_list.heading("产品型号", text="产品型号")
+        self.product_list.heading("机台号", text="机台号")
+        self.product_list.heading("来样时间", text="来样时间")
+        self.product_list.heading("班次", text="班次")
+        
+        # 绑定事件，确保所有行都使用统一的背景色
+        self.product_list.bind("<Configure>", self.on_tree_configure)
+        self.product_list.bind("<<TreeviewSelect>>", self.on_tree_select)
+        
+        self.product_list.tag_configure("done", foreground=self.mac_colors["secondary"])
+        self.product_list.tag_configure("fail", foreground=self.mac_colors["danger"])
+        self.product_list.column("产品型号", width=150)
+        self.product_list.column("机台号", width=100)
+        self.product_list.column("来样时间", width=150)
+        self.product_list.column("班次", width=100)
+        
+        # 滚动条
+        scrollbar = ttk.Scrollbar(list_frame, orient=tk.VERTICAL, command=self.product_list.yview)
+        self.product_list.configure(yscroll=scrollbar.set)
+        
+        # 布局
+        self.product_list.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 3. 控制区域
+        control_frame = ttk.Frame(main_frame)
+        control_frame.grid(row=2, column=0, sticky=(tk.W, tk.E), pady=5)
+        
+        self.start_button = ttk.Button(control_frame, text="开始检测", command=self.start_detection)
+        self.start_button.pack(side=tk.LEFT, padx=5)
+        
+        self.stop_button = ttk.Button(control_frame, text="停止检测", command=self.stop_detection, state=tk.DISABLED)
+        self.stop_button.pack(side=tk.LEFT, padx=5)
+        
+        self.next_button = ttk.Button(control_frame, text="下一个产品", command=self.next_product)
+        self.next_button.pack(side=tk.LEFT, padx=5)
+        
+        self.reset_button = ttk.Button(control_frame, text="重置", command=self.reset_detection)
+        self.reset_button.pack(side=tk.LEFT, padx=5)
+        
+        self.provenance_button = ttk.Button(control_frame, text="读数记录", command=self.show_provenance)
+        self.provenance_button.pack(side=tk.LEFT, padx=5)
+        
+        self.summary_button = ttk.Button(control_frame, text="班次汇总", command=self.show_summary)
+        self.summary_button.pack(side=tk.LEFT, padx=5)
+        
+        # 全自动模式复选框
+        self.auto_mode_var = tk.BooleanVar(value=False)
+        self.auto_mode_check = ttk.Checkbutton(control_frame, text="全自动模式", variable=self.auto_mode_var, command=self.toggle_auto_mode)
+        # 设置Checkbutton样式
+        self.style.configure(
+            "TCheckbutton",
+            foreground=self.mac_colors["text"],
+            font=("Segoe UI", 10)
+        )
+        self.style.map(
+            "TCheckbutton",
+            foreground=[("active", self.mac_colors["text"])]
+        )
+        self.auto_mode_check.pack(side=tk.LEFT, padx=5)
+        
+        # 仅检测未完成的产品，跳过已有检测时间和平均值的行
+        self.pending_only_var = tk.BooleanVar(value=False)
+        self.pending_only_check = ttk.Checkbutton(control_frame, text="仅检测未完成", variable=self.pending_only_var)
+        self.pending_only_check.pack(side=tk.LEFT, padx=5)
+        
+        # 串口配置
+        serial_frame = ttk.LabelFrame(control_frame, text="串口配置", padding="5")
+        serial_frame.pack(side=tk.RIGHT, padx=5)
+        
+        # 串口名称
+        serial_row1 = ttk.Frame(serial_frame)
+        serial_row1.pack(fill=tk.X, pady=2)
+        ttk.Label(serial_row1, text="串口: ").pack(side=tk.LEFT, padx=5)
+        self.serial_port_var = tk.StringVar(value=self.app_config.serial.port)
+        self.serial_port_entry = ttk.Entry(serial_row1, textvariable=self.serial_port_var, width=10)
+        self.serial_port_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 自动识别仪器串口和通信格式
+        self.autodetect_button = ttk.Button(serial_row1, text="自动检测", command=self.autodetect_serial_port)
+        self.autodetect_button.pack(side=tk.LEFT, padx=5)
+        
+        # 波特率
+        ttk.Label(serial_row1, text="波特率: ").pack(side=tk.LEFT, padx=5)
+        self.baudrate_var = tk.IntVar(value=self.app_config.serial.baudrate)
+        self.baudrate_combo = ttk.Combobox(serial_row1, textvariable=self.baudrate_var, 
+                                            values=[9600, 19200, 38400, 57600, 115200], width=8)
+        self.baudrate_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 数据位
+        serial_row2 = ttk.Frame(serial_frame)
+        serial_row2.pack(fill=tk.X, pady=2)
+        ttk.Label(serial_row2, text="数据位: ").pack(side=tk.LEFT, padx=5)
+        self.bytesize_var = tk.IntVar(value=self.app_config.serial.bytesize)
+        self.bytesize_combo = ttk.Combobox(serial_row2, textvariable=self.bytesize_var, 
+                                            values=[5, 6, 7, 8], width=5)
+        self.bytesize_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 停止位
+        ttk.Label(serial_row2, text="停止位: ").pack(side=tk.LEFT, padx=5)
+        self.stopbits_var = tk.DoubleVar(value=self.app_config.serial.stopbits)
+        self.stopbits_combo = ttk.Combobox(serial_row2, textvariable=self.stopbits_var, 
+                                            values=[1, 1.5, 2], width=5)
+        self.stopbits_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 校验位
+        ttk.Label(serial_row2, text="校验位: ").pack(side=tk.LEFT, padx=5)
+        self.parity_var = tk.StringVar(value=self.app_config.serial.parity)
+        self.parity_combo = ttk.Combobox(serial_row2, textvariable=self.parity_var, 
+                                         values=['NONE', 'ODD', 'EVEN'], 
+                                         width=8)
+        self.parity_combo.pack(side=tk.LEFT, padx=5)
+        
+        # 重试次数
+        serial_row3 = ttk.Frame(serial_frame)
+        serial_row3.pack(fill=tk.X, pady=2)
+        ttk.Label(serial_row3, text="重试次数: ").pack(side=tk.LEFT, padx=5)
+        self.max_attempts_var = tk.IntVar(value=self.app_config.serial.max_attempts)
+        self.max_attempts_entry = ttk.Entry(serial_row3, textvariable=self.max_attempts_var, width=10)
+        self.max_attempts_entry.pack(side=tk.LEFT, padx=5)
+        
+        # 保存配置按钮
+        save_button = ttk.Button(serial_row3, text="保存配置", command=self.save_config)
+        save_button.pack(side=tk.RIGHT, padx=5)
+        
+        # 4. 数据显示区域
+        display_frame = ttk.LabelFrame(main_frame, text="检测数据", padding="5")
+        display_frame.grid(row=3, column=0, sticky=(tk.W, tk.E, tk.N, tk.S), pady=5)
+        
+        # 左侧：原始数据和测试结果
+        left_frame = ttk.Frame(display_frame)
+        left_frame.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=5)
+        
+        # 原始数据
+        raw_frame = ttk.LabelFrame(left_frame, text="原始数据", padding="5")
+        raw_frame.pack(fill=tk.BOTH, expand=False, padx=5, pady=5)  # 设置expand=False，不自动扩展
+        
+        self.raw_data_text = scrolledtext.ScrolledText(raw_frame, width=60, height=5, font=("Courier New", 10),
+                                                      foreground=self.mac_colors["text"],
+                                                      insertbackground=self.mac_colors["primary"],
+                                                      relief="flat",
+                                                      borderwidth=1)
+        self.raw_data_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 检测结果
+        result_frame = ttk.LabelFrame(left_frame, text="检测结果", padding="5")
+        result_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        result_table_frame = ttk.Frame(result_frame)
+        result_table_frame.pack(fill=tk.BOTH, expand=True)
+        
+        # 检测结果表格
+        self.result_table = ttk.Treeview(result_table_frame, columns=("检测次数", "密度值"), show="headings")
+        self.result_table.heading("检测次数", text="检测次数")
+        self.result_table.heading("密度值", text="密度值 (g/ccm)")
+        self.result_table.column("检测次数", width=80, anchor=tk.CENTER)
+        self.result_table.column("密度值", width=120, anchor=tk.CENTER)
+        self.result_table.tag_configure("fail", foreground=self.mac_colors["danger"])
+        
+        # 滚动条
+        result_scrollbar = ttk.Scrollbar(result_table_frame, orient=tk.VERTICAL, command=self.result_table.yview)
+        self.result_table.configure(yscroll=result_scrollbar.set)
+        
+        # 布局
+        self.result_table.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        result_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        
+        # 平均值显示
+        avg_frame = ttk.Frame(result_frame)
+        avg_frame.pack(fill=tk.X, padx=5, pady=5)
+        
+        ttk.Label(avg_frame, text="平均值: ").pack(side=tk.LEFT, padx=5)
+        self.avg_value_var = tk.StringVar(value="--")
+        self.avg_value_label = ttk.Label(avg_frame, textvariable=self.avg_value_var, font=(("Segoe UI", 12, "bold")),
+                                        foreground=self.mac_colors["primary"])
+        self.avg_value_label.pack(side=tk.LEFT, padx=5)
+        
+        # 本班读数趋势图（按机台），读数增加时只增量绘制
+        trend_frame = ttk.LabelFrame(left_frame, text="读数趋势", padding="5")
+        trend_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        self.trend_chart = TrendChart(trend_frame, height=140)
+        self.trend_chart.pack(fill=tk.BOTH, expand=True)
+        
+        # 右侧：日志和提示信息
+        right_frame = ttk.LabelFrame(display_frame, text="操作日志", padding="5")
+        right_frame.pack(side=tk.RIGHT, fill=tk.BOTH, expand=True, padx=5)
+        
+        self.log_text = scrolledtext.ScrolledText(right_frame, width=60, height=25, font=("Courier New", 10),
+                                                foreground=self.mac_colors["text"],
+                                                insertbackground=self.mac_colors["primary"],
+                                                relief="flat",
+                                                borderwidth=1)
+        self.log_text.pack(fill=tk.BOTH, expand=True)
+        
+        # 5. 提示区：检测完成、出错等消息，不弹出对话框
+        self.notification_area = NotificationArea(main_frame)
+        self.notification_area.grid(row=4, column=0, sticky=(tk.W, tk.E))
+    
+    def browse_excel_file(self):
+        """选择Excel文件路径"""
+        filename = filedialog.askopenfilename(
+            title="选择Excel文件",
+            filetypes=[("Excel文件", "*.xlsx"), ("所有文件", "*.*")]
+        )
+        if filename:
+            self.excel_path_var.set(filename)
+            self.excel_filename = filename
+            self.load_excel_file()
+    
+    def load_excel_file(self, on_loaded=None):
+        """
+        加载Excel文件并显示产品列表
+        读取工作簿在后台线程中进行，界面保持响应并显示进度条
+        :param on_loaded: 产品列表显示后在界面线程中调用的回调
+        """
+        self.log_message("正在加载Excel文件...")
+        self.status_label.config(text="加载中")
+        
+        # 手动加载文件时结束正在进行的批量队列，先保存已缓存的结果
+        if self.batch_active:
+            self.finish_batch()
+        
+        self.excel_filename = self.excel_path_var.get().strip() or self.excel_filename
+        if not self.excel_filename or not os.path.exists(self.excel_filename):
+            self.show_products([])
+            self.current_product_index = 0
+            self.log_message("未找到Excel文件，请先选择一个.xlsx文件")
+            self.status_label.config(text="就绪")
+            if on_loaded:
+                on_loaded()
+            return
+        
+        self.load_button.config(state=tk.DISABLED)
+        self.start_button.config(state=tk.DISABLED)
+        self.load_progress.pack(side=tk.RIGHT, padx=5)
+        self.load_progress.start(10)
+        
+        load_thread = threading.Thread(
+            target=self.load_products_worker,
+            args=(self.excel_filename, self.sheet_var.get(), on_loaded),
+            daemon=True
+        )
+        load_thread.start()
+    
+    def load_products_worker(self, filename, sheet_name, on_loaded):
+        """后台线程：读取工作表名称和产品列表"""
+        try:
+            sheet_names = list_excel_sheets(filename)
+            if sheet_name not in sheet_names:
+                sheet_name = sheet_names[0] if sheet_names else ""
+            product_info_list = read_product_models_from_excel(filename, sheet_name or None)
+            self.root.after(0, self.on_products_loaded, sheet_names, sheet_name, product_info_list, None, on_loaded)
+        except Exception as e:
+            self.root.after(0, self.on_products_loaded, [], "", [], e, on_loaded)
+    
+    def on_products_loaded(self, sheet_names, sheet_name, product_info_list, error, on_loaded):
+        """界面线程：显示后台读取的产品列表"""
+        self.load_progress.stop()
+        self.load_progress.pack_forget()
+        self.load_button.config(state=tk.NORMAL)
+        if not self.detecting:
+            self.start_button.config(state=tk.NORMAL)
+        
+        if error is not None:
+            self.notify("错误", f"加载Excel文件失败: {str(error)}", "error")
+            self.log_message(f"加载Excel文件失败: {str(error)}")
+            self.status_label.config(text="错误")
+        else:
+            self.sheet_combo.config(values=sheet_names)
+            self.sheet_var.set(sheet_name)
+            self.show_products(product_info_list)
+            
+            completed_count = sum(1 for info in self.product_info_list if info["已完成"])
+            self.log_message(f"成功加载 {len(self.product_info_list)} 个产品型号，其中 {completed_count} 个已有检测结果")
+            self.status_label.config(text="就绪")
+        
+        if on_loaded:
+            on_loaded()
+    
+    def show_products(self, product_info_list):
+        """显示产品列表，已有结果的产品置灰显示"""
+        self.product_info_list = product_info_list
+        self.product_index = build_product_index(product_info_list)
+        self.completed_indices = set()
+        
+        # 清空产品列表
+        for item in self.product_list.get_children():
+            self.product_list.delete(item)
+        
+        self.product_items = []
+        for info in self.product_info_list:
+            item = self.product_list.insert("", tk.END, values=(
+                info["产品型号"],
+                info["机台号"],
+                info["来样时间"],
+                info["班次"]
+            ), tags=("done",) if info["已完成"] else ())
+            self.product_items.append(item)
+    
+    def enqueue_source(self):
+        """将当前Excel文件和工作表加入批量队列"""
+        filename = self.excel_path_var.get().strip()
+        if not filename or not os.path.exists(filename):
+            messagebox.showwarning("警告", "请先选择一个存在的Excel文件")
+            return
+        sheet_name = self.sheet_var.get() or None
+        self.batch_queue.add(filename, sheet_name)
+        self.update_queue_label()
+        self.log_message(f"已加入队列: {os.path.basename(filename)} [{sheet_name or '活动工作表'}]")
+    
+    def clear_batch_queue(self):
+        """清空批量队列"""
+        if self.detecting:
+            messagebox.showwarning("警告", "当前正在检测，请先停止检测")
+            return
+        if self.batch_active:
+            self.finish_batch()
+        self.batch_queue.clear()
+        self.update_queue_label()
+        self.log_message("批量队列已清空")
+    
+    def update_queue_label(self):
+        """更新队列状态显示"""
+        if self.batch_active:
+            text = f"队列: 第 {self.batch_queue.position + 1}/{len(self.batch_queue)} 个来源"
+        else:
+            text = f"队列: {len(self.batch_queue)} 个来源"
+        self.queue_label.config(text=text)
+    
+    def start_batch(self):
+        """从第一个来源开始批量检测"""
+        if self.detecting:
+            return
+        if not len(self.batch_queue):
+            messagebox.showwarning("警告", "批量队列为空，请先加入Excel文件或工作表")
+            return
+        self.batch_queue.position = -1
+        self.batch_active = True
+        self.next_batch_source(auto_start=True)
+    
+    def next_batch_source(self, auto_start=True):
+        """
+        切换到队列中的下一个来源
+        离开的文件如果后面不再使用，交给回写线程保存一次
+        :param auto_start: 切换后是否立即开始检测
+        """
+        source = self.batch_queue.current()
+        if source and not self.batch_queue.used_later(source["filename"]):
+            self.excel_writer.submit_flush(source["filename"])
+        
+        source = self.batch_queue.advance()
+        if source is None:
+            self.finish_batch()
+            self.status_label.config(text="所有产品检测完成")
+            clear_session_checkpoint()
+            self.notify("检测完成", "批量队列中所有产品的检测已完成", "success")
+            self.log_message("批量队列检测完成")
+            return
+        
+        self.excel_filename = source["filename"]
+        self.excel_path_var.set(source["filename"])
+        self.sheet_var.set(source["sheet_name"] or "")
+        self.show_products(source["products"])
+        self.update_queue_label()
+        self.log_message(f"切换到来源: {os.path.basename(source['filename'])} [{source['sheet_name'] or '活动工作表'}]，"
+                         f"共 {len(source['products'])} 个产品")
+        
+        next_index = self.find_next_product_index(0)
+        if next_index is None:
+            # 该来源没有需要检测的产品，继续下一个来源
+            self.next_batch_source(auto_start)
+            return
+        self.current_product_index = next_index
+        self.clear_detection_results()
+        if auto_start:
+            self.start_detection()
+    
+    def finish_batch(self):
+        """结束批量队列，保存所有缓存的工作簿"""
+        self.excel_writer.submit_flush()
+        self.batch_active = False
+        self.update_queue_label()
+    
+    def start_detection(self):
+        """开始检测"""
+        if self.detecting:
+            return
+        
+        if not self.product_info_list:
+            messagebox.showwarning("警告", "未加载任何产品型号")
+            return
+        
+        if self.current_product_index >= len(self.product_info_list):
+            self.notify("提示", "所有产品都已检测完成")
+            return
+        
+        # 仅检测未完成模式下，直接跳到下一个待检测的产品
+        if self.pending_only_var.get() and self.is_product_completed(self.current_product_index):
+            next_index = self.find_next_product_index(self.current_product_index)
+            if next_index is None:
+                self.notify("提示", "所有产品都已检测完成")
+                return
+            self.current_product_index = next_index
+            self.log_message(f"跳过已完成的产品，切换到第 {next_index + 1} 个产品")
+        
+        if self.engine.running:
+            self.log_message("上一次检测正在停止，请稍后再开始")
+            return
+        
+        # 获取当前产品信息
+        current_product = self.product_info_list[self.current_product_index]
+        product_model = current_product["产品型号"]
+        
+        # 在主界面显示提示信息
+        self.prompt_label.config(text=f"请放入 {product_model} 型号的样块")
+        
+        # 更新界面状态
+        self.detecting = True
+        self.start_button.config(state=tk.DISABLED)
+        self.stop_button.config(state=tk.NORMAL)
+        self.next_button.config(state=tk.DISABLED)
+        self.reset_button.config(state=tk.DISABLED)
+        
+        # 重置检测数据（从断点恢复时保留已采集的读数）
+        resumed = self.resume_state
+        self.resume_state = None
+        if resumed and resumed.get("product_model") == product_model:
+            self.density_values = list(resumed.get("density_values") or [])
+            self.detect_time = resumed.get("detect_time")
+        else:
+            self.density_values = []
+            self.detect_time = None
+        self.clear_detection_results()
+        for detect_num, value in enumerate(self.density_values, 1):
+            self.add_detection_result(detect_num, value if value is not None else "失败")
+        
+        # 更新日志
+        self.log_message(f"开始检测产品: {product_model}")
+        self.status_label.config(text="检测中")
+        
+        # 清空提示信息
+        self.root.after(1000, lambda: self.prompt_label.config(text=""))
+        
+        # 检测引擎在后台线程中采集当前产品，读数、CSV日志、读数记录和断点都按引擎的事件处理
+        self.update_recorders()
+        self.engine.config = self.app_config
+        self.engine.spec = self.spec_table
+        # 批量队列中的结果先写入缓存的工作簿，离开该文件时统一保存
+        self.engine.deferred = self.batch_active and self.app_config.profile.flush_policy == "source"
+        self.checkpointer = SessionCheckpointer(self.excel_filename, self.sheet_var.get() or None,
+                                                self.completed_indices)
+        self.engine.start(self.product_info_list, self.excel_filename, self.current_product_index, auto=False,
+                          resume_values=self.density_values, resume_time=self.detect_time)
+    
+    def save_config(self):
+        """校验界面上的串口参数并保存到配置文件，立即生效"""
+        try:
+            settings = replace(
+                self.app_config.serial,
+                port=self.serial_port_var.get().strip(),
+                baudrate=self.baudrate_var.get(),
+                bytesize=self.bytesize_var.get(),
+                stopbits=self.stopbits_var.get(),
+                parity=self.parity_var.get(),
+                max_attempts=self.max_attempts_var.get()
+            )
+            save_serial_settings(settings, self.config_file)
+            
+            # 立即重新加载，不必等待监视线程
+            if self.config_watcher.check() is None:
+                self.apply_config(load_config(self.config_file))
+            
+            messagebox.showinfo("提示", "串口配置已保存")
+            self.log_message("串口配置已保存到文件")
+        except Exception as e:
+            messagebox.showerror("错误", f"保存配置失败: {e}")
+            self.log_message(f"保存配置失败: {e}")
+    
+    def apply_config(self, config):
+        """应用重新加载的配置，正在进行的检测从下一次读取开始使用新参数"""
+        self.app_config = config
+        self.excel_writer.write_mode = config.profile.write_mode
+        self.engine.config = config
+        if self.spec_key(config) != self.spec_source:
+            self.spec_table = load_spec_table(config, log=self.log_message)
+            self.spec_source = self.spec_key(config)
+            self.engine.spec = self.spec_table
+            self.log_message(f"规格表已重新加载: {len(self.spec_table)} 个产品型号")
+        serial_settings = config.serial
+        self.serial_port_var.set(serial_settings.port)
+        self.baudrate_var.set(serial_settings.baudrate)
+        self.bytesize_var.set(serial_settings.bytesize)
+        self.stopbits_var.set(serial_settings.stopbits)
+        self.parity_var.set(serial_settings.parity)
+        self.max_attempts_var.set(serial_settings.max_attempts)
+        self.update_scanner()
+        instrument = f"，仪器: {config.instrument}" if config.instrument else ""
+        self.log_message(f"配置已加载: {serial_settings.port} {serial_settings.baudrate}{instrument}，"
+                         f"方案: {config.profile_name}（每个样品 {config.profile.readings_per_sample} 次读数）")
+    
+    def autodetect_serial_port(self):
+        """在后台线程中枚举串口并识别仪器的通信格式"""
+        if self.detecting:
+            messagebox.showwarning("警告", "当前正在检测，请先停止检测")
+            return
+        self.autodetect_button.config(state=tk.DISABLED)
+        self.log_message("正在自动检测仪器串口，请确保仪器正在输出数据...")
+        # 试读需要独占串口，检测期间暂停连接监控
+        self.serial_supervisor.pause()
+        
+        def worker():
+            try:
+                result = autodetect_serial()
+                self.root.after(0, self.on_serial_autodetected, result, None)
+            except Exception as e:
+                self.root.after(0, self.on_serial_autodetected, None, e)
+            finally:
+                self.serial_supervisor.resume()
+        
+        threading.Thread(target=worker, daemon=True).start()
+    
+    def on_serial_autodetected(self, result, error):
+        """自动检测完成后的处理"""
+        self.autodetect_button.config(state=tk.NORMAL)
+        if error is not None:
+            self.log_message(f"自动检测串口出错: {error}")
+            return
+        if not result:
+            self.log_message("未检测到仪器，请检查连接或手动设置串口参数")
+            return
+        self.log_message(f"检测到仪器: {result['port']} {result['baudrate']} {result['bytesize']}{result['parity'][0]}1")
+        self.apply_detected_port(result)
+    
+    def apply_detected_port(self, result):
+        """把识别出的串口参数写入配置文件并立即生效"""
+        try:
+            settings = replace(
+                self.app_config.serial,
+                port=result["port"],
+                baudrate=result["baudrate"],
+                bytesize=result["bytesize"],
+                parity=result["parity"],
+                stopbits=result.get("stopbits", 1)
+            )
+            save_serial_settings(settings, self.config_file)
+            self.config_watcher.check()
+        except Exception as e:
+            self.log_message(f"保存串口配置失败: {e}")
+    
+    def relocate_instrument(self):
+        """
+        串口打不开时按缓存查找仪器，COM号变化则把新的串口写入配置（在连接监控线程中调用）
+        :return: 找到的串口参数，未找到或串口未变化返回None
+        """
+        try:
+            cached = find_cached_port()
+        except Exception as e:
+            print(f"查找串口错误: {e}")
+            return None
+        if not cached or cached["port"] == self.app_config.serial.port:
+            return None
+        self.log_message(f"仪器已从 {self.app_config.serial.port} 切换到 {cached['port']}")
+        self.root.after(0, self.apply_detected_port, cached)
+        return cached
+    
+    def read_serial_with_config(self):
+        """等待连接监控线程收到的下一帧数据"""
+        return self.serial_supervisor.read_frame(timeout=3)  # 延长单次读取超时时间
+    
+    def record_serial_data(self, timestamp, data):
+        """录制串口原始数据（在连接监控线程中调用），录制目录随配置变化"""
+        capture_dir = self.app_config.serial.capture_dir
+        if self.capture_recorder is not None and self.capture_recorder.directory != capture_dir:
+            self.capture_recorder.close()
+            self.capture_recorder = None
+        if not capture_dir:
+            return
+        if self.capture_recorder is None:
+            self.capture_recorder = CaptureRecorder(capture_dir)
+        self.capture_recorder.record(timestamp, data)
+    
+    def update_recorders(self):
+        """开始检测前按当前配置打开CSV日志和结果归档，配置变化时重新打开"""
+        settings = self.app_config.csv_log
+        if settings != self.csv_settings:
+            if self.csv_sink is not None:
+                self.csv_sink.close()
+            self.csv_sink = CsvSink.from_settings(settings)
+            self.csv_settings = settings
+        settings = self.app_config.archive
+        if settings != self.archive_settings:
+            if self.result_archive is not None:
+                self.result_archive.close()
+                self.result_archive = None
+            self.archive_settings = settings
+            try:
+                self.result_archive = ResultArchive.from_settings(settings)
+            except (OSError, ValueError) as e:
+                self.log_message(f"打开结果归档失败: {e}")
+        self.engine.csv_sink = self.csv_sink
+        self.engine.archive = self.result_archive
+    
+    def on_serial_state(self, state, message):
+        """连接状态变化时记录日志"""
+        if message:
+            self.log_message(message)
+        self.update_connection_label()
+    
+    def update_scanner(self):
+        """按配置启动或停止扫描枪串口的读取（修改scanner_port后立即生效）"""
+        scanner_port = self.app_config.serial.scanner_port
+        if scanner_port and self.scanner is None:
+            self.scanner = SerialSupervisor(
+                lambda: replace(SerialSettings(), port=self.app_config.serial.scanner_port, bytesize=8),
+                on_state=lambda state, message: self.root.after(0, self.log_message, f"扫描枪: {message}")
+                if message else None
+            ).start()
+            threading.Thread(target=self.read_scanner, args=(self.scanner,), daemon=True).start()
+        elif not scanner_port and self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+    
+    def read_scanner(self, scanner):
+        """扫描枪读取线程：每行一个条码"""
+        while self.scanner is scanner:
+            for line in scanner.read_frame(timeout=0.5).splitlines():
+                code = line.strip()
+                if code:
+                    self.root.after(0, self.select_scanned, code)
+    
+    def on_scan_entered(self, event=None):
+        code = self.scan_var.get().strip()
+        self.scan_var.set("")
+        if code:
+            self.select_scanned(code)
+    
+    def select_scanned(self, code):
+        """按扫码内容在索引中查找产品，跳到该行并开始检测"""
+        if self.detecting:
+            self.log_message(f"正在检测，忽略扫码: {code}")
+            return
+        index = find_scanned_product(self.product_index, self.product_info_list, code)
+        if index is None:
+            self.log_message(f"未找到扫码对应的产品: {code}")
+            return
+        if self.pending_only_var.get() and self.is_product_completed(index):
+            self.log_message(f"产品 {code} 已有检测结果（仅检测未完成）")
+            return
+        self.current_product_index = index
+        if index < len(self.product_items):
+            item = self.product_items[index]
+            self.product_list.selection_set(item)
+            self.product_list.see(item)
+        self.log_message(f"扫码 {code}：切换到第 {index + 1} 个产品")
+        self.start_detection()
+    
+    def poll_connection(self):
+        """每秒刷新一次串口连接状态，并把超过刷新间隔的CSV读数写到磁盘"""
+        self.update_connection_label()
+        csv_sink = self.csv_sink  # 检测线程可能同时重新打开
+        if csv_sink is not None:
+            try:
+                csv_sink.flush_if_due()
+            except OSError as e:
+                self.log_message(f"写入CSV日志失败: {e}")
+        self.root.after(1000, self.poll_connection)
+    
+    def update_connection_label(self):
+        """刷新串口连接状态显示"""
+        stats = self.serial_supervisor.stats()
+        text = f"串口: {stats['state']}"
+        if stats["state"] == STATE_CONNECTED:
+            text += f" {stats['port']} | {stats['bytes_per_sec']:.0f} B/s"
+            if stats["last_frame_age"] is not None:
+                text += f" | 上一帧 {stats['last_frame_age']:.1f}s前"
+        self.connection_label.config(text=text, foreground="black" if stats["state"] == STATE_CONNECTED else "red")
+    
+    def on_engine_event(self, event):
+        """检测引擎的事件（在引擎线程中调用）：先保存断点，界面更新交给界面线程"""
+        checkpointer = self.checkpointer
+        if checkpointer is not None:
+            checkpointer.on_event(event)
+        self.root.after(0, self.handle_engine_event, event)
+    
+    def handle_engine_event(self, event):
+        """在界面线程中按检测引擎的事件更新界面"""
+        kind = event["type"]
+        if kind == "raw":
+            self.update_raw_data(event["data"])
+        elif kind == "reading":
+            # 更新检测结果表格和趋势图，超出规格的读数标红
+            detect_num, density = event["reading"], event["density"]
+            if density is not None:
+                self.add_detection_result(detect_num, density, event["in_spec"])
+                self.trend_chart.add(event["machine"], density)
+            else:
+                self.add_detection_result(detect_num, "失败")
+                self.log_message(f"第 {detect_num} 次检测 - 失败")
+        elif kind == "product_done":
+            self.show_average(event["average"], event["judgement"])
+            self.mark_product_completed(event["index"], event["judgement"])
+        elif kind == "run_finished":
+            # 引擎空闲后才处理完成，全自动模式可以立即开始下一个产品
+            if event["completed"] and self.detecting:
+                self.detection_completed()
+        elif kind == "error":
+            if event.get("fatal"):
+                self.notify("测试错误", f"测试过程中发生错误: {event['message']}", "error")
+                self.log_message(f"测试错误: {event['message']}")
+                if self.detecting:
+                    self.stop_detection()
+            else:
+                self.log_message(event["message"])
+    
+    def stop_detection(self):
+        """停止检测"""
+        self.detecting = False
+        
+        # 当前读数结束后引擎停止，中断的读数不计入
+        self.engine.stop()
+        self.engine.wait(1.0)
+        
+        # 更新界面状态
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL)
+        self.reset_button.config(state=tk.NORMAL)
+        
+        self.status_label.config(text="已停止")
+        self.log_message("检测已停止")
+    
+    def next_product(self):
+        """检测下一个产品"""
+        if self.detecting:
+            messagebox.showwarning("警告", "当前正在检测，请先停止检测")
+            return
+        
+        next_index = self.find_next_product_index(self.current_product_index + 1)
+        if next_index is not None:
+            self.current_product_index = next_index
+            self.clear_detection_results()
+            self.log_message(f"切换到第 {self.current_product_index + 1} 个产品")
+        elif self.batch_active and self.batch_queue.has_next():
+            self.next_batch_source(auto_start=False)
+        else:
+            messagebox.showinfo("提示", "已经是最后一个产品")
+    
+    def reset_detection(self):
+        """重置检测状态"""
+        if self.detecting:
+            self.stop_detection()
+        
+        self.current_product_index = 0
+        self.density_values = []
+        self.completed_indices = set()
+        self.resume_state = None
+        clear_session_checkpoint()
+        self.clear_detection_results()
+        self.log_message("检测已重置")
+    
+    def toggle_auto_mode(self):
+        """切换全自动模式"""
+        self.auto_mode = self.auto_mode_var.get()
+        self.log_message(f"{'启用' if self.auto_mode else '禁用'}全自动模式")
+        
+    def on_tree_configure(self, event):
+        """Treeview配置变化时的处理"""
+        # 尝试更新Treeview的背景色
+        try:
+            # 获取Treeview的内部组件
+            tree_widget = self.product_list
+            # 强制刷新
+            tree_widget.update_idletasks()
+        except Exception as e:
+            pass
+        
+    def show_provenance(self):
+        """查看选中产品（未选中时为当前产品）的读数来源记录，在后台线程读取"""
+        selection = self.product_list.selection()
+        if selection and selection[0] in self.product_items:
+            index = self.product_items.index(selection[0])
+        else:
+            index = self.current_product_index
+        if index >= len(self.product_info_list):
+            messagebox.showinfo("提示", "请先选择产品")
+            return
+        product = self.product_info_list[index]
+        excel_filename = product.get("Excel文件") or self.excel_filename
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"读数记录 - {product['产品型号']}")
+        window.geometry("760x480")
+        columns = ("检测时间", "次数", "读取时间", "密度", "尝试", "耗时")
+        tree = ttk.Treeview(window, columns=columns, show="headings", height=8)
+        for column, width in zip(columns, (150, 50, 180, 90, 50, 70)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        tree.pack(fill=tk.X, padx=5, pady=5)
+        raw_text = scrolledtext.ScrolledText(window, height=12, font=("Consolas", 10))
+        raw_text.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        raw_text.insert(tk.END, "正在读取...")
+        raw_by_item = {}
+        
+        def on_select(event):
+            raw_text.delete("1.0", tk.END)
+            for item in tree.selection():
+                raw_text.insert(tk.END, "\n----\n".join(raw_by_item.get(item, [])) or "（无原始数据）")
+        
+        def on_loaded(records):
+            if not window.winfo_exists():
+                return
+            raw_text.delete("1.0", tk.END)
+            if not records:
+                raw_text.insert(tk.END, "没有该产品的读数记录")
+            for record in records:
+                for reading in record["readings"]:
+                    density = reading["density"]
+                    item = tree.insert("", tk.END, values=(
+                        record.get("detect_time", ""), reading["reading"], reading["time"],
+                        "失败" if density is None else f"{density:.4f}",
+                        reading["attempts"], f"{reading['latency']:.2f}s"
+                    ))
+                    raw_by_item[item] = reading.get("raw", [])
+        
+        def worker():
+            try:
+                records = read_provenance(excel_filename, product.get("工作表"), product.get("行号"),
+                                          product["产品型号"])
+            except Exception as e:
+                self.root.after(0, self.log_message, f"读取读数记录失败: {e}")
+                records = []
+            self.root.after(0, on_loaded, records)
+        
+        tree.bind("<<TreeviewSelect>>", on_select)
+        threading.Thread(target=worker, daemon=True).start()
+    
+    @staticmethod
+    def spec_key(config):
+        """决定规格表内容的配置项，变化时重新加载"""
+        return config.spec, config.profile.spec_min, config.profile.spec_max
+    
+    def spec_judge(self, product_model, density_values, average):
+        """按当前规格表判定产品（汇总中统计超出规格的数量），在回写线程中调用"""
+        return self.spec_table.judge(product_model, density_values, average)
+    
+    def show_summary(self):
+        """查看当前工作簿按班次、机台的汇总（回写时增量更新，打开时不扫描工作表）"""
+        if self.product_info_list and self.current_product_index < len(self.product_info_list):
+            excel_filename = self.product_info_list[self.current_product_index].get("Excel文件") or self.excel_filename
+        else:
+            excel_filename = self.excel_filename
+        if not excel_filename:
+            messagebox.showinfo("提示", "请先选择Excel文件")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"班次汇总 - {os.path.basename(excel_filename)}")
+        window.geometry("640x400")
+        columns = ("班次", "机台号", "数量", "均值", "标准差", "超出规格")
+        tree = ttk.Treeview(window, columns=columns, show="headings")
+        for column, width in zip(columns, (90, 110, 70, 110, 110, 80)):
+            tree.heading(column, text=column)
+            tree.column(column, width=width)
+        tree.tag_configure("subtotal", font=("Segoe UI", 10, "bold"))
+        tree.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
+        
+        def row_values(shift, machine, stats):
+            mean = f"{stats['mean']:.4f}" if stats["mean"] is not None else "--"
+            sd = f"{stats['sd']:.4f}" if stats["sd"] is not None else "--"
+            return (shift, machine, stats["count"], mean, sd, stats["out_of_spec"])
+        
+        def refresh():
+            tree.delete(*tree.get_children())
+            report = self.summaries.report(excel_filename)
+            for shift in sorted(report["shifts"]):
+                for group in report["groups"]:
+                    if group["shift"] == shift:
+                        tree.insert("", tk.END, values=row_values(shift or "--", group["machine"] or "--", group))
+                tree.insert("", tk.END, values=row_values(shift or "--", "小计", report["shifts"][shift]),
+                            tags=("subtotal",))
+            tree.insert("", tk.END, values=row_values("合计", "", report["total"]), tags=("subtotal",))
+        
+        def rebuild():
+            # 启用汇总之前已有的结果需要扫描一次工作表
+            def worker():
+                try:
+                    count = self.summaries.rebuild(excel_filename)
+                    self.root.after(0, self.log_message, f"已重新统计 {count} 个产品的结果")
+                except Exception as e:
+                    self.root.after(0, self.log_message, f"重新统计失败: {e}")
+                if window.winfo_exists():
+                    self.root.after(0, refresh)
+            threading.Thread(target=worker, daemon=True).start()
+        
+        buttons = ttk.Frame(window)
+        buttons.pack(fill=tk.X, padx=5, pady=5)
+        ttk.Button(buttons, text="刷新", command=refresh).pack(side=tk.LEFT, padx=5)
+        ttk.Button(buttons, text="重新统计", command=rebuild).pack(side=tk.LEFT, padx=5)
+        refresh()
+    
+    def on_tree_select(self, event):
+        """Treeview选择变化时的处理"""
+        # 当选择变化时，确保选中行的样式正确
+        pass
+    
+    def detection_completed(self):
+        """
+        检测完成后的处理
+        """
+        self.detecting = False
+        
+        # 清空提示信息
+        self.prompt_label.config(text="")
+        
+        # 更新界面状态
+        self.start_button.config(state=tk.NORMAL)
+        self.stop_button.config(state=tk.DISABLED)
+        self.next_button.config(state=tk.NORMAL)
+        self.reset_button.config(state=tk.NORMAL)
+        
+        current_product = self.product_info_list[self.current_product_index]
+        product_model = current_product["产品型号"]
+        
+        if self.auto_mode:
+            # 如果启用了全自动模式，自动检测下一个产品
+            self.status_label.config(text="检测完成，准备下一个产品")
+            self.log_message(f"{product_model} 型号检测完成，准备下一个产品...")
+            
+            # 结果已交给回写线程，空闲时立即开始下一个产品的采集
+            if self.find_next_product_index(self.current_product_index + 1) is not None:
+                self.root.after_idle(self.auto_next_product)
+            elif self.batch_active:
+                # 当前来源已完成，切换到队列中的下一个来源（队列结束时统一保存）
+                self.root.after_idle(self.next_batch_source)
+            else:
+                # 所有产品检测完成
+                self.status_label.config(text="所有产品检测完成")
+                clear_session_checkpoint()
+                self.notify("检测完成", "所有产品的检测已完成", "success")
+                self.log_message("所有产品检测完成")
+        else:
+            # 非全自动模式，正常显示检测完成信息
+            self.status_label.config(text="检测完成")
+            self.notify("检测完成", f"{product_model} 型号的检测已完成", "success")
+    
+    def auto_next_product(self):
+        """全自动模式下自动开始下一个产品的检测"""
+        if self.detecting:
+            return
+        
+        next_index = self.find_next_product_index(self.current_product_index + 1)
+        if next_index is not None:
+            self.current_product_index = next_index
+            self.clear_detection_results()
+            self.log_message(f"自动切换到第 {self.current_product_index + 1} 个产品")
+            
+            # 自动开始检测
+            self.start_detection()
+        else:
+            # 所有产品检测完成
+            self.status_label.config(text="所有产品检测完成")
+            clear_session_checkpoint()
+            self.notify("检测完成", "所有产品的检测已完成", "success")
+            self.log_message("所有产品检测完成")
+    
+    def is_product_completed(self, index):
+        """产品是否已有检测结果（加载时已完成，或本次会话已检测）"""
+        return index in self.completed_indices or self.product_info_list[index].get("已完成", False)
+
+    def find_next_product_index(self, start):
+        """
+        从start开始查找下一个要检测的产品
+        仅检测未完成模式下跳过已完成的产品
+        :return: 产品序号，没有则返回None
+        """
+        pending_only = self.pending_only_var.get()
+        for index in range(start, len(self.product_info_list)):
+            if not pending_only or not self.is_product_completed(index):
+                return index
+        return None
+
+    def mark_product_completed(self, index, judgement=None):
+        """标记产品已完成并在列表中置灰，判定不合格时标红"""
+        if index < len(self.product_info_list):
+            self.product_info_list[index]["已完成"] = True
+        if index < len(self.product_items):
+            self.product_list.item(self.product_items[index], tags=("fail",) if judgement == FAIL else ("done",))
+
+    def offer_resume(self):
+        """启动时检查断点文件，询问是否继续上次未完成的检测"""
+        state = load_session_checkpoint()
+        if not state:
+            return
+        excel_filename = state.get("excel_filename")
+        if not excel_filename or not os.path.exists(excel_filename):
+            clear_session_checkpoint()
+            return
+        
+        index = int(state.get("current_product_index", 0))
+        if not messagebox.askyesno(
+            "恢复检测",
+            f"检测到未完成的检测会话：\n{excel_filename}\n第 {index + 1} 个产品\n是否继续？"
+        ):
+            clear_session_checkpoint()
+            return
+        
+        if os.path.abspath(self.excel_filename) != excel_filename or \
+                (self.sheet_var.get() or None) != state.get("sheet_name"):
+            self.excel_filename = excel_filename
+            self.excel_path_var.set(excel_filename)
+            self.sheet_var.set(state.get("sheet_name") or "")
+            self.load_excel_file(on_loaded=lambda: self.resume_session(state))
+        else:
+            self.resume_session(state)
+    
+    def resume_session(self, state):
+        """按断点恢复当前产品序号、已完成序号和部分读数"""
+        index = int(state.get("current_product_index", 0))
+        # 断点中记录了已完成的序号，直接跳过，无需重新扫描工作表
+        self.completed_indices = set(state.get("completed_indices") or [])
+        for completed_index in self.completed_indices:
+            self.mark_product_completed(completed_index)
+        while index in self.completed_indices:
+            index += 1
+        if index >= len(self.product_info_list):
+            self.log_message("断点中的产品均已完成")
+            clear_session_checkpoint()
+            return
+        
+        self.current_product_index = index
+        product_model = self.product_info_list[index]["产品型号"]
+        if state.get("product_model") == product_model and state.get("density_values"):
+            self.resume_state = state
+            self.log_message(f"已恢复 {product_model} 的 {len(state['density_values'])} 次读数")
+        self.log_message(f"从第 {index + 1} 个产品继续检测: {product_model}")
+
+    def on_excel_written(self, product_model, success):
+        """回写线程完成一条结果后的回调（在回写线程中调用）"""
+        if success:
+            message = f"成功更新 {product_model} 的检测结果到Excel文件"
+        else:
+            message = f"更新 {product_model} 的检测结果到Excel文件失败"
+        self.root.after(0, self.log_message, message)
+
+    def on_excel_backlog(self, count):
+        """积压数量变化的回调（在回写线程中调用）"""
+        self.root.after(0, self.update_backlog_label, count)
+
+    def update_backlog_label(self, count):
+        if count:
+            self.backlog_label.config(text=f"Excel被占用，待写入 {count} 条")
+        else:
+            self.backlog_label.config(text="")
+            self.log_message("积压的检测结果已全部写入Excel文件")
+
+    def recover_pending_results(self):
+        """启动时重新写入上次因文件被占用而未保存的结果"""
+        if self.excel_filename and os.path.exists(self.excel_filename):
+            count = self.excel_writer.recover(self.excel_filename)
+            if count:
+                self.log_message(f"发现 {count} 条上次未写入的检测结果，正在写入Excel文件")
+
+    def on_close(self):
+        """关闭窗口前停止检测，并等待未写完的结果保存"""
+        if self.detecting:
+            self.stop_detection()
+        if self.batch_active:
+            self.excel_writer.submit_flush()
+        self.config_watcher.stop()
+        self.serial_supervisor.stop()
+        if self.scanner is not None:
+            self.scanner.stop()
+            self.scanner = None
+        if self.capture_recorder is not None:
+            self.capture_recorder.close()
+        if self.csv_sink is not None:
+            self.csv_sink.close()
+        if self.result_archive is not None:
+            self.result_archive.close()
+        pending = self.excel_writer.pending_count()
+        if pending:
+            print(f"正在保存 {pending} 条未写入的检测结果...")
+        self.excel_writer.close()
+        backlog = self.excel_writer.backlog_count()
+        if backlog:
+            print(f"Excel文件仍被占用，{backlog} 条结果保存在旁路文件中，下次启动时写入")
+        self.root.destroy()
+    
+    def update_raw_data(self, data):
+        """更新原始数据显示"""
+        self.raw_data_text.delete("1.0", tk.END)
+        self.raw_data_text.insert(tk.END, data)
+    
+    def notify(self, title, message, level="info"):
+        """
+        检测流程中的提示：默认显示在界面底部并自动消失，不等待确认；
+        配置[Notify] modal = true 时仍使用对话框
+        """
+        notify_settings = self.app_config.notify
+        if notify_settings.sound:
+            beep(self.root, level)
+        if notify_settings.modal:
+            show = messagebox.showerror if level == "error" else messagebox.showinfo
+            show(title, message)
+        else:
+            self.notification_area.show(f"{title}：{message}", level, notify_settings.duration)
+    
+    def add_detection_result(self, detect_num, value, in_spec=None):
+        """添加检测结果到表格，in_spec为False（超出规格）时标红"""
+        self.result_table.insert("", tk.END, values=(f"第 {detect_num} 次", value),
+                                 tags=("fail",) if in_spec is False else ())
+    
+    def show_average(self, average, judgement=None):
+        """显示平均值和规格判定，不合格时标红"""
+        text = f"{average:.4f}" if average is not None else "--"
+        if judgement:
+            text += f"（{judgement}）"
+        self.avg_value_var.set(text)
+        self.avg_value_label.config(
+            foreground=self.mac_colors["danger"] if judgement == FAIL else self.mac_colors["primary"])
+    
+    def clear_detection_results(self):
+        """清空检测结果"""
+        # 清空原始数据
+        self.raw_data_text.delete("1.0", tk.END)
+        
+        # 清空检测结果表格
+        for item in self.result_table.get_children():
+            self.result_table.delete(item)
+        
+        # 清空平均值
+        self.show_average(None)
+    
+    def log_message(self, message):
+        """添加日志信息"""
+        timestamp = datetime.now().strftime("%H:%M:%S")
+        self.log_text.insert(tk.END, f"[{timestamp}] {message}\n")
+        self.log_text.see(tk.END)
+
+
+def run_gui(measure_startup=False):
+    """
+    运行图形界面
+    :param measure_startup: 启动计时模式，输出首次绘制和产品列表加载耗时后自动退出
+    """
+    try:
+        root = tk.Tk()
+        app = DensityDetectGUI(root, measure_startup=measure_startup)
+        root.mainloop()
+    except Exception as e:
+        print(f"GUI应用运行出错: {e}")
+        import traceback
+        traceback.print_exc()
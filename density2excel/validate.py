@@ -0,0 +1,227 @@
+"""
+工作簿模板批量校验与修复
+
+上班前检查待检测的工作簿，避免检测中途才发现读取时跳过了行或回写找不到产品：
+表头、合并单元格、空的产品型号、数值型号（1001.0）、首尾空白、重复的产品型号、
+无法解析的时间、非数值的读数都按行号报告。
+各工作簿分配到多个进程并行，以只读流式方式读取；可选输出修复后的副本（只写模式，只保留单元格的值）。
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, time
+
+from .xlsx import column_letters, read_merged_ranges
+
+HEADER = ("来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值")
+HEADER_ALIASES = {"检测时间": ("测试时间",)}
+MODEL_INDEX = 3  # D列：产品型号，回写时的匹配键
+TIME_INDEXES = (0, 1)  # A、B列：来样时间、检测时间
+NUMBER_INDEXES = range(5, 11)  # F~K列：密度1~密度5、平均值
+TIME_FORMATS = ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y/%m/%d %H:%M:%S", "%Y/%m/%d %H:%M", "%Y-%m-%d",
+                "%Y/%m/%d", "%H:%M:%S", "%H:%M")
+
+ERROR = "error"  # 会导致读取时跳过或回写错行
+WARNING = "warning"  # 可以自动修复或不影响回写
+
+
+def parse_time_text(text):
+    """
+    按常见格式解析时间文本
+    :return: (datetime, 是否只有时间部分)，无法解析时返回None
+    """
+    text = text.strip()
+    for time_format in TIME_FORMATS:
+        try:
+            parsed = datetime.strptime(text, time_format)
+        except ValueError:
+            continue
+        return parsed, "%Y" not in time_format
+    return None
+
+
+def normalize_model(value):
+    """产品型号规范化：数值型号去掉小数部分（1001.0 -> "1001"），文本去掉首尾空白"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _issue(issues, sheet, row, column, level, problem, value=None):
+    issues.append({
+        "sheet": sheet,
+        "row": row,
+        "column": column_letters(column + 1) if column is not None else None,
+        "level": level,
+        "problem": problem,
+        "value": value,
+    })
+
+
+def _check_header(issues, sheet, header):
+    header = list(header or ())
+    for index, expected in enumerate(HEADER):
+        actual = header[index] if index < len(header) else None
+        text = str(actual).strip() if actual is not None else ""
+        if text == expected or text in HEADER_ALIASES.get(expected, ()):
+            if actual != text:
+                _issue(issues, sheet, 1, index, WARNING, "表头有首尾空白", actual)
+            continue
+        level = ERROR if index == MODEL_INDEX else WARNING
+        _issue(issues, sheet, 1, index, level, f"表头应为“{expected}”", actual)
+
+
+def _normalize_time(value):
+    if not isinstance(value, str) or not value.strip():
+        return value
+    parsed = parse_time_text(value)
+    if parsed is None:
+        return value
+    parsed, time_only = parsed
+    return parsed.strftime("%H:%M:%S" if time_only else "%Y-%m-%d %H:%M:%S")
+
+
+def _check_row(issues, sheet, row_number, values, seen):
+    """检查一个数据行，返回修复后的值"""
+    fixed = list(values)
+    has_data = any(value not in (None, "") for value in values)
+    model = values[MODEL_INDEX]
+    if model is None or (isinstance(model, str) and not model.strip()):
+        if has_data:
+            _issue(issues, sheet, row_number, MODEL_INDEX, ERROR, "产品型号为空，读取时会跳过该行", model)
+        return fixed
+
+    normalized = normalize_model(model)
+    if isinstance(model, (int, float)):
+        _issue(issues, sheet, row_number, MODEL_INDEX, WARNING, "产品型号是数值，应为文本", model)
+    elif isinstance(model, str) and model != normalized:
+        _issue(issues, sheet, row_number, MODEL_INDEX, WARNING, "产品型号有首尾空白", model)
+    fixed[MODEL_INDEX] = normalized
+    key = str(normalized).upper()
+    if key in seen:
+        _issue(issues, sheet, row_number, MODEL_INDEX, WARNING,
+               f"产品型号与第 {seen[key]} 行重复，检测结果按行号回写到各自的行", model)
+    else:
+        seen[key] = row_number
+
+    for index in TIME_INDEXES:
+        value = values[index]
+        if value in (None, "") or isinstance(value, (datetime, date, time)):
+            continue
+        if not isinstance(value, str) or parse_time_text(value) is None:
+            _issue(issues, sheet, row_number, index, WARNING, "无法解析的时间", value)
+        else:
+            fixed[index] = _normalize_time(value)
+
+    for index in NUMBER_INDEXES:
+        value = values[index]
+        if value in (None, "") or (isinstance(value, (int, float)) and not isinstance(value, bool)):
+            continue
+        try:
+            fixed[index] = float(str(value).strip())
+        except ValueError:
+            _issue(issues, sheet, row_number, index, WARNING, "不是数值", value)
+            continue
+        _issue(issues, sheet, row_number, index, WARNING, "数值保存为文本", value)
+
+    for index in (2, 4):
+        if isinstance(values[index], str) and values[index] != values[index].strip():
+            _issue(issues, sheet, row_number, index, WARNING, "有首尾空白", values[index])
+            fixed[index] = values[index].strip()
+    return fixed
+
+
+def validate_workbook(filename, output_dir=None):
+    """
+    校验一个工作簿的全部工作表（在工作进程中运行）
+    :param filename: 工作簿
+    :param output_dir: 修复后副本的输出目录，为None时只校验
+    :return: {"file", "sheets", "rows", "issues", "output"}，issues为
+             [{"sheet", "row", "column", "level", "problem", "value"}, ...]；无法打开时为 {"file", "error"}
+    """
+    from openpyxl import Workbook, load_workbook
+
+    summary = {"file": filename, "sheets": 0, "rows": 0, "issues": [], "output": None}
+    issues = summary["issues"]
+    source = None
+    try:
+        merged = read_merged_ranges(filename)
+        source = load_workbook(filename, read_only=True)
+        target = Workbook(write_only=True) if output_dir else None
+        for sheet in source.worksheets:
+            summary["sheets"] += 1
+            name = sheet.title
+            # 合并区域中只有左上角单元格有值，修复时把值填入区域内的每个单元格
+            fill = {}
+            for min_col, min_row, max_col, max_row in merged.get(name, ()):
+                _issue(issues, name, min_row, min_col - 1, ERROR if min_row > 1 else WARNING,
+                       f"合并单元格 {column_letters(min_col)}{min_row}:{column_letters(max_col)}{max_row}")
+                for row_number in range(min_row, max_row + 1):
+                    for column in range(min_col, max_col + 1):
+                        if (row_number, column) != (min_row, min_col):
+                            fill[(row_number, column)] = (min_row, min_col)
+            anchors = {anchor: None for anchor in fill.values()}
+
+            out_sheet = target.create_sheet(name) if target is not None else None
+            seen = {}
+            for row_number, row in enumerate(sheet.iter_rows(values_only=True), 1):
+                values = list(row)
+                if len(values) < len(HEADER):
+                    values.extend([None] * (len(HEADER) - len(values)))
+                for column, value in enumerate(values, 1):
+                    if (row_number, column) in anchors:
+                        anchors[(row_number, column)] = value
+                    elif (row_number, column) in fill:
+                        values[column - 1] = anchors.get(fill[(row_number, column)])
+                if row_number == 1:
+                    _check_header(issues, name, row)
+                    fixed = [str(value).strip() if isinstance(value, str) else value for value in values]
+                else:
+                    if any(value not in (None, "") for value in values):
+                        summary["rows"] += 1
+                    fixed = _check_row(issues, name, row_number, values, seen)
+                if out_sheet is not None:
+                    out_sheet.append(fixed)
+        if target is not None:
+            os.makedirs(output_dir, exist_ok=True)
+            output = os.path.join(output_dir, os.path.basename(filename))
+            target.save(output)
+            summary["output"] = output
+        issues.sort(key=lambda issue: (issue["sheet"], issue["row"], issue["column"] or ""))
+        return summary
+    except Exception as e:
+        return {"file": filename, "error": str(e)}
+    finally:
+        if source is not None:
+            source.close()
+
+
+def validate_workbooks(filenames, output_dir=None, workers=None, on_result=None):
+    """
+    多进程批量校验
+    :param filenames: 工作簿列表
+    :param output_dir: 修复后副本的输出目录，为None时只校验
+    :param workers: 进程数，默认CPU核数
+    :param on_result: 每完成一个文件的回调 on_result(summary)，按完成顺序调用
+    :return: 按输入顺序排列的各文件结果
+    """
+    if not filenames:
+        return []
+    if output_dir:
+        names = [os.path.basename(filename) for filename in filenames]
+        if len(set(names)) != len(names):
+            raise ValueError("不同目录中有同名工作簿，输出时会互相覆盖")
+    workers = min(workers or os.cpu_count() or 1, len(filenames))
+    results = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(validate_workbook, filename, output_dir): filename for filename in filenames}
+        for future in as_completed(futures):
+            summary = future.result()
+            results[futures[future]] = summary
+            if on_result:
+                on_result(summary)
+    return [results[filename] for filename in filenames]
@@ -0,0 +1,472 @@
+"""
+直接读写xlsx压缩包中的XML
+
+openpyxl的只读模式不提供合并单元格等信息，这里按需解析工作表XML：
+通过workbook.xml和关系文件找到工作表对应的压缩包成员，用iterparse流式读取，不加载整个工作表。
+差异回写只替换工作表XML中修改的单元格，其它压缩包成员原样复制，
+openpyxl不支持的图表、数据验证等内容不会丢失，也不必重新生成全部样式。
+"""
+
+import html
+import math
+import os
+import posixpath
+import re
+import struct
+import zipfile
+import zlib
+from xml.etree.ElementTree import iterparse
+
+from .spec import JUDGEMENT_KEY
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+_CELL_REF = re.compile(r"^\$?([A-Z]+)\$?(\d+)$")
+
+
+def column_index(letters):
+    """列字母转换为列号（A=1）"""
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord("A") + 1
+    return index
+
+
+def column_letters(index):
+    """列号转换为列字母（1=A）"""
+    letters = ""
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord("A") + remainder) + letters
+    return letters
+
+
+def split_cell_ref(ref):
+    """
+    拆分单元格地址
+    :param ref: 例如 "D12"
+    :return: (列号, 行号)，例如 (4, 12)
+    """
+    match = _CELL_REF.match(ref.upper())
+    if match is None:
+        raise ValueError(f"无效的单元格地址: {ref}")
+    return column_index(match.group(1)), int(match.group(2))
+
+
+def parse_range(ref):
+    """
+    拆分区域地址
+    :param ref: 例如 "A2:A5"，单个单元格也可以
+    :return: (起始列, 起始行, 结束列, 结束行)
+    """
+    first, _, last = ref.partition(":")
+    min_col, min_row = split_cell_ref(first)
+    max_col, max_row = split_cell_ref(last or first)
+    return min_col, min_row, max_col, max_row
+
+
+def sheet_members(archive):
+    """
+    工作表名称与压缩包成员的对应关系
+    :param archive: 已打开的zipfile.ZipFile
+    :return: {工作表名称: 成员路径}，按工作簿中的顺序
+    """
+    targets = {}
+    for _, element in iterparse(archive.open("xl/_rels/workbook.xml.rels")):
+        if element.tag == f"{{{PACKAGE_REL_NS}}}Relationship":
+            target = element.get("Target")
+            if target.startswith("/"):
+                target = target[1:]
+            else:
+                target = posixpath.normpath(posixpath.join("xl", target))
+            targets[element.get("Id")] = target
+    members = {}
+    for _, element in iterparse(archive.open("xl/workbook.xml")):
+        if element.tag == f"{{{MAIN_NS}}}sheet":
+            members[element.get("name")] = targets[element.get(f"{{{REL_NS}}}id")]
+    return members
+
+
+def read_merged_ranges(filename):
+    """
+    读取各工作表的合并单元格
+    :param filename: 工作簿
+    :return: {工作表名称: [(起始列, 起始行, 结束列, 结束行), ...]}
+    """
+    with zipfile.ZipFile(filename) as archive:
+        merged = {}
+        for name, member in sheet_members(archive).items():
+            ranges = merged[name] = []
+            for _, element in iterparse(archive.open(member)):
+                if element.tag == f"{{{MAIN_NS}}}mergeCell":
+                    ranges.append(parse_range(element.get("ref")))
+                elif element.tag == f"{{{MAIN_NS}}}row":
+                    element.clear()  # 单元格数据用不到，及时释放
+        return merged
+
+
+class XlsxPatchError(ValueError):
+    """工作簿结构不适合直接修改XML（例如要覆盖公式、zip64、加密），调用方应改用openpyxl保存"""
+
+
+_ROW = re.compile(r"<row\b([^>]*?)(?:/>|>(.*?)</row>)", re.S)
+_CELL = re.compile(r"<c\b([^>]*?)(?:/>|>(.*?)</c>)", re.S)
+_ATTR = re.compile(r'\s([\w:]+)="([^"]*)"')
+_TEXT = re.compile(r"<t\b[^>]*?(?:/>|>(.*?)</t>)", re.S)
+_VALUE = re.compile(r"<v\b[^>]*?(?:/>|>(.*?)</v>)", re.S)
+_PHONETIC = re.compile(r"<rPh\b.*?</rPh>", re.S)
+
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_ZIP32_LIMIT = 0xFFFFFFFF
+_FLAG_ENCRYPTED = 0x01
+_FLAG_DATA_DESCRIPTOR = 0x08
+_FLAG_UTF8 = 0x800
+
+DETECTION_COLUMNS = ((2, "检测时间"), (6, "密度1"), (7, "密度2"), (8, "密度3"), (9, "密度4"), (10, "密度5"),
+                     (11, "平均值"))
+APPEND_COLUMNS = ((1, "来样时间"), (3, "机台号"), (4, "产品型号"), (5, "班次"))
+ROW_KEY = "行号"  # 检测数据中产品所在的行号，回写时优先写入该行
+JUDGEMENT_COLUMN = 12  # L列：规格判定，只在检测数据中有判定时写入
+
+
+def detection_row(detect_data):
+    """检测数据中产品所在的行号（ExcelWriteWorker.submit时加入），没有或无效时返回None"""
+    row = detect_data.get(ROW_KEY)
+    if isinstance(row, int) and not isinstance(row, bool) and row >= 2:
+        return row
+    return None
+
+
+def _attributes(text):
+    return dict(_ATTR.findall(text))
+
+
+def _unescape(text):
+    return html.unescape(text or "")
+
+
+def _shared_strings(archive):
+    """读取共享字符串表（只在产品型号列用到共享字符串时读取）"""
+    try:
+        stream = archive.open("xl/sharedStrings.xml")
+    except KeyError:
+        return []
+    strings = []
+    for _, element in iterparse(stream):
+        if element.tag == f"{{{MAIN_NS}}}si":
+            # 拼音（rPh）不属于单元格的值
+            phonetic = {id(t) for rph in element.iter(f"{{{MAIN_NS}}}rPh") for t in rph.iter(f"{{{MAIN_NS}}}t")}
+            strings.append("".join(t.text or "" for t in element.iter(f"{{{MAIN_NS}}}t") if id(t) not in phonetic))
+            element.clear()
+    return strings
+
+
+def _cell_text(attributes, body, shared):
+    """单元格的值转换为文本，与openpyxl读取后str()的结果一致"""
+    kind = attributes.get("t", "n")
+    if kind == "inlineStr":
+        return "".join(_unescape(text) for text in _TEXT.findall(_PHONETIC.sub("", body or "")))
+    match = _VALUE.search(body or "")
+    if match is None:
+        return ""
+    value = _unescape(match.group(1))
+    if kind == "s":
+        return shared()[int(value)]
+    if kind == "n" and value:
+        return str(float(value)) if any(char in value for char in ".eE") else str(int(value))
+    if kind == "b":
+        return str(value == "1")
+    return value
+
+
+def _format_cell(ref, style, value):
+    """
+    生成单元格XML：数值写<v>，文本写内联字符串（不修改共享字符串表），
+    None和非有限数值（NaN、无穷大，与openpyxl保存的结果一致）写为空单元格，只保留样式
+    """
+    style_attr = f' s="{style}"' if style else ""
+    if value is None or value == "" or (isinstance(value, float) and not math.isfinite(value)):
+        return f'<c r="{ref}"{style_attr}/>' if style else ""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise XlsxPatchError(f"不支持直接写入的值类型: {type(value).__name__}")
+    if isinstance(value, str):
+        space = ' xml:space="preserve"' if value != value.strip() else ""
+        return f'<c r="{ref}"{style_attr} t="inlineStr"><is><t{space}>{html.escape(value, quote=False)}</t></is></c>'
+    return f'<c r="{ref}"{style_attr}><v>{value!r}</v></c>'
+
+
+def _patch_row(row_number, attributes_text, body, values):
+    """
+    修改一行中的若干单元格，其它单元格原样保留
+    :param values: {列号: 值}
+    """
+    cells = []
+    for match in _CELL.finditer(body or ""):
+        attributes = _attributes(match.group(1))
+        if "r" not in attributes:
+            raise XlsxPatchError("单元格缺少地址")
+        cells.append((split_cell_ref(attributes["r"])[0], attributes, match.group(0)))
+    by_column = {column: (attributes, xml) for column, attributes, xml in cells}
+    for column, value in values.items():
+        attributes, xml = by_column.get(column, ({}, ""))
+        if "<f" in xml:
+            raise XlsxPatchError(f"{column_letters(column)}{row_number} 是公式单元格")
+        by_column[column] = (attributes, _format_cell(f"{column_letters(column)}{row_number}",
+                                                      attributes.get("s"), value))
+    # spans只是读取时的提示，单元格范围变化后去掉
+    attributes_text = re.sub(r'\sspans="[^"]*"', "", attributes_text)
+    content = "".join(by_column[column][1] for column in sorted(by_column))
+    return f"<row{attributes_text}>{content}</row>"
+
+
+def _update_dimension(xml, max_row, max_col):
+    match = re.search(r'<dimension\b[^>]*?\sref="([^"]*)"', xml)
+    if match is None:
+        return xml
+    try:
+        min_col, min_row, old_col, old_row = parse_range(match.group(1))
+    except ValueError:
+        return xml
+    ref = f"{column_letters(min_col)}{min_row}:{column_letters(max(old_col, max_col))}{max(old_row, max_row)}"
+    return xml[:match.start(1)] + ref + xml[match.end(1):]
+
+
+def patch_sheet_xml(xml, updates, shared):
+    """
+    在工作表XML中写入检测结果，与storage.apply_detection_results的规则相同：
+    检测数据中有行号且该行的D列仍是该产品型号时写入该行（同一型号有多行时不会写错行），
+    否则按D列（产品型号）找到第2行起第一个匹配的行；写入B、F~K列（有判定时还有L列），找不到时在末尾追加一行
+    :param xml: 工作表XML文本
+    :param updates: [(产品型号, 检测数据字典)]
+    :param shared: 返回共享字符串列表的函数
+    :return: 修改后的XML文本
+    """
+    if not re.search(r"<sheetData\b", xml):
+        raise XlsxPatchError("工作表XML中没有sheetData")
+    rows = []
+    for match in _ROW.finditer(xml):
+        attributes = _attributes(match.group(1))
+        if "r" not in attributes:
+            raise XlsxPatchError("行缺少行号")
+        rows.append((int(attributes["r"]), match))
+
+    targets = {}
+    for product_model, _ in updates:
+        key = str(product_model).strip() if product_model is not None else ""
+        if key:
+            targets[key] = None
+    remaining = len(targets)
+    # 检测数据中带行号的产品直接写入该行，先读出这些行的产品型号核对
+    known = {row: None for row in (detection_row(detect_data) for _, detect_data in updates) if row is not None}
+    last_known = max(known, default=0)
+    header_judgement = ""
+    for row_number, match in rows:
+        if row_number == 1:
+            for cell in _CELL.finditer(match.group(2) or ""):
+                attributes = _attributes(cell.group(1))
+                if attributes.get("r", "").upper() == f"{column_letters(JUDGEMENT_COLUMN)}1":
+                    header_judgement = _cell_text(attributes, cell.group(2), shared)
+                    break
+        if not remaining and row_number > last_known:
+            break
+        if row_number < 2:
+            continue
+        for cell in _CELL.finditer(match.group(2) or ""):
+            attributes = _attributes(cell.group(1))
+            if attributes.get("r", "").upper() == f"D{row_number}":
+                text = _cell_text(attributes, cell.group(2), shared).strip()
+                if row_number in known:
+                    known[row_number] = text
+                if text in targets and targets[text] is None:
+                    targets[text] = row_number
+                    remaining -= 1
+                break
+
+    changed = {}  # 行号 -> {列号: 值}
+    appended = []
+    last_row = max((row_number for row_number, _ in rows), default=0)
+    judged = any(JUDGEMENT_KEY in detect_data for product_model, detect_data in updates
+                 if product_model is not None and str(product_model).strip())
+    header_row = None
+    if judged and not header_judgement:
+        # 与storage.apply_detection_results相同，L1为空时写入表头
+        changed[1] = {JUDGEMENT_COLUMN: JUDGEMENT_KEY}
+        if not any(row_number == 1 for row_number, _ in rows):
+            header_row = _patch_row(1, ' r="1"', "", changed[1])
+            last_row = max(last_row, 1)
+    for product_model, detect_data in updates:
+        key = str(product_model).strip() if product_model is not None else ""
+        if not key:
+            continue
+        detection_time = detect_data.get("检测时间")
+        if detection_time is None:
+            detection_time = detect_data.get("测试时间")
+        values = {column: detect_data.get(name) for column, name in DETECTION_COLUMNS}
+        values[2] = detection_time
+        if JUDGEMENT_KEY in detect_data:
+            values[JUDGEMENT_COLUMN] = detect_data[JUDGEMENT_KEY]
+        row_number = detection_row(detect_data)
+        if row_number is None or known.get(row_number) != key:
+            row_number = targets[key]
+        if row_number is None:
+            # 与openpyxl的append相同，追加到最后一行之后；同一型号再次出现时写入追加的行
+            last_row += 1
+            row_number = targets[key] = last_row
+            values.update({column: detect_data.get(name, "") for column, name in APPEND_COLUMNS})
+            values[4] = key
+            appended.append(row_number)
+        changed.setdefault(row_number, {}).update(values)
+
+    pieces = []
+    position = 0
+    for row_number, match in rows:
+        if row_number in changed:
+            pieces.append(xml[position:match.start()])
+            pieces.append(_patch_row(row_number, match.group(1), match.group(2), changed[row_number]))
+            position = match.end()
+    pieces.append(xml[position:])
+    xml = "".join(pieces)
+
+    if header_row is not None:
+        # 工作表没有第1行时插入到sheetData开头（行必须按行号排列）
+        empty = re.search(r"<sheetData\b([^>]*?)/>", xml)
+        if empty is not None:
+            xml = xml[:empty.start()] + f"<sheetData{empty.group(1)}>{header_row}</sheetData>" + xml[empty.end():]
+        else:
+            start = re.search(r"<sheetData\b[^>]*>", xml).end()
+            xml = xml[:start] + header_row + xml[start:]
+    if appended:
+        new_rows = "".join(_patch_row(row_number, f' r="{row_number}"', "", changed[row_number])
+                           for row_number in appended)
+        empty = re.search(r"<sheetData\b([^>]*?)/>", xml)
+        if empty is not None:
+            xml = xml[:empty.start()] + f"<sheetData{empty.group(1)}>{new_rows}</sheetData>" + xml[empty.end():]
+        else:
+            end = xml.rindex("</sheetData>")
+            xml = xml[:end] + new_rows + xml[end:]
+    if appended or judged:
+        xml = _update_dimension(xml, last_row, JUDGEMENT_COLUMN if judged else 11)
+    return xml
+
+
+def _active_sheet(archive, members):
+    """活动工作表名称（workbookView的activeTab），与openpyxl的workbook.active一致"""
+    active = 0
+    for _, element in iterparse(archive.open("xl/workbook.xml")):
+        if element.tag == f"{{{MAIN_NS}}}workbookView":
+            active = int(element.get("activeTab", 0))
+            break
+    names = list(members)
+    return names[active] if 0 <= active < len(names) else names[0]
+
+
+def active_sheet_name(filename):
+    """工作簿的活动工作表名称，只读取workbook.xml和关系文件，不加载工作表"""
+    with zipfile.ZipFile(filename) as archive:
+        return _active_sheet(archive, sheet_members(archive))
+
+
+def _dos_time(date_time):
+    year, month, day, hour, minute, second = date_time
+    return (hour << 11) | (minute << 5) | (second // 2), ((year - 1980) << 9) | (month << 5) | day
+
+
+def _encoded_name(info):
+    return info.filename.encode("utf-8" if info.flag_bits & _FLAG_UTF8 else "cp437")
+
+
+def _write_zip(source, archive, target, replaced):
+    """
+    写出新的压缩包：replaced中的成员重新压缩，其它成员的压缩数据原样复制（不解压）
+    :param source: 原文件对象
+    :param archive: 原文件的ZipFile
+    :param target: 输出文件对象
+    :param replaced: {成员路径: 新内容(bytes)}
+    """
+    infos = archive.infolist()
+    if len(infos) >= 0xFFFF:
+        raise XlsxPatchError("压缩包成员过多")
+    central = []
+    for info in infos:
+        if info.flag_bits & _FLAG_ENCRYPTED:
+            raise XlsxPatchError("不支持加密的工作簿")
+        if max(info.file_size, info.compress_size, info.header_offset) >= _ZIP32_LIMIT:
+            raise XlsxPatchError("不支持zip64工作簿")
+        name = _encoded_name(info)
+        flags = info.flag_bits & ~_FLAG_DATA_DESCRIPTOR
+        if info.filename in replaced:
+            content = replaced[info.filename]
+            compressor = zlib.compressobj(6, zlib.DEFLATED, -15)
+            data = compressor.compress(content) + compressor.flush()
+            method, crc, size = zipfile.ZIP_DEFLATED, zlib.crc32(content), len(content)
+        else:
+            source.seek(info.header_offset)
+            header = _LOCAL_HEADER.unpack(source.read(_LOCAL_HEADER.size))
+            source.seek(info.header_offset + _LOCAL_HEADER.size + header[9] + header[10])
+            data = source.read(info.compress_size)
+            method, crc, size = info.compress_type, info.CRC, info.file_size
+        offset = target.tell()
+        if offset + len(data) >= _ZIP32_LIMIT:
+            raise XlsxPatchError("不支持zip64工作簿")
+        dos_time, dos_date = _dos_time(info.date_time)
+        target.write(_LOCAL_HEADER.pack(b"PK\x03\x04", info.extract_version, flags, method, dos_time, dos_date,
+                                         crc, len(data), size, len(name), 0))
+        target.write(name)
+        target.write(data)
+        central.append(_CENTRAL_HEADER.pack(
+            b"PK\x01\x02", info.create_version | (info.create_system << 8), info.extract_version, flags, method,
+            dos_time, dos_date, crc, len(data), size, len(name), len(info.extra), len(info.comment), 0,
+            info.internal_attr, info.external_attr, offset) + name + info.extra + info.comment)
+    start = target.tell()
+    for entry in central:
+        target.write(entry)
+    comment = archive.comment
+    target.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, len(central), len(central), target.tell() - start, start,
+                                  len(comment)) + comment)
+
+
+def patch_detection_results(filename, updates):
+    """
+    直接修改xlsx中的工作表XML写入检测结果（差异回写）
+    只重写用到的工作表XML，其它成员（样式、图表、数据验证等）的压缩数据原样复制。
+    用到的工作表XML仍要整个解压、扫描到最后一个要修改的行并重新压缩，
+    耗时与该工作表的大小成正比（比openpyxl完整保存小得多），与工作簿中其它内容无关。
+    先写到同目录下的临时文件再替换原文件，原文件被占用时替换失败，原文件保持不变。
+    :param filename: Excel文件名
+    :param updates: [(工作表名称, 产品型号, 检测数据字典)]，工作表名称为None时写入活动工作表
+    :raises XlsxPatchError: 工作簿结构不适合直接修改，调用方应改用openpyxl
+    """
+    directory, name = os.path.split(os.path.abspath(filename))
+    temp_filename = os.path.join(directory, f".{name}.saving.xlsx")
+    try:
+        with open(filename, "rb") as source, zipfile.ZipFile(source) as archive:
+            members = sheet_members(archive)
+            grouped = {}
+            for sheet_name, product_model, detect_data in updates:
+                sheet_name = sheet_name or _active_sheet(archive, members)
+                if sheet_name not in members:
+                    raise KeyError(f"Worksheet {sheet_name} does not exist.")
+                grouped.setdefault(members[sheet_name], []).append((product_model, detect_data))
+
+            strings = None
+
+            def shared():
+                nonlocal strings
+                if strings is None:
+                    strings = _shared_strings(archive)
+                return strings
+
+            replaced = {}
+            for member, sheet_updates in grouped.items():
+                xml = archive.read(member).decode("utf-8")
+                replaced[member] = patch_sheet_xml(xml, sheet_updates, shared).encode("utf-8")
+            with open(temp_filename, "wb") as target:
+                _write_zip(source, archive, target, replaced)
+        os.replace(temp_filename, filename)
+    finally:
+        if os.path.exists(temp_filename):
+            os.remove(temp_filename)
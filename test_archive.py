@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试检测结果二进制归档
+"""
+
+import math
+import os
+import sys
+import tempfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook
+
+from density2excel.archive import (HEADER, RECORD, ResultArchive, import_workbook, iter_records, read_strings,
+                                   record_count)
+from density2excel.storage import build_detect_data
+
+
+def product(model, machine, shift="白班"):
+    return {"来样时间": "08:00", "机台号": machine, "产品型号": model, "班次": shift}
+
+
+def test_append_and_scan():
+    """定长记录追加、重新打开后续写，字符串表复用序号，按切片读取"""
+    filename = os.path.join(tempfile.mkdtemp(), "archive", "results.d2a")
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1001", "1#"), "2024-03-01 08:10:00", [1.33, None, 1.31]))
+    archive.append(build_detect_data(product("1002", "2#"), "2024-03-01 08:20:00", [1.40, 1.42]))
+    archive.close()
+
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1001", "1#", "夜班"), "bad time", [1.35]))
+    archive.close()
+
+    assert os.path.getsize(filename) == HEADER.size + 3 * RECORD.size
+    assert record_count(filename) == 3
+    assert read_strings(filename) == ["1001", "1#", "白班", "1002", "2#", "夜班"]
+
+    records = list(iter_records(filename))
+    first = records[0]
+    assert (first["product"], first["machine"], first["shift"], first["count"]) == ("1001", "1#", "白班", 2)
+    assert first["readings"][0] == 1.33 and math.isnan(first["readings"][1])
+    assert first["average"] == 1.32
+    assert first["time"] > records[1]["time"] - 601
+    assert math.isnan(records[2]["time"])
+    assert [record["product"] for record in iter_records(filename, 1, 2)] == ["1002"]
+
+
+def test_partial_record_is_truncated():
+    """写入中断留下的半条记录在下次打开时截掉"""
+    filename = os.path.join(tempfile.mkdtemp(), "results.d2a")
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1001", "1#"), "2024-03-01 08:10:00", [1.33]))
+    archive.close()
+    with open(filename, "ab") as f:
+        f.write(b"\x00" * 10)
+
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1002", "1#"), "2024-03-01 08:20:00", [1.34]))
+    archive.close()
+    assert [record["product"] for record in iter_records(filename)] == ["1001", "1002"]
+
+
+def test_partial_string_line_is_truncated():
+    """字符串表中写入中断的最后一行读取时忽略，下次打开时截掉"""
+    filename = os.path.join(tempfile.mkdtemp(), "results.d2a")
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1001", "1#"), "2024-03-01 08:10:00", [1.33]))
+    archive.close()
+    strings_name = filename + ".strings.jsonl"
+    with open(strings_name, "ab") as f:
+        f.write('"10'.encode("utf-8"))
+    assert read_strings(filename) == ["1001", "1#", "白班"]
+
+    archive = ResultArchive(filename)
+    archive.append(build_detect_data(product("1002", "2#"), "2024-03-01 08:20:00", [1.34]))
+    archive.close()
+    assert read_strings(filename) == ["1001", "1#", "白班", "1002", "2#"]
+    assert [record["machine"] for record in iter_records(filename)] == ["1#", "2#"]
+
+    with open(strings_name, "ab") as f:
+        f.write(b'"\xe7\x99\n')  # 不完整的UTF-8字符
+    archive = ResultArchive(filename)
+    archive.close()
+    assert read_strings(filename) == ["1001", "1#", "白班", "1002", "2#"]
+    with open(strings_name, "rb") as f:
+        assert f.read().endswith(b'"2#"\n')
+
+
+def test_import_workbook():
+    """历史工作簿中已检测的行导入归档"""
+    directory = tempfile.mkdtemp()
+    workbook_name = os.path.join(directory, "2023.xlsx")
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"])
+    sheet.append(["08:00", "2023-05-01 08:10:00", "1#", "1001", "白班", 1.30, 1.32, None, None, None, 1.31])
+    sheet.append(["08:20", None, "2#", "1002", "白班"])
+    workbook.save(workbook_name)
+
+    filename = os.path.join(directory, "results.d2a")
+    archive = ResultArchive(filename)
+    assert import_workbook(archive, workbook_name) == 1
+    archive.close()
+    [record] = iter_records(filename)
+    assert record["machine"] == "1#" and record["count"] == 2 and record["average"] == 1.31
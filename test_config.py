@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试配置文件的解析、校验和热加载
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.config import (ConfigError, ConfigWatcher, SerialSettings, load_config, read_config_file,
+                                  save_serial_settings)
+
+
+def write_config(text):
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, "config.ini")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    return path
+
+
+def test_instrument_and_profile_overrides():
+    """当前仪器覆盖串口参数，仪器指定的方案覆盖默认方案"""
+    path = write_config("""
+[SerialConfig]
+port = COM2
+baudrate = 9600
+bytesize = 7
+instrument = line2
+
+[Instrument:line2]
+port = COM5
+profile = quick
+
+[Profile:quick]
+parser_profile = strict
+readings_per_sample = 3
+flush_policy = product
+""")
+    config = read_config_file(path)
+    assert config.serial.port == "COM5"
+    assert config.serial.bytesize == 7
+    assert config.serial.max_attempts == 15
+    assert config.profile_name == "quick"
+    assert config.profile.readings_per_sample == 3
+    assert config.profile.parser_profile == "strict"
+    assert not config.notify.modal and config.notify.sound
+
+
+def test_notify_section():
+    """[Notify] 控制检测流程中的提示方式"""
+    config = read_config_file(write_config("[Notify]\nmodal = yes\nsound = off\nduration = 2.5\n"))
+    assert config.notify.modal
+    assert not config.notify.sound
+    assert config.notify.duration == 2.5
+
+
+def test_invalid_values_are_rejected():
+    """无效的串口参数和方案在加载时报错"""
+    for text in ("[SerialConfig]\nparity = SPACE\n",
+                 "[SerialConfig]\nbaudrate = fast\n",
+                 "[SerialConfig]\nprofile = missing\n",
+                 "[Profile:default]\nreadings_per_sample = 6\n",
+                 "[Profile:default]\nwrite_mode = fast\n",
+                 "[Profile:default]\nspec_min = 1.4\nspec_max = 1.3\n",
+                 "[CsvLog]\nmax_size_mb = 0\n",
+                 "[Notify]\nmodal = sometimes\n",
+                 "[Notify]\nduration = 0\n"):
+        try:
+            read_config_file(write_config(text))
+        except ConfigError:
+            continue
+        raise AssertionError(f"未拒绝无效配置: {text!r}")
+
+
+def test_watcher_reloads_changed_file():
+    """文件修改后重新加载，无效内容保留原配置"""
+    path = write_config("[SerialConfig]\nport = COM2\n")
+    assert load_config(path) is load_config(path)
+
+    changes, errors = [], []
+    watcher = ConfigWatcher(path, on_change=changes.append, on_error=errors.append)
+
+    time.sleep(0.01)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[SerialConfig]\nport = COM7\n")
+    os.utime(path, (time.time() + 1, time.time() + 1))
+    watcher.check()
+    assert changes[-1].serial.port == "COM7"
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[SerialConfig]\nbytesize = 9\n")
+    os.utime(path, (time.time() + 2, time.time() + 2))
+    watcher.check()
+    assert len(changes) == 1
+    assert len(errors) == 1
+
+    with open(path, "wb") as f:
+        f.write(b"[SerialConfig]\nport = \xff\xfe\n")
+    os.utime(path, (time.time() + 3, time.time() + 3))
+    watcher.check()  # 编码错误只报告，不抛出
+    assert len(changes) == 1
+    assert isinstance(errors[-1], UnicodeDecodeError)
+
+
+def test_save_serial_settings_to_active_instrument():
+    """选择了仪器时串口参数写入仪器节，保存后重新读取得到的就是保存的参数"""
+    path = write_config("[SerialConfig]\nport = COM2\ninstrument = line2\n\n[Instrument:line2]\nport = COM5\n")
+    save_serial_settings(SerialSettings(port="COM9", baudrate=19200), path)
+    config = read_config_file(path)
+    assert config.instrument == "line2"
+    assert config.serial.port == "COM9" and config.serial.baudrate == 19200
+
+    path = write_config("[SerialConfig]\nport = COM2\n")
+    save_serial_settings(SerialSettings(port="COM3"), path)
+    assert read_config_file(path).serial.port == "COM3"
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试串口连接监控：断线重连、COM号变化和帧拆分
+"""
+
+import os
+import sys
+import threading
+import time
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.config import SerialSettings
+from density2excel.connection import STATE_CONNECTED, STATE_DISCONNECTED, SerialSupervisor
+
+DENSITY_RECORD = b"Air          :    +   7.5262 g\r\nDensity      :         1.329 g/ccm\r\n"
+
+
+class FakeSerial:
+    """模拟串口：依次返回预设数据，unplugged后读取抛出异常"""
+
+    def __init__(self, device):
+        self.device = device
+        self.chunks = []
+        self.unplugged = False
+        self.closed = False
+
+    @property
+    def in_waiting(self):
+        if self.unplugged:
+            raise OSError("设备已移除")
+        return len(self.chunks[0]) if self.chunks else 0
+
+    def read(self, size=1):
+        if self.unplugged:
+            raise OSError("设备已移除")
+        if self.chunks:
+            return self.chunks.pop(0)
+        time.sleep(0.01)
+        return b""
+
+    def close(self):
+        self.closed = True
+
+
+class FakeBus:
+    """模拟可插拔的设备：present中的串口才能打开"""
+
+    def __init__(self):
+        self.present = {"COM2"}
+        self.opened = []
+        self.lock = threading.Lock()
+
+    def open(self, port, baudrate, bytesize, stopbits, parity, timeout):
+        with self.lock:
+            if port not in self.present:
+                raise OSError(f"找不到 {port}")
+            ser = FakeSerial(port)
+            self.opened.append(ser)
+            return ser
+
+
+def wait_until(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def make_supervisor(bus, relocate=None, states=None):
+    supervisor = SerialSupervisor(
+        lambda: SerialSettings(port="COM2"),
+        on_state=(lambda state, message: states.append(state)) if states is not None else None,
+        relocate=relocate,
+        opener=bus.open,
+    )
+    supervisor.RECONNECT_MIN_DELAY = 0.01
+    supervisor.RECONNECT_MAX_DELAY = 0.05
+    return supervisor
+
+
+def test_frames_and_stats():
+    """按Density行拆分帧，超时返回空字符串，统计收到的字节数"""
+    bus = FakeBus()
+    supervisor = make_supervisor(bus).start()
+    try:
+        assert wait_until(lambda: bus.opened)
+        assert supervisor.read_frame(timeout=0.05) == ""
+        bus.opened[0].chunks.extend([DENSITY_RECORD[:20], DENSITY_RECORD[20:]])
+        frame = supervisor.read_frame(timeout=1)
+        assert frame.splitlines()[-1].startswith("Density")
+        stats = supervisor.stats()
+        assert stats["state"] == STATE_CONNECTED
+        assert stats["total_bytes"] == len(DENSITY_RECORD)
+        assert stats["last_frame_age"] is not None
+    finally:
+        supervisor.stop()
+
+
+def test_reconnect_after_unplug():
+    """拔线后标记为断开，设备以新的COM号出现时自动重连"""
+    bus = FakeBus()
+    states = []
+    relocated = {"port": "COM9"}
+    supervisor = make_supervisor(bus, relocate=lambda: relocated if "COM9" in bus.present else None,
+                                 states=states).start()
+    try:
+        assert wait_until(lambda: supervisor.state == STATE_CONNECTED)
+        with bus.lock:
+            bus.present = set()
+            bus.opened[0].unplugged = True
+        assert wait_until(lambda: STATE_DISCONNECTED in states)
+
+        with bus.lock:
+            bus.present = {"COM9"}
+        assert wait_until(lambda: supervisor.state == STATE_CONNECTED and supervisor.port == "COM9")
+        bus.opened[-1].chunks.append(DENSITY_RECORD)
+        assert "1.329" in supervisor.read_frame(timeout=1)
+        assert bus.opened[0].closed
+    finally:
+        supervisor.stop()
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试读数CSV日志的缓冲、刷新和轮换
+"""
+
+import configparser
+import csv
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.config import CsvLogSettings, parse_config
+from density2excel.records import ProductRecord
+from density2excel.storage import CsvSink
+
+PRODUCT = ProductRecord(arrival_time="08:00", machine="1#", model="1001", shift="白班", row=2)
+
+
+def read_rows(filename):
+    with open(filename, newline="", encoding="utf-8") as f:
+        return list(csv.reader(f))
+
+
+def test_rows_flushed_by_size():
+    """完整的读数记录，缓冲满后才写到磁盘，close时写完"""
+    directory = tempfile.mkdtemp()
+    sink = CsvSink(directory, flush_bytes=200, flush_interval=3600)
+    timestamp = datetime(2024, 3, 1, 8, 30)
+    sink.write(PRODUCT, 1, 1.329, timestamp)
+    sink.write(PRODUCT, 2, None, timestamp)
+    filename = sink.filename
+    assert os.path.basename(filename) == "density_readings_20240301.csv"
+    assert os.path.getsize(filename) == 0  # 还在缓冲中
+
+    for index in range(3, 8):
+        sink.write(PRODUCT, index, 1.33, timestamp)
+    assert len(read_rows(filename)) > 1  # 达到flush_bytes后已刷新
+
+    sink.close()
+    rows = read_rows(filename)
+    assert rows[0] == CsvSink.HEADER
+    assert rows[1] == ["2024-03-01 08:30:00.000", "1001", "1#", "白班", "1", "1.329"]
+    assert rows[2][4:] == ["2", ""]
+    assert len(rows) == 8
+
+
+def test_rotation_by_day_and_size():
+    """跨天换文件，超过max_bytes（表头加三行）时加序号换文件，重启后续写未满的文件"""
+    directory = tempfile.mkdtemp()
+    sink = CsvSink(directory, max_bytes=210, flush_interval=0)
+    day = datetime(2024, 3, 1, 23, 59)
+    for index in range(1, 6):
+        sink.write(PRODUCT, index, 1.33, day)
+    sink.write(PRODUCT, 1, 1.33, day + timedelta(minutes=2))
+    sink.close()
+
+    names = sorted(os.listdir(directory))
+    assert names == ["density_readings_20240301.csv", "density_readings_20240301_1.csv",
+                     "density_readings_20240302.csv"]
+    for name in names:
+        assert os.path.getsize(os.path.join(directory, name)) <= 210
+        assert read_rows(os.path.join(directory, name))[0] == CsvSink.HEADER
+    total = sum(len(read_rows(os.path.join(directory, name))) - 1 for name in names)
+    assert total == 6
+
+    sink = CsvSink(directory, max_bytes=210, flush_interval=0)
+    sink.write(PRODUCT, 2, 1.33, day + timedelta(minutes=3))
+    sink.close()
+    rows = read_rows(os.path.join(directory, "density_readings_20240302.csv"))
+    assert rows.count(CsvSink.HEADER) == 1
+    assert len(rows) == 3
+
+
+def test_flush_if_due():
+    """没有新的写入时，定时检查在超过刷新间隔后把缓冲的读数写到磁盘"""
+    directory = tempfile.mkdtemp()
+    sink = CsvSink(directory, flush_interval=3600)
+    sink.write(PRODUCT, 1, 1.329, datetime(2024, 3, 1, 8, 30))
+    sink.flush_if_due()
+    assert os.path.getsize(sink.filename) == 0
+
+    sink.flush_interval = 0
+    sink.flush_if_due()
+    assert len(read_rows(sink.filename)) == 2
+    sink.close()
+    sink.flush_if_due()  # 关闭后不再刷新
+
+
+def test_size_read_when_reopened():
+    """重新打开已有文件时按磁盘上的实际大小计算，不超过max_bytes"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "density_readings_20240301.csv")
+    with open(filename, "w", newline="", encoding="utf-8") as f:
+        f.write("时间,产品型号\n" + "x" * 150 + "\n")
+    sink = CsvSink(directory, max_bytes=230, flush_interval=0)
+    sink.write(PRODUCT, 1, 1.33, datetime(2024, 3, 1, 8, 30))
+    assert sink._size == os.path.getsize(filename)
+    sink.write(PRODUCT, 2, 1.33, datetime(2024, 3, 1, 8, 30))
+    sink.close()
+    assert os.path.getsize(filename) <= 230
+    assert len(read_rows(os.path.join(directory, "density_readings_20240301_1.csv"))) == 2
+
+
+def test_settings():
+    """[CsvLog]配置，未启用时不创建日志"""
+    parser = configparser.ConfigParser()
+    parser.read_string("[SerialConfig]\nport = COM2\n[CsvLog]\nenabled = false\nmax_size_mb = 2\n")
+    settings = parse_config(parser).csv_log
+    assert settings == CsvLogSettings(enabled=False, max_size_mb=2)
+    assert CsvSink.from_settings(settings) is None
+    sink = CsvSink.from_settings(CsvLogSettings(directory=tempfile.mkdtemp(), max_size_mb=2))
+    assert sink.max_bytes == 2 * 1024 * 1024
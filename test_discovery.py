@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试串口自动识别与设备缓存
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.discovery import autodetect_serial, find_cached_port
+
+DENSITY_RECORD = """Air          :    +   7.5262 g
+Liquid       :    +   1.8717 g
+Volume       :         5.663 ccm
+Density      :         1.329 g/ccm
+"""
+
+PORTS = [
+    {"device": "COM3", "description": "蓝牙串口", "vid": None, "pid": None, "serial_number": None},
+    {"device": "COM7", "description": "USB Serial", "vid": 0x067B, "pid": 0x2303, "serial_number": "A1"},
+]
+
+
+def fake_reader(device, baudrate, bytesize, stopbits, parity, timeout):
+    """只有COM7在19200 7E1下能读到完整的密度记录，其它组合读到乱码"""
+    if device == "COM7" and baudrate == 19200 and bytesize == 7 and parity == "EVEN":
+        return DENSITY_RECORD
+    return "\x1a\x7f3.14\x00" if device == "COM7" else ""
+
+
+def test_autodetect_and_cache():
+    """并行试读识别出通信格式，重新插拔后按缓存直接找到新的COM号"""
+    cache_file = os.path.join(tempfile.mkdtemp(), "port_cache.json")
+
+    result = autodetect_serial(PORTS, timeout=0, reader=fake_reader, cache_file=cache_file)
+    assert result == {"port": "COM7", "baudrate": 19200, "bytesize": 7, "parity": "EVEN", "stopbits": 1}
+
+    replugged = [dict(PORTS[1], device="COM9")]
+    cached = find_cached_port(replugged, cache_file)
+    assert cached["port"] == "COM9"
+    assert cached["baudrate"] == 19200
+
+    def failing_reader(*args, **kwargs):
+        raise AssertionError("命中缓存时不应再试读")
+
+    assert autodetect_serial(replugged, reader=failing_reader, cache_file=cache_file)["port"] == "COM9"
+
+
+def test_autodetect_without_instrument():
+    """没有串口能解析出密度记录时返回None"""
+    cache_file = os.path.join(tempfile.mkdtemp(), "port_cache.json")
+    assert autodetect_serial(PORTS[:1], timeout=0, reader=fake_reader, cache_file=cache_file) is None
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试Excel回写线程在文件被占用时的积压与重试
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+import openpyxl
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel import storage
+
+
+def make_workbook_copy():
+    """复制示例工作簿到临时目录，避免修改仓库中的文件"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "density_data.xlsx")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "density_data.xlsx"), filename)
+    return filename
+
+
+def test_locked_workbook_is_retried():
+    """文件被占用时结果进入旁路文件，占用解除后一次写入"""
+    filename = make_workbook_copy()
+    original_save = storage.save_workbook_atomic
+    locked = {"count": 0}
+
+    def locked_save(workbook, target):
+        if locked["count"] < 2:
+            locked["count"] += 1
+            raise PermissionError("locked")
+        original_save(workbook, target)
+
+    storage.save_workbook_atomic = locked_save
+    storage.ExcelWriteWorker.RETRY_MIN_DELAY = 0.01
+    backlog = []
+    try:
+        writer = storage.ExcelWriteWorker(on_backlog=backlog.append)
+        writer.submit(filename, "Model002", {"检测时间": "2024-01-15 09:00:00", "平均值": 1.5})
+        writer.submit(filename, "Model003", {"检测时间": "2024-01-15 09:01:00", "平均值": 1.6})
+        writer.wait_idle()
+        while writer.backlog_count():
+            writer._thread.join(0.01)
+        writer.close()
+    finally:
+        storage.save_workbook_atomic = original_save
+        storage.ExcelWriteWorker.RETRY_MIN_DELAY = 1.0
+
+    assert max(backlog) == 2
+    assert backlog[-1] == 0
+    assert not os.path.exists(storage.pending_updates_filename(filename))
+    workbook = openpyxl.load_workbook(filename)
+    sheet = workbook.active
+    assert sheet["K3"].value == 1.5
+    assert sheet["K4"].value == 1.6
+    workbook.close()
+
+
+def test_recover_pending_updates():
+    """上次遗留的旁路文件在启动时重新写入"""
+    filename = make_workbook_copy()
+    storage.append_pending_update(filename, None, "Model004", {"检测时间": "2024-01-15 10:00:00", "平均值": 1.7})
+
+    writer = storage.ExcelWriteWorker()
+    assert writer.recover(filename) == 1
+    writer.close()
+
+    assert not os.path.exists(storage.pending_updates_filename(filename))
+    workbook = openpyxl.load_workbook(filename)
+    assert workbook.active["K5"].value == 1.7
+    workbook.close()
+
+
+def test_backlog_dropped_on_other_errors():
+    """积压的结果重试时遇到占用以外的错误，报告失败并删除旁路文件中的记录"""
+    filename = make_workbook_copy()
+    original_save = storage.save_workbook_atomic
+    errors = [PermissionError("locked"), ValueError("broken")]
+
+    def failing_save(workbook, target):
+        raise errors.pop(0) if errors else AssertionError("不应再次保存")
+
+    storage.save_workbook_atomic = failing_save
+    storage.ExcelWriteWorker.RETRY_MIN_DELAY = 0.01
+    done = []
+    try:
+        writer = storage.ExcelWriteWorker(on_done=lambda model, success: done.append((model, success)))
+        writer.submit(filename, "Model002", {"检测时间": "2024-01-15 09:00:00", "平均值": 1.5})
+        writer.wait_idle()
+        while writer.backlog_count():
+            writer._thread.join(0.01)
+        writer.close()
+    finally:
+        storage.save_workbook_atomic = original_save
+        storage.ExcelWriteWorker.RETRY_MIN_DELAY = 1.0
+
+    assert done == [("Model002", True), ("Model002", False)]
+    assert not errors
+    assert not os.path.exists(storage.pending_updates_filename(filename))
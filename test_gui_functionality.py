@@ -7,34 +7,43 @@
 import sys
 import os
 import datetime
+import shutil
+import tempfile
 import openpyxl
 
 # 添加当前目录到模块搜索路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# 导入主程序中的函数
-from main import read_product_models_from_excel, update_excel_with_test_results
+# 只导入存储模块，不加载串口和图形界面
+from density2excel.storage import read_product_models_from_excel, update_excel_with_test_results
 
-def test_excel_reading():
+def make_workbook_copy():
+    """复制示例工作簿到临时目录，测试不修改仓库中的density_data.xlsx"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "density_data.xlsx")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "density_data.xlsx"), filename)
+    return filename
+
+def check_excel_reading():
     """测试Excel文件读取功能"""
     print("测试Excel文件读取功能...")
     
     try:
         # 读取Excel文件
-        excel_filename = "density_data.xlsx"
+        excel_filename = make_workbook_copy()
         product_info_list = read_product_models_from_excel(excel_filename)
         
         print(f"成功读取 {len(product_info_list)} 个产品型号")
         for i, info in enumerate(product_info_list, 1):
             print(f"产品 {i}: {info}")
         
-        return True
+        return len(product_info_list) > 0
     
     except Exception as e:
         print(f"Excel文件读取失败: {str(e)}")
         return False
 
-def test_excel_writing():
+def check_excel_writing():
     """测试Excel文件写入功能"""
     print("\n测试Excel文件写入功能...")
     
@@ -54,8 +63,8 @@ def test_excel_writing():
             "平均值": 1.2345
         }
         
-        # 更新Excel文件
-        excel_filename = "density_data.xlsx"
+        # 更新Excel文件（临时副本）
+        excel_filename = make_workbook_copy()
         product_model = "TestModel"
         
         # 先将测试数据添加到Excel中
@@ -93,15 +102,21 @@ def test_excel_writing():
         print(f"Excel文件写入失败: {str(e)}")
         return False
 
+def test_excel_reading():
+    assert check_excel_reading()
+
+def test_excel_writing():
+    assert check_excel_writing()
+
 def main():
     """主测试函数"""
     print("=== GUI应用功能测试 ===")
     
     # 测试Excel读取功能
-    excel_reading_ok = test_excel_reading()
+    excel_reading_ok = check_excel_reading()
     
     # 测试Excel写入功能
-    excel_writing_ok = test_excel_writing()
+    excel_writing_ok = check_excel_writing()
     
     print("\n=== 测试结果 ===")
     print(f"Excel读取功能: {'通过' if excel_reading_ok else '失败'}")
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试读数来源记录
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.provenance import (
+    append_provenance,
+    build_reading_provenance,
+    provenance_filename,
+    read_provenance,
+)
+
+RAW = "Density      :         1.329 g/ccm\n"
+
+
+def test_append_and_filter():
+    """按产品追加，按工作表/行号/型号读回"""
+    excel_filename = os.path.join(tempfile.mkdtemp(), "density_data.xlsx")
+    first = {"产品型号": "1001", "行号": 2, "工作表": "Sheet1"}
+    second = {"产品型号": "1002", "行号": 3, "工作表": "Sheet1"}
+    append_provenance(excel_filename, first, "2024-03-01 08:00:00", [
+        build_reading_provenance(1, 1.329, 1, 0.42, [RAW]),
+        build_reading_provenance(2, None, 15, 9.81, ["garbage\n", "garbage\n"]),
+    ])
+    append_provenance(excel_filename, second, "2024-03-01 08:05:00", [
+        build_reading_provenance(1, 1.5, 2, 1.0, [RAW]),
+    ])
+
+    records = read_provenance(excel_filename, "Sheet1", 2, "1001")
+    assert len(records) == 1
+    readings = records[0]["readings"]
+    assert [reading["density"] for reading in readings] == [1.329, None]
+    assert readings[1]["attempts"] == 15
+    assert readings[1]["raw"] == ["garbage\n", "garbage\n"]
+    assert len(read_provenance(excel_filename)) == 2
+
+
+def test_truncated_member():
+    """最后一次写入不完整时保留之前的记录"""
+    excel_filename = os.path.join(tempfile.mkdtemp(), "density_data.xlsx")
+    product = {"产品型号": "1001", "行号": 2, "工作表": None}
+    append_provenance(excel_filename, product, "t1", [build_reading_provenance(1, 1.3, 1, 0.1, [RAW])])
+    with open(provenance_filename(excel_filename), "rb") as f:
+        member = f.read()
+    with open(provenance_filename(excel_filename), "ab") as f:
+        f.write(member[:len(member) // 2])
+
+    records = read_provenance(excel_filename, row=2)
+    assert [record["detect_time"] for record in records] == ["t1"]
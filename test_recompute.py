@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试归档工作簿批量重算与统计合并
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook, load_workbook
+
+from density2excel.recompute import find_workbooks, recompute_workbooks
+from density2excel.stats import RunningStats
+
+HEADER = ["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"]
+
+
+def make_workbook(filename, rows):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(filename)
+
+
+def test_running_stats_merge():
+    """分组统计合并后与整体计算一致"""
+    values = [1.31, 1.33, 1.29, 1.35, 1.30, 1.32, 1.28]
+    left, right, total = RunningStats(), RunningStats(), RunningStats()
+    for value in values[:3]:
+        left.add(value)
+    for value in values[3:]:
+        right.add(value)
+    for value in values:
+        total.add(value)
+    left.merge(right)
+    assert left.count == 7
+    assert abs(left.mean - statistics.mean(values)) < 1e-12
+    assert abs(left.stdev - statistics.stdev(values)) < 1e-12
+    assert abs(total.stdev - left.stdev) < 1e-12
+    assert (left.minimum, left.maximum) == (1.28, 1.35)
+
+
+def test_recompute_workbooks():
+    """多进程重算平均值，超出范围的读数不计入，输出副本并合并统计"""
+    directory = tempfile.mkdtemp()
+    make_workbook(os.path.join(directory, "2023.xlsx"), [
+        ["08:00", "08:10", "1#", "1001", "白班", 1.30, 1.32, 1.31, 1.33, 9.99, 2.97],
+        ["08:20", None, "2#", "1002", "白班"],
+    ])
+    make_workbook(os.path.join(directory, "2024.xlsx"), [
+        ["09:00", "09:10", "3#", "1003", "夜班", 1.50, 1.52, None, None, None, 1.51],
+    ])
+    with open(os.path.join(directory, "~$2024.xlsx"), "w") as f:
+        f.write("lock")
+
+    filenames = find_workbooks([directory])
+    assert [os.path.basename(name) for name in filenames] == ["2023.xlsx", "2024.xlsx"]
+
+    output_dir = os.path.join(directory, "out")
+    merged, summaries = recompute_workbooks(filenames, output_dir, low=0.5, high=5.0, workers=2)
+    assert merged["files"] == 2 and merged["failed"] == 0
+    assert merged["rows"] == 3 and merged["measured"] == 2
+    assert merged["changed"] == 1
+    assert merged["averages"].count == 2
+    assert merged["readings"].count == 6
+    assert summaries[0]["changed"] == 1
+
+    sheet = load_workbook(os.path.join(output_dir, "2023.xlsx")).active
+    assert sheet["K2"].value == 1.315
+    assert sheet["D3"].value == "1002"
+    assert sheet["K3"].value is None
+
+
+def test_recompute_rejudges_with_spec():
+    """给出规格表时按重算后的平均值重新判定L列，没有规格的型号和未检测的行保持原样"""
+    from density2excel.spec import FAIL, PASS, SpecLimit, SpecTable
+
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "judged.xlsx")
+    make_workbook(filename, [
+        ["08:00", "08:10", "1#", "1001", "白班", 1.30, 1.32, 1.31, 1.33, 9.99, 2.97, FAIL],
+        ["08:20", "08:30", "2#", "2002", "白班", 1.30, 1.31, None, None, None, 1.305, "人工"],
+        ["08:40", None, "3#", "1001", "白班"],
+    ])
+    spec = SpecTable({"1001": SpecLimit(1.30, 1.35)})
+    output_dir = os.path.join(directory, "out")
+    merged, _ = recompute_workbooks([filename], output_dir, low=0.5, high=5.0, workers=1, spec=spec)
+    assert merged["changed"] == 1 and merged["rejudged"] == 1
+
+    sheet = load_workbook(os.path.join(output_dir, "judged.xlsx")).active
+    assert sheet["L1"].value == "判定"
+    assert (sheet["K2"].value, sheet["L2"].value) == (1.315, PASS)
+    assert sheet["L3"].value == "人工"
+    assert sheet["L4"].value is None
+
+    # 没有规格表时L列不变
+    merged, _ = recompute_workbooks([filename], output_dir, low=0.5, high=5.0, workers=1)
+    assert merged["rejudged"] == 0
+    assert load_workbook(os.path.join(output_dir, "judged.xlsx")).active["L2"].value == FAIL
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试产品/检测记录类
+"""
+
+import os
+import sys
+import tracemalloc
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.records import DetectionRecord, ProductRecord, build_product_index, find_scanned_product
+from density2excel.storage import build_detect_data, read_detection_history
+
+ROW = ("2024-03-01 08:00", None, "1#", " 1001 ", "白班", None, None, None, None, None, None)
+
+
+def test_product_record_keys():
+    """按原来的中文键读写，转换为字典时内容不变"""
+    product = ProductRecord.from_row(ROW, 2, "density_data.xlsx", "Sheet1")
+    assert product["产品型号"] == "1001"
+    assert product.get("工作表") == "Sheet1"
+    assert product.get("不存在", "x") == "x"
+    assert not product["已完成"]
+    product["已完成"] = True
+    assert product.completed
+    assert product == {"来样时间": "2024-03-01 08:00", "机台号": "1#", "产品型号": "1001", "班次": "白班",
+                       "行号": 2, "已完成": True, "Excel文件": "density_data.xlsx", "工作表": "Sheet1"}
+    assert ProductRecord.from_row(ROW[:3] + ("  ",) + ROW[4:], 3) is None
+
+    detect_data = build_detect_data(product, "2024-03-01 08:10:00", [1.30, None, 1.32])
+    record = DetectionRecord.from_detect_data(detect_data)
+    assert record["密度2"] is None and record["密度5"] is None
+    assert record.to_detect_data() == detect_data
+
+
+def test_interned_strings_and_memory():
+    """重复的型号、机台号共享同一个字符串对象，内存占用不到字典的一半"""
+    rows = [("2024-03-01", None, f"{i % 8}#", f"型号{i % 50}", "白班" if i % 2 else "夜班") + (None,) * 6
+            for i in range(20000)]
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    records = [ProductRecord.from_row(row, i + 2, "density_data.xlsx") for i, row in enumerate(rows)]
+    record_size = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+
+    before = tracemalloc.take_snapshot()
+    dicts = [record.to_dict() for record in records]
+    dict_size = sum(stat.size_diff for stat in tracemalloc.take_snapshot().compare_to(before, "filename"))
+    tracemalloc.stop()
+
+    assert records[0].model is records[50].model
+    assert records[0].shift is records[2].shift
+    assert len(dicts) == len(records)
+    assert dict_size > 2 * record_size
+
+
+def test_read_detection_history():
+    """流式读取示例工作簿的检测记录"""
+    filename = os.path.join(os.path.dirname(os.path.abspath(__file__)), "density_data.xlsx")
+    history = read_detection_history(filename)
+    assert history
+    assert all(record.model for record in history)
+    measured = [record for record in history if record.average is not None]
+    assert all(len(record.densities) == 5 for record in measured)
+
+
+def test_scan_lookup():
+    """扫码按散列索引定位，大小写和空白不影响，同型号优先未完成的行"""
+    products = [ProductRecord(model=f"A{i:05d}", row=i + 2) for i in range(50000)]
+    products.append(ProductRecord(model="a00007", row=50002))
+    products[7]["已完成"] = True
+    index = build_product_index(products)
+
+    assert find_scanned_product(index, products, " A49999\r") == 49999
+    assert find_scanned_product(index, products, "a00007") == 50000
+    products[50000]["已完成"] = True
+    assert find_scanned_product(index, products, "A00007") == 7
+    assert find_scanned_product(index, products, "B1") is None
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试无界面检测引擎和HTTP/SSE服务（只使用本机回环地址）
+"""
+
+import http.client
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.engine import DetectionEngine
+from density2excel.provenance import read_provenance
+from density2excel.session import SessionCheckpointer, load_session_checkpoint
+from density2excel.service import DetectionService
+from density2excel.simulate import FakeClock
+from density2excel.storage import CsvSink
+
+
+def frame_source(values):
+    """依次返回Density帧，用完后循环"""
+    state = {"i": 0}
+    lock = threading.Lock()
+
+    def read_raw():
+        with lock:
+            value = values[state["i"] % len(values)]
+            state["i"] += 1
+        return f"Density      :         {value} g/ccm\n"
+
+    return read_raw
+
+
+def test_engine_stop_and_resume():
+    """第3个读数后停止，继续时只补齐剩余读数"""
+    events = []
+    engine = DetectionEngine(frame_source([1.31, 1.32, 1.33]), sleep=lambda seconds: None)
+
+    def on_event(event):
+        events.append(event)
+        if event["type"] == "reading" and event["reading"] == 3 and len(events) < 10:
+            engine.stop()
+
+    engine.on_event = on_event
+    products = [{"产品型号": "1001", "机台号": "1#", "来样时间": "", "班次": "白班"},
+                {"产品型号": "1002", "机台号": "2#", "来样时间": "", "班次": "白班"}]
+    engine.start(products, background=False)
+    assert events[-1]["type"] == "run_stopped"
+    assert engine.current_index == 0 and engine.partial == [1.31, 1.32, 1.33]
+
+    engine.resume(background=False)
+    done = [event for event in events if event["type"] == "product_done"]
+    assert [event["product"] for event in done] == ["1001", "1002"]
+    assert done[0]["densities"] == [1.31, 1.32, 1.33, 1.31, 1.32]
+    assert events[-1]["type"] == "run_finished"
+    assert engine.current_index is None
+
+
+def test_engine_records_csv_and_provenance():
+    """引擎写CSV日志和读数记录，停止后继续沿用原来的检测时间"""
+    directory = tempfile.mkdtemp()
+    excel_filename = os.path.join(directory, "data.xlsx")
+    clock = FakeClock()
+    csv_sink = CsvSink(os.path.join(directory, "csv"), flush_interval=3600, clock=clock.now)
+    events = []
+    engine = DetectionEngine(frame_source([1.31, 1.32]), sleep=clock.sleep, now=clock.now, csv_sink=csv_sink,
+                             provenance=True)
+
+    def on_event(event):
+        events.append(event)
+        clock.advance(60)
+        if event["type"] == "reading" and event["reading"] == 2 and not engine.partial[2:]:
+            engine.stop()
+
+    engine.on_event = on_event
+    product = {"产品型号": "1001", "机台号": "1#", "来样时间": "", "班次": "白班", "行号": 2}
+    engine.start([product], excel_filename, background=False)
+    assert engine.partial == [1.31, 1.32]
+    engine.resume(excel_filename, background=False)
+    csv_sink.close()
+
+    started = [event["detect_time"] for event in events if event["type"] == "product_started"]
+    assert len(started) == 2 and started[0] == started[1]
+    records = read_provenance(excel_filename, row=2)
+    assert [record["detect_time"] for record in records] == started[:1]
+    assert [reading["reading"] for reading in records[0]["readings"]] == [1, 2, 3, 4, 5]
+    assert "Density" in records[0]["readings"][0]["raw"][0]
+    with open(csv_sink.filename, encoding="utf-8") as f:
+        rows = f.read().splitlines()
+    assert len(rows) == 6 and rows[1].endswith(",1,1.31")
+
+
+def test_engine_stop_during_reading():
+    """读数进行中按停止：中断的读数不写CSV、不写断点，从断点继续时重新读取"""
+    directory = tempfile.mkdtemp()
+    excel_filename = os.path.join(directory, "data.xlsx")
+    checkpoint_file = os.path.join(directory, "session.json")
+    clock = FakeClock()
+    csv_sink = CsvSink(os.path.join(directory, "csv"), flush_interval=3600, clock=clock.now)
+    products = [{"产品型号": "1001", "机台号": "1#", "来样时间": "", "班次": "白班", "行号": 2}]
+    source = frame_source([1.31, 1.32])
+    calls = []
+    engine = None
+
+    def read_raw():
+        calls.append(1)
+        if len(calls) == 3:
+            # 第3个读数等待仪器时操作员按停止，串口读取超时
+            engine.stop()
+            return ""
+        return source()
+
+    checkpointer = SessionCheckpointer(excel_filename, filename=checkpoint_file)
+    engine = DetectionEngine(read_raw, sleep=clock.sleep, now=clock.now, on_event=checkpointer.on_event,
+                             csv_sink=csv_sink, provenance=True)
+    engine.start(products, excel_filename, auto=False, background=False)
+    assert engine.partial == [1.31, 1.32]
+    state = load_session_checkpoint(checkpoint_file)
+    assert state["density_values"] == [1.31, 1.32] and state["completed_indices"] == []
+    with open(csv_sink.filename, encoding="utf-8") as f:
+        assert len(f.read().splitlines()) == 3
+    assert read_provenance(excel_filename, row=2) == []
+
+    # 重新打开程序后按断点继续（新的引擎），补齐剩余3个读数
+    events = []
+    checkpointer = SessionCheckpointer(excel_filename, filename=checkpoint_file)
+
+    def on_event(event):
+        events.append(event)
+        checkpointer.on_event(event)
+
+    engine = DetectionEngine(frame_source([1.33]), sleep=clock.sleep, now=clock.now, on_event=on_event,
+                             csv_sink=csv_sink, provenance=True)
+    engine.start(products, excel_filename, state["current_product_index"], auto=False,
+                 resume_values=state["density_values"], resume_time=state["detect_time"], background=False)
+    csv_sink.close()
+    done = [event for event in events if event["type"] == "product_done"]
+    assert done[0]["densities"] == [1.31, 1.32, 1.33, 1.33, 1.33]
+    assert events[0]["type"] == "run_started" and events[1]["detect_time"] == state["detect_time"]
+    assert load_session_checkpoint(checkpoint_file)["completed_indices"] == [0]
+    with open(csv_sink.filename, encoding="utf-8") as f:
+        rows = f.read().splitlines()
+    assert [row.rsplit(",", 2)[1] for row in rows[1:]] == ["1", "2", "3", "4", "5"]
+    records = read_provenance(excel_filename, row=2)
+    assert [reading["reading"] for reading in records[0]["readings"]] == [3, 4, 5]
+
+
+def post(address, path, body=None):
+    request = urllib.request.Request(address + path, data=json.dumps(body or {}).encode("utf-8"),
+                                     headers={"Content-Type": "application/json"}, method="POST")
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read())
+
+
+def read_events(host, port, results, ready):
+    """SSE客户端：收集事件直到run_finished"""
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    connection.request("GET", "/events")
+    response = connection.getresponse()
+    assert response.getheader("Content-Type").startswith("text/event-stream")
+    ready.release()
+    event_type = None
+    while True:
+        line = response.fp.readline().decode("utf-8").rstrip("\n")
+        if line.startswith("event: "):
+            event_type = line[len("event: "):]
+        elif line.startswith("data: "):
+            results.append(json.loads(line[len("data: "):]))
+            if event_type == "run_finished":
+                break
+    connection.close()
+
+
+def test_service_batches_and_sse():
+    """提交批次、开始检测，多个SSE客户端同时收到全部读数"""
+    gate = threading.Event()
+    source = frame_source([1.30, 1.34])
+
+    def read_raw():
+        gate.wait(5)
+        return source()
+
+    engine = DetectionEngine(read_raw, sleep=lambda seconds: None)
+    service = DetectionService(None, port=0, engine=engine).start()
+    host, port = service.server.server_address[:2]
+    try:
+        products = [{"产品型号": f"M{i}", "机台号": f"{i % 3}#"} for i in range(20)]
+        batch = post(service.address, "/batches", {"products": products})
+        assert batch == {"batch": 1, "count": 20}
+
+        clients = [[] for _ in range(5)]
+        ready = threading.Semaphore(0)
+        threads = [threading.Thread(target=read_events, args=(host, port, results, ready)) for results in clients]
+        for thread in threads:
+            thread.start()
+        for _ in threads:
+            assert ready.acquire(timeout=5)
+
+        status = post(service.address, "/runs", {"batch": 1})
+        assert status["state"] == "running"
+        try:
+            post(service.address, "/runs", {"batch": 1})
+            raise AssertionError("检测进行中时应返回409")
+        except urllib.error.HTTPError as e:
+            assert e.code == 409
+        gate.set()
+
+        for thread in threads:
+            thread.join(5)
+        for results in clients:
+            done = [event for event in results if event["type"] == "product_done"]
+            assert [event["product"] for event in done] == [f"M{i}" for i in range(20)]
+            assert sum(1 for event in results if event["type"] == "reading") == 100
+            assert abs(done[0]["average"] - 1.316) < 1e-9
+
+        with urllib.request.urlopen(service.address + "/status", timeout=5) as response:
+            assert json.loads(response.read())["state"] == "idle"
+    finally:
+        service.close()
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试模拟时钟、模拟仪器和内存串口下的完整检测流程（不接仪器、不等待真实时间）
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import load_workbook
+
+from density2excel.config import AppConfig, ProfileSettings, SerialSettings
+from density2excel.connection import STATE_CONNECTED, STATE_DISCONNECTED, SerialSupervisor
+from density2excel.provenance import read_provenance
+from density2excel.session import load_session_checkpoint
+from density2excel.simulate import (
+    GARBAGE_FRAME,
+    FakeClock,
+    RecordingWriter,
+    SimulatedInstrument,
+    SimulatedSerialDevice,
+    make_products,
+    run_shift,
+)
+from density2excel.storage import CsvSink, ExcelWriteWorker, read_product_models_from_excel
+
+
+def make_workbook_copy():
+    """复制示例工作簿到临时目录，避免修改仓库中的文件"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "density_data.xlsx")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "density_data.xlsx"), filename)
+    return filename
+
+
+def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_retry_backoff_uses_fake_clock():
+    """超时、乱码后的重试等待按模拟时间计算，读数延迟可以精确断言"""
+    clock = FakeClock()
+    instrument = SimulatedInstrument(clock, script=[None, None, GARBAGE_FRAME, 1.3312], measure_time=2.0)
+    config = AppConfig(profile=ProfileSettings(readings_per_sample=1))
+    started = time.perf_counter()
+    report = run_shift(make_products(1), instrument.read_frame, clock, config)
+    assert time.perf_counter() - started < 0.5
+    assert report["results"][0]["densities"] == [1.3312]
+    assert report["attempts"] == 4
+    # 超时3s + 退避0.1s + 超时3s + 退避0.2s + 乱码2s + 等待0.5s + 测量2s
+    assert abs(report["latency"]["max"] - 10.8) < 1e-9
+    assert abs(report["simulated_seconds"] - 10.8) < 1e-9
+
+
+def test_simulated_shift_throughput():
+    """几百个产品的班次在一秒内跑完，吞吐量和延迟按模拟时间断言，两次运行结果一致"""
+    clock = FakeClock()
+    writer = RecordingWriter()
+    report = run_shift(make_products(300), SimulatedInstrument(clock, measure_time=2.0).read_frame, clock,
+                       writer=writer)
+    assert report["products"] == 300 and report["readings"] == 1500 and report["failed_readings"] == 0
+    assert report["wall_seconds"] < 1.0
+    # 每个产品5次读数，每次2s：每小时360个
+    assert abs(report["throughput"] - 360) < 1e-6
+    assert report["latency"]["p50"] == report["latency"]["p95"] == report["latency"]["max"] == 2.0
+    assert [model for _, model, _ in writer.results] == [f"SIM{index:04d}" for index in range(1, 301)]
+
+    def noisy_run():
+        noisy_clock = FakeClock()
+        instrument = SimulatedInstrument(noisy_clock, dropout=0.03, garbage=0.02, seed=7)
+        return run_shift(make_products(300), instrument.read_frame, noisy_clock)
+
+    first, second = noisy_run(), noisy_run()
+    assert first["wall_seconds"] < 1.0
+    assert [event["densities"] for event in first["results"]] == [event["densities"] for event in second["results"]]
+    assert first["simulated_seconds"] == second["simulated_seconds"]
+    assert first["attempts"] > first["readings"] and first["failed_readings"] == 0
+    assert 300 < first["throughput"] < 360
+    assert first["latency"]["p50"] == 2.0 and first["latency"]["max"] > 5.0
+
+
+def test_stop_and_resume_in_auto_mode():
+    """全自动模式中途停止再继续，结果与不中断的运行完全一致"""
+    def run(stop_at):
+        clock = FakeClock()
+        return run_shift(make_products(20), SimulatedInstrument(clock, seed=3).read_frame, clock, stop_at=stop_at)
+
+    uninterrupted = run(())
+    interrupted = run([(0, 2), (7, 5), (19, 1)])
+    assert interrupted["resumes"] == 3 and uninterrupted["resumes"] == 0
+    assert interrupted["products"] == 20 and interrupted["readings"] == 100
+    assert [event["densities"] for event in interrupted["results"]] == \
+           [event["densities"] for event in uninterrupted["results"]]
+
+
+def test_stop_during_reading_and_resume_from_checkpoint():
+    """等待读数时停止（与图形界面相同的采集、CSV日志、读数记录和断点），从断点文件继续，结果与不中断的运行一致"""
+    def run(stop_during):
+        directory = tempfile.mkdtemp()
+        clock = FakeClock()
+        writer = RecordingWriter()
+        csv_sink = CsvSink(os.path.join(directory, "csv"), flush_interval=3600, clock=clock.now)
+        checkpoint_file = os.path.join(directory, "session.json")
+        report = run_shift(make_products(6), SimulatedInstrument(clock, seed=5).read_frame, clock, writer=writer,
+                           excel_filename=os.path.join(directory, "data.xlsx"), stop_during=stop_during,
+                           csv_sink=csv_sink, provenance=True, checkpoint_file=checkpoint_file)
+        csv_sink.close()
+        with open(csv_sink.filename, encoding="utf-8") as f:
+            csv_rows = f.read().splitlines()[1:]
+        return report, writer, csv_rows, load_session_checkpoint(checkpoint_file), directory
+
+    uninterrupted, _, csv_rows, _, _ = run(())
+    report, writer, interrupted_rows, state, directory = run([(0, 1), (2, 3), (5, 5)])
+    assert report["resumes"] == 3 and report["products"] == 6
+    assert report["readings"] == 30 and report["failed_readings"] == 0
+    assert [event["densities"] for event in report["results"]] == \
+           [event["densities"] for event in uninterrupted["results"]]
+    # 中断的读数没有写入CSV日志，每个产品恰好5行
+    assert len(interrupted_rows) == len(csv_rows) == 30
+    assert state["completed_indices"] == [0, 1, 2, 3, 4, 5] and state["density_values"] == []
+    # 从断点继续的产品沿用原来的检测时间，读数记录完整
+    third = read_provenance(os.path.join(directory, "data.xlsx"), product_model="SIM0003")
+    assert [record["detect_time"] for record in third] == [writer.results[2][2]["检测时间"]]
+    assert [reading["reading"] for reading in third[0]["readings"]] == [1, 2, 3, 4, 5]
+
+
+def test_resume_pending_only_with_duplicate_models():
+    """仅检测未完成时同一型号的第一行已完成，停止后继续的结果写入未完成的那一行"""
+    from openpyxl import Workbook
+
+    for write_mode in ("workbook", "patch"):
+        filename = os.path.join(tempfile.mkdtemp(), "duplicates.xlsx")
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5",
+                      "平均值"])
+        sheet.append(["08:00", "2024-02-29 20:00:00", "1#", "D1", "白班", 1.2, 1.2, 1.2, 1.2, 1.2, 1.2])
+        sheet.append(["09:00", None, "2#", "D1", "白班"])
+        workbook.save(filename)
+
+        pending = [product for product in read_product_models_from_excel(filename) if not product["已完成"]]
+        assert [product["行号"] for product in pending] == [3]
+        clock = FakeClock()
+        instrument = SimulatedInstrument(clock, script=[1.3301, 1.3302, 1.3303, 1.3304, 1.3305])
+        writer = ExcelWriteWorker(write_mode=write_mode)
+        try:
+            report = run_shift(pending, instrument.read_frame, clock, writer=writer, excel_filename=filename,
+                               stop_at=[(0, 2)])
+        finally:
+            writer.close()
+        assert report["resumes"] == 1 and report["products"] == 1
+
+        sheet = load_workbook(filename).active
+        assert sheet.max_row == 3
+        assert [cell.value for cell in sheet[2]][1:] == ["2024-02-29 20:00:00", "1#", "D1", "白班", 1.2, 1.2, 1.2,
+                                                          1.2, 1.2, 1.2]
+        assert [cell.value for cell in sheet[3]][5:] == [1.3301, 1.3302, 1.3303, 1.3304, 1.3305, 1.3303]
+
+
+def test_serial_path_end_to_end():
+    """内存串口经连接监控分帧后进入检测引擎，结果写入临时工作簿；拔线后自动重连"""
+    filename = make_workbook_copy()
+    products = read_product_models_from_excel(filename)[:4]
+    clock = FakeClock()
+    device = SimulatedSerialDevice(SimulatedInstrument(clock, script=[1.3301, 1.3302, 1.3303, 1.3304, 1.3305]))
+    supervisor = SerialSupervisor(lambda: SerialSettings(port="SIM1"), opener=device.open, clock=clock.monotonic)
+    supervisor.RECONNECT_MIN_DELAY = 0.01
+    supervisor.start()
+    writer = ExcelWriteWorker()
+    try:
+        assert wait_until(lambda: supervisor.state == STATE_CONNECTED)
+
+        def before_reading():
+            supervisor.clear()
+            device.trigger()
+
+        report = run_shift(products, lambda: supervisor.read_frame(timeout=2), clock, writer=writer,
+                           excel_filename=filename, before_reading=before_reading)
+        assert report["products"] == 4 and report["failed_readings"] == 0
+        assert report["results"][0]["densities"] == [1.3301, 1.3302, 1.3303, 1.3304, 1.3305]
+        assert report["wall_seconds"] < 1.0
+
+        device.unplug()
+        assert wait_until(lambda: supervisor.state == STATE_DISCONNECTED)
+        device.plug()
+        assert wait_until(lambda: supervisor.state == STATE_CONNECTED)
+        device.trigger()
+        assert "Density" in supervisor.read_frame(timeout=2)
+    finally:
+        supervisor.stop()
+        writer.close()
+
+    sheet = load_workbook(filename).active
+    rows = {row[3]: row for row in sheet.iter_rows(min_row=2, values_only=True)}
+    first = rows[products[0]["产品型号"]]
+    assert list(first[5:11]) == [1.3301, 1.3302, 1.3303, 1.3304, 1.3305, 1.3303]
+    assert first[1] == "2024-03-01 08:00:00"
+
+
+if __name__ == "__main__":
+    test_retry_backoff_uses_fake_clock()
+    test_simulated_shift_throughput()
+    test_stop_and_resume_in_auto_mode()
+    test_stop_during_reading_and_resume_from_checkpoint()
+    test_resume_pending_only_with_duplicate_models()
+    test_serial_path_end_to_end()
+    print("模拟检测流程测试通过")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试产品规格表和合格判定
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook, load_workbook
+
+from density2excel.config import AppConfig, ProfileSettings, SpecSettings
+from density2excel.spec import FAIL, PASS, SpecLimit, SpecTable, load_spec_file, load_spec_table
+from density2excel.storage import build_detect_data, save_detection_results
+
+HEADER = ["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"]
+
+
+def product(model):
+    return {"来样时间": "08:00", "机台号": "1#", "产品型号": model, "班次": "白班"}
+
+
+def test_load_csv_and_xlsx():
+    """CSV和工作簿中的规格表读取为按规范化型号的索引，空值表示不限"""
+    directory = tempfile.mkdtemp()
+    csv_filename = os.path.join(directory, "specs.csv")
+    with open(csv_filename, "w", encoding="utf-8-sig") as f:
+        f.write("产品型号,密度下限,密度上限,极差上限\n a1001 ,1.30,1.36,0.01\nB2002,1.25,,\n,1,2,\n")
+    limits = load_spec_file(csv_filename)
+    assert limits == {"A1001": SpecLimit(1.30, 1.36, 0.01), "B2002": SpecLimit(1.25, None, None)}
+
+    xlsx_filename = os.path.join(directory, "specs.xlsx")
+    workbook = Workbook()
+    workbook.active.title = "其它"
+    sheet = workbook.create_sheet("规格")
+    sheet.append(["备注", "密度上限", "产品型号", "密度下限"])
+    sheet.append(["", 1.40, 1001.0, 1.35])
+    workbook.save(xlsx_filename)
+    assert load_spec_file(xlsx_filename, "规格") == {"1001": SpecLimit(1.35, 1.40, None)}
+
+    with open(csv_filename, "w", encoding="utf-8") as f:
+        f.write("产品型号,密度下限,密度上限\nA1,1.4,1.3\n")
+    try:
+        load_spec_file(csv_filename)
+        assert False, "下限大于上限应报错"
+    except ValueError as e:
+        assert "第 2 行" in str(e)
+
+
+def test_judge_and_default():
+    """按型号判定平均值和极差，规格表中没有的型号使用检测方案的上下限"""
+    table = SpecTable({"a1": SpecLimit(1.30, 1.36, 0.02)}, default=SpecLimit(None, 1.50))
+    assert table.check_reading(" A1 ", 1.37) is False
+    assert table.check_reading("A1", 1.33) is True
+    assert table.check_reading("A1", None) is None
+    assert table.judge("A1", [1.32, 1.34, None], 1.33) == PASS
+    assert table.judge("A1", [1.30, 1.36], 1.33) == FAIL  # 极差超出
+    assert table.judge("A1", [1.37, 1.37], 1.37) == FAIL
+    assert table.judge("A1", [None], None) == FAIL
+    assert table.judge("X9", [1.6], 1.6) == FAIL
+    assert table.limits("X9") == (None, 1.50)
+    assert SpecTable().judge("X9", [1.6], 1.6) is None
+
+    data = build_detect_data(product("A1"), "2024-03-01 08:10:00", [1.32, 1.34], spec=table)
+    assert data["判定"] == PASS
+    assert "判定" not in build_detect_data(product("A1"), "2024-03-01 08:10:00", [1.32], spec=SpecTable())
+
+
+def test_load_spec_table_falls_back():
+    """规格表无法读取时只使用检测方案中的上下限"""
+    messages = []
+    config = AppConfig(profile=ProfileSettings(spec_min=1.2), spec=SpecSettings(file="missing_specs.csv"))
+    table = load_spec_table(config, log=messages.append)
+    assert len(table) == 0 and table.limits("A1") == (1.2, None)
+    assert messages and "规格表" in messages[0]
+
+
+def test_judgement_written_to_column_l():
+    """判定写入L列并补上表头，openpyxl完整保存和差异回写的结果一致"""
+    table = SpecTable({"M1": SpecLimit(1.30, 1.36)})
+    updates = [
+        (None, "M1", build_detect_data(product("M1"), "2024-03-01 08:10:00", [1.33, 1.34], spec=table)),
+        (None, "M2", build_detect_data(product("M2"), "2024-03-01 08:11:00", [1.40], spec=SpecTable(
+            default=SpecLimit(1.30, 1.36)))),
+        (None, "M3", build_detect_data(product("M3"), "2024-03-01 08:12:00", [1.33], spec=SpecTable())),
+    ]
+    results = []
+    for write_mode in ("workbook", "patch"):
+        filename = os.path.join(tempfile.mkdtemp(), "data.xlsx")
+        workbook = Workbook()
+        workbook.active.append(HEADER)
+        workbook.active.append(["08:00", None, "1#", "M1", "白班"])
+        workbook.active.append(["08:00", None, "1#", "M3", "白班", None, None, None, None, None, None, "旧值"])
+        workbook.save(filename)
+        save_detection_results(filename, updates, write_mode=write_mode)
+        sheet = load_workbook(filename).active
+        results.append([[cell.value for cell in row] for row in sheet.iter_rows(min_col=4, max_col=12)])
+    assert results[0] == results[1]
+    rows = results[0]
+    assert rows[0][-1] == "判定"
+    assert (rows[1][0], rows[1][-1]) == ("M1", PASS)
+    assert (rows[2][0], rows[2][-1]) == ("M3", "旧值")  # 没有规格时不修改L列
+    assert (rows[3][0], rows[3][-1]) == ("M2", FAIL)
+
+
+if __name__ == "__main__":
+    test_load_csv_and_xlsx()
+    test_judge_and_default()
+    test_load_spec_table_falls_back()
+    test_judgement_written_to_column_l()
+    print("规格表测试通过")
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试班次、机台增量汇总
+"""
+
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+
+from openpyxl import Workbook
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.spec import FAIL, JUDGEMENT_KEY, SpecLimit, SpecTable
+from density2excel.stats import RunningStats
+from density2excel.storage import ExcelWriteWorker, build_detect_data
+from density2excel.summary import SummaryStore, format_report, summary_filename
+
+
+def make_workbook_copy():
+    """复制示例工作簿到临时目录，避免修改仓库中的文件"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "density_data.xlsx")
+    shutil.copy(os.path.join(os.path.dirname(os.path.abspath(__file__)), "density_data.xlsx"), filename)
+    return filename
+
+
+def detect_data(model, machine, shift, values):
+    product = {"来样时间": "08:00", "机台号": machine, "产品型号": model, "班次": shift}
+    return build_detect_data(product, "2024-03-01 08:10:00", values)
+
+
+def test_running_stats_remove():
+    """去掉一个数值后与重新计算一致"""
+    values = [1.31, 1.33, 1.29, 1.35, 1.30]
+    stats = RunningStats()
+    for value in values:
+        stats.add(value)
+    stats.remove(1.35)
+    assert stats.count == 4
+    assert abs(stats.mean - statistics.mean([1.31, 1.33, 1.29, 1.30])) < 1e-12
+    assert abs(stats.stdev - statistics.stdev([1.31, 1.33, 1.29, 1.30])) < 1e-12
+    for value in (1.31, 1.33, 1.29, 1.30):
+        stats.remove(value)
+    assert stats.count == 0 and stats.stdev is None
+
+
+def test_summary_updated_on_write_back():
+    """回写线程写入结果时更新汇总，重新检测的产品替换旧结果，重启后从记录文件恢复"""
+    filename = make_workbook_copy()
+    summaries = SummaryStore(judge=SpecTable(default=SpecLimit(1.30, 1.35)).judge)
+    writer = ExcelWriteWorker(summaries=summaries)
+    writer.submit(filename, "Model001", detect_data("Model001", "1#", "白班", [1.32, 1.34]))
+    writer.submit(filename, "Model002", detect_data("Model002", "1#", "白班", [1.36, 1.38]))
+    writer.submit(filename, "Model003", detect_data("Model003", "2#", "夜班", [1.31]))
+    writer.submit(filename, "Model004", detect_data("Model004", "2#", "夜班", [None, None]))
+    writer.submit(filename, "Model002", detect_data("Model002", "1#", "白班", [1.34, 1.34]))  # 重新检测
+    writer.close()
+
+    report = summaries.report(filename)
+    assert [(group["shift"], group["machine"], group["count"]) for group in report["groups"]] == [
+        ("夜班", "2#", 1), ("白班", "1#", 2)]
+    day = report["shifts"]["白班"]
+    assert abs(day["mean"] - 1.335) < 1e-9 and abs(day["sd"] - statistics.stdev([1.33, 1.34])) < 1e-9
+    assert day["out_of_spec"] == 0
+    assert report["total"]["count"] == 3
+    assert report["machines"]["2#"]["sd"] is None
+
+    restored = SummaryStore().report(filename)
+    assert restored == report
+    assert any("白班" in line for line in format_report(report))
+    with open(summary_filename(filename), encoding="utf-8") as f:
+        assert len(f.readlines()) == 5
+
+
+def test_out_of_spec_and_rebuild():
+    """超出规格的数量；扫描一次工作表重建汇总"""
+    filename = make_workbook_copy()
+    summaries = SummaryStore(judge=SpecTable(default=SpecLimit(1.30, 1.35)).judge)
+    summaries.record(filename, None, "X1", detect_data("X1", "3#", "白班", [1.40]))
+    summaries.record(filename, None, "X2", detect_data("X2", "3#", "白班", [1.32]))
+    assert summaries.report(filename)["machines"]["3#"]["out_of_spec"] == 1
+    summaries.record(filename, None, "X1", detect_data("X1", "3#", "白班", [1.33]))
+    assert summaries.report(filename)["machines"]["3#"]["out_of_spec"] == 0
+
+    count = summaries.rebuild(filename)
+    report = summaries.report(filename)
+    assert count == report["total"]["count"] > 0
+    assert "3#" not in report["machines"]
+    assert SummaryStore().report(filename) == report
+
+
+def test_rebuild_and_record_use_the_same_sheet_key():
+    """重新统计活动工作表后再回写同一产品（指定或不指定工作表名称），都替换原结果而不重复计入"""
+    filename = os.path.join(tempfile.mkdtemp(), "named.xlsx")
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "数据"
+    sheet.append(["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5",
+                  "平均值"])
+    sheet.append(["08:00", "2024-03-01 08:10:00", "1#", "A1", "白班", 1.30, None, None, None, None, 1.30])
+    sheet.append(["08:00", "2024-03-01 08:11:00", "1#", "A2", "白班", 1.31, None, None, None, None, 1.31])
+    workbook.save(filename)
+
+    summaries = SummaryStore()
+    assert summaries.rebuild(filename) == 2
+    writer = ExcelWriteWorker(summaries=summaries)
+    writer.submit(filename, "A1", detect_data("A1", "1#", "白班", [1.32]), sheet_name="数据", row=2)
+    writer.submit(filename, "A2", detect_data("A2", "1#", "白班", [1.34]), row=3)
+    writer.close()
+    report = summaries.report(filename)
+    assert report["total"]["count"] == 2 and abs(report["total"]["mean"] - 1.33) < 1e-9
+    assert SummaryStore().report(filename) == report
+
+
+def test_duplicate_models_counted_by_row_and_judged_by_spec():
+    """同一型号的两行按回写的行号分别计入；超出规格与L列的判定一致（包括极差超出）"""
+    filename = os.path.join(tempfile.mkdtemp(), "duplicates.xlsx")
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.append(["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5",
+                  "平均值"])
+    sheet.append(["08:00", None, "1#", "D1", "白班"])
+    sheet.append(["09:00", None, "1#", "D1", "白班"])
+    workbook.save(filename)
+
+    spec = SpecTable({"D1": SpecLimit(1.30, 1.35, spread=0.01)})
+    summaries = SummaryStore(judge=spec.judge)
+    writer = ExcelWriteWorker(summaries=summaries)
+    product = {"来样时间": "08:00", "机台号": "1#", "产品型号": "D1", "班次": "白班"}
+    wide = build_detect_data(product, "2024-03-01 08:10:00", [1.30, 1.34], spec=spec)  # 平均值合格，极差超出
+    assert wide[JUDGEMENT_KEY] == FAIL
+    writer.submit(filename, "D1", wide, row=2)
+    writer.submit(filename, "D1", build_detect_data(product, "2024-03-01 09:10:00", [1.32, 1.33], spec=spec), row=3)
+    writer.close()
+    report = summaries.report(filename)
+    assert report["total"]["count"] == 2 and report["total"]["out_of_spec"] == 1
+    assert SummaryStore().report(filename) == report
+
+    # 重新统计时按同一个规格表判定
+    assert summaries.rebuild(filename) == 2
+    assert summaries.report(filename) == report
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试趋势图的读数抽稀（不需要显示器）
+"""
+
+import os
+import random
+import statistics
+import sys
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from density2excel.trend import DecimatedSeries
+
+
+def test_decimation_is_bounded():
+    """十万个读数后列数不超过画布宽度，每列保留最小/最大值，整体重绘只发生对数次"""
+    rng = random.Random(1)
+    values = [rng.gauss(1.33, 0.01) for _ in range(100000)]
+    values[54321] = 1.5  # 一个离群点在抽稀后仍然可见
+
+    series = DecimatedSeries(max_columns=400)
+    actions = [series.add(value) for value in values]
+
+    assert series.count == len(values)
+    assert len(series.columns) <= 400
+    assert actions.count("rebuild") <= 10
+    assert max(column[1] for column in series.columns) == 1.5
+    assert min(column[0] for column in series.columns) == min(values)
+    assert series.columns[54321 // series.bucket][1] == 1.5
+
+    center, lower, upper = series.limits()
+    assert abs(center - statistics.mean(values)) < 1e-9
+    assert abs((upper - center) / 3 - statistics.stdev(values)) < 1e-9
+    assert lower < center < upper
+
+
+def test_limits_need_two_readings():
+    series = DecimatedSeries()
+    assert series.add(1.33) == "append"
+    assert series.limits() is None
+    series.add(1.35)
+    assert series.limits()[0] == 1.34
+
+
+def test_resize_to_canvas_width():
+    """画布变窄时合并到新的列数，变宽后新读数用上增加的宽度"""
+    series = DecimatedSeries(max_columns=400)
+    for index in range(1000):
+        series.add(1.30 + index * 1e-5)
+    assert series.bucket == 4 and len(series.columns) == 250
+
+    assert series.resize(100)
+    assert series.bucket == 16 and len(series.columns) == 63
+    assert series.columns[0][0] == 1.30 and abs(series.columns[-1][1] - (1.30 + 999e-5)) < 1e-12
+
+    assert not series.resize(770)
+    for index in range(1000, 10000):
+        series.add(1.30 + index * 1e-5)
+    assert series.bucket == 16 and len(series.columns) == 625
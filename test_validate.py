@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试工作簿模板校验与修复
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook, load_workbook
+
+from density2excel.storage import read_product_models_from_excel
+from density2excel.validate import ERROR, validate_workbooks
+from density2excel.xlsx import read_merged_ranges
+
+HEADER = ["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"]
+
+
+def make_bad_workbook(filename):
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "三月"
+    sheet.append(HEADER)
+    sheet.append(["2024-03-01 08:00", None, "1#", 1001.0, "白班"])
+    sheet.append(["2024-03-01 08:10", None, None, " 1002 ", "白班", "1.33"])
+    sheet.append(["昨天下午", None, "2#", "1003", "夜班", "abc"])
+    sheet.append(["08:30", None, "2#", "1001", "夜班"])
+    sheet.append([datetime(2024, 3, 1, 9), None, "3#", None, "夜班"])
+    sheet.merge_cells("C2:C3")
+    workbook.save(filename)
+
+
+def test_validate_and_fix():
+    """按行号报告问题，修复后的副本可以正常读取"""
+    directory = tempfile.mkdtemp()
+    filename = os.path.join(directory, "template.xlsx")
+    make_bad_workbook(filename)
+    assert read_merged_ranges(filename) == {"三月": [(3, 2, 3, 3)]}
+    with open(os.path.join(directory, "~$template.xlsx"), "w") as f:
+        f.write("lock")
+
+    output_dir = os.path.join(directory, "fixed")
+    results = []
+    [summary] = validate_workbooks([filename], output_dir, workers=1, on_result=results.append)
+    assert results == [summary]
+    assert summary["rows"] == 5
+    problems = {(issue["row"], issue["column"], issue["level"], issue["problem"]) for issue in summary["issues"]}
+    assert (2, "C", ERROR, "合并单元格 C2:C3") in problems
+    assert (2, "D", "warning", "产品型号是数值，应为文本") in problems
+    assert (3, "D", "warning", "产品型号有首尾空白") in problems
+    assert (3, "F", "warning", "数值保存为文本") in problems
+    assert (4, "A", "warning", "无法解析的时间") in problems
+    assert (4, "F", "warning", "不是数值") in problems
+    assert (5, "D", "warning", "产品型号与第 2 行重复，检测结果按行号回写到各自的行") in problems
+    assert (6, "D", ERROR, "产品型号为空，读取时会跳过该行") in problems
+    assert not any(issue["row"] == 1 for issue in summary["issues"])
+
+    fixed = load_workbook(summary["output"])
+    sheet = fixed["三月"]
+    assert [cell.value for cell in sheet["C"]][:3] == ["机台号", "1#", "1#"]
+    assert [cell.value for cell in sheet["D"]][1:3] == ["1001", "1002"]
+    assert sheet["A2"].value == "2024-03-01 08:00:00"
+    assert sheet["A5"].value == "08:30:00"
+    assert sheet["F3"].value == 1.33
+    assert sheet["A4"].value == "昨天下午"  # 无法解析的值保持原样
+    products = read_product_models_from_excel(summary["output"])
+    assert [product["产品型号"] for product in products] == ["1001", "1002", "1003", "1001"]
+
+
+def test_clean_workbook_and_errors():
+    """合格的工作簿没有问题，表头错误和无法打开的文件单独报告"""
+    directory = tempfile.mkdtemp()
+    clean = os.path.join(directory, "clean.xlsx")
+    workbook = Workbook()
+    workbook.active.append(["来样时间", "测试时间", *HEADER[2:]])
+    workbook.active.append(["08:00", "2024-03-01 08:10:00", "1#", "1001", "白班", 1.33, 1.32, 1.31, 1.30, 1.29, 1.31])
+    workbook.save(clean)
+
+    bad_header = os.path.join(directory, "header.xlsx")
+    workbook = Workbook()
+    workbook.active.append(HEADER[:3] + ["型号"])
+    workbook.save(bad_header)
+
+    broken = os.path.join(directory, "broken.xlsx")
+    with open(broken, "w") as f:
+        f.write("not a workbook")
+
+    clean_result, header_result, broken_result = validate_workbooks([clean, bad_header, broken], workers=2)
+    assert clean_result["issues"] == [] and clean_result["output"] is None
+    header_issues = [(issue["column"], issue["level"]) for issue in header_result["issues"]]
+    assert ("D", ERROR) in header_issues and ("E", "warning") in header_issues
+    assert "error" in broken_result
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+测试差异回写：只修改工作表XML中变化的单元格
+"""
+
+import os
+import sys
+import tempfile
+import zipfile
+
+# 添加当前目录到模块搜索路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.chart import BarChart, Reference
+from openpyxl.styles import Font
+from openpyxl.worksheet.datavalidation import DataValidation
+
+from density2excel.storage import ExcelWriteWorker, save_detection_results
+
+HEADER = ["来样时间", "检测时间", "机台号", "产品型号", "班次", "密度1", "密度2", "密度3", "密度4", "密度5", "平均值"]
+DETECT_DATA = {"来样时间": "09:00", "检测时间": "2024-03-01 08:10:00", "机台号": "9#", "班次": "夜班",
+               "密度1": 1.329, "密度2": None, "密度3": 1.33, "密度4": 1.331, "密度5": 1.33, "平均值": 1.3303}
+
+
+def make_template(filename):
+    """带样式、图表、数据验证和第二个工作表的模板"""
+    workbook = Workbook()
+    sheet = workbook.active
+    sheet.title = "数据"
+    sheet.append(HEADER)
+    for index in range(1, 201):
+        sheet.append(["08:00", None, f"{index % 3}#", f"M{index}" if index % 2 else index, "白班"])
+    sheet["F3"].font = Font(bold=True)
+    chart = BarChart()
+    chart.add_data(Reference(sheet, min_col=6, min_row=1, max_row=20))
+    sheet.add_chart(chart, "M2")
+    validation = DataValidation(type="list", formula1='"白班,夜班"')
+    sheet.add_data_validation(validation)
+    validation.add("E2:E500")
+    other = workbook.create_sheet("汇总")
+    other["A1"] = "=COUNT(数据!K:K)"
+    workbook.save(filename)
+
+
+def raw_members(filename):
+    """各成员的压缩数据（不解压）"""
+    with zipfile.ZipFile(filename) as archive, open(filename, "rb") as f:
+        members = {}
+        for info in archive.infolist():
+            f.seek(info.header_offset + 26)
+            name_length, extra_length = int.from_bytes(f.read(2), "little"), int.from_bytes(f.read(2), "little")
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+            members[info.filename] = f.read(info.compress_size)
+        return members
+
+
+def test_patch_keeps_other_members():
+    """只重写用到的工作表，其它成员的压缩数据逐字节相同，图表和数据验证保留"""
+    filename = os.path.join(tempfile.mkdtemp(), "template.xlsx")
+    make_template(filename)
+    before = raw_members(filename)
+
+    save_detection_results(filename, [(None, "M3", DETECT_DATA), ("数据", 4, DETECT_DATA),
+                                      (None, " NEW <&> ", DETECT_DATA)], write_mode="patch")
+    after = raw_members(filename)
+    assert list(after) == list(before)
+    changed = [name for name in before if before[name] != after[name]]
+    assert changed == ["xl/worksheets/sheet1.xml"]
+    with zipfile.ZipFile(filename) as archive:
+        assert archive.testzip() is None
+        sheet_xml = archive.read("xl/worksheets/sheet1.xml")
+        assert b"dataValidation" in sheet_xml and b"<drawing" in sheet_xml
+
+    sheet = load_workbook(filename)["数据"]
+    assert [cell.value for cell in sheet[4]] == ["08:00", "2024-03-01 08:10:00", "0#", "M3", "白班",
+                                                 1.329, None, 1.33, 1.331, 1.33, 1.3303]
+    assert sheet["F3"].font.b  # 单元格原来的样式保留
+    assert sheet["D5"].value == 4 and sheet["F5"].value == 1.329
+    assert sheet.max_row == 202
+    assert [cell.value for cell in sheet[202]][:5] == ["09:00", "2024-03-01 08:10:00", "9#", "NEW <&>", "夜班"]
+    assert sheet.dimensions == "A1:K202"
+
+
+def make_excel_style_workbook(filename):
+    """Excel保存的格式：共享字符串（含拼音）、相对路径的关系、公式单元格"""
+    main = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+    rels = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+    header = "".join(f'<c r="{chr(65 + index)}1" t="s"><v>{index}</v></c>' for index in range(11))
+    strings = "".join(f"<si><t>{text}</t></si>" for text in HEADER)
+    strings += '<si><r><t>M</t></r><r><t>5 </t></r><rPh sb="0" eb="1"><t>えむ</t></rPh></si>'
+    parts = {
+        "[Content_Types].xml": (
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            '<Override PartName="/xl/workbook.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+            '<Override PartName="/xl/worksheets/sheet1.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+            '<Override PartName="/xl/sharedStrings.xml" '
+            'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/></Types>'),
+        "_rels/.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rels}/officeDocument" Target="xl/workbook.xml"/></Relationships>'),
+        "xl/workbook.xml": (
+            f'<workbook {main} xmlns:r="{rels}"><sheets><sheet name="数据" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'),
+        "xl/_rels/workbook.xml.rels": (
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{rels}/worksheet" Target="worksheets/sheet1.xml"/>'
+            f'<Relationship Id="rId2" Type="{rels}/sharedStrings" Target="sharedStrings.xml"/></Relationships>'),
+        "xl/sharedStrings.xml": f'<sst {main} count="12" uniqueCount="12">{strings}</sst>',
+        "xl/worksheets/sheet1.xml": (
+            f'<worksheet {main}><dimension ref="A1:K3"/><sheetData>'
+            f'<row r="1" spans="1:11">{header}</row>'
+            '<row r="2" spans="1:11"><c r="D2"><v>1001</v></c><c r="K2"><f>AVERAGE(F2:J2)</f><v>0</v></c></row>'
+            '<row r="3" spans="1:11"><c r="D3" t="s"><v>11</v></c></row>'
+            '</sheetData></worksheet>'),
+    }
+    with zipfile.ZipFile(filename, "w", zipfile.ZIP_DEFLATED) as archive:
+        for name, content in parts.items():
+            archive.writestr(name, content)
+
+
+def test_patch_matches_shared_strings_and_falls_back():
+    """共享字符串中的型号（不含拼音）同样能匹配；要覆盖公式时改为openpyxl完整保存"""
+    filename = os.path.join(tempfile.mkdtemp(), "excel.xlsx")
+    make_excel_style_workbook(filename)
+
+    save_detection_results(filename, [(None, "M5", DETECT_DATA)], write_mode="patch")
+    with zipfile.ZipFile(filename) as archive:
+        assert b'<row r="3">' in archive.read("xl/worksheets/sheet1.xml")
+    sheet = load_workbook(filename)["数据"]
+    assert sheet["D3"].value == "M5 " and sheet["F3"].value == 1.329 and sheet.max_row == 3
+    assert sheet["K2"].value == "=AVERAGE(F2:J2)"
+
+    save_detection_results(filename, [(None, 1001, DETECT_DATA)], write_mode="patch")
+    sheet = load_workbook(filename)["数据"]
+    assert sheet["K2"].value == 1.3303 and sheet.max_row == 3
+
+
+def test_writer_patch_mode():
+    """回写线程使用差异回写"""
+    filename = os.path.join(tempfile.mkdtemp(), "writer.xlsx")
+    make_template(filename)
+    done = []
+    writer = ExcelWriteWorker(on_done=lambda model, success: done.append((model, success)), write_mode="patch")
+    writer.submit(filename, "M7", DETECT_DATA)
+    writer.submit(filename, "M9", DETECT_DATA, sheet_name="数据")
+    writer.close()
+    assert done == [("M7", True), ("M9", True)]
+    sheet = load_workbook(filename)["数据"]
+    assert sheet["K8"].value == 1.3303 and sheet["K10"].value == 1.3303
+
+
+def test_duplicate_models_write_scanned_row():
+    """同一型号有多行时写入扫码选中的行，不覆盖已检测的行；行号与型号不符时按型号查找"""
+    from density2excel.records import build_product_index, find_scanned_product
+    from density2excel.storage import read_product_models_from_excel
+
+    for write_mode in ("workbook", "patch"):
+        filename = os.path.join(tempfile.mkdtemp(), "duplicates.xlsx")
+        workbook = Workbook()
+        sheet = workbook.active
+        sheet.append(HEADER)
+        sheet.append(["08:00", "2024-03-01 07:50:00", "1#", "D1", "白班", 1.2, 1.2, 1.2, 1.2, 1.2, 1.2])
+        sheet.append(["09:00", None, "2#", "D1", "白班"])
+        sheet.append(["10:00", None, "3#", "D2", "白班"])
+        workbook.save(filename)
+
+        products = read_product_models_from_excel(filename)
+        position = find_scanned_product(build_product_index(products), products, "D1")
+        assert products[position]["行号"] == 3
+
+        writer = ExcelWriteWorker(write_mode=write_mode)
+        writer.submit(filename, "D1", DETECT_DATA, row=products[position]["行号"])
+        writer.submit(filename, "D2", DETECT_DATA, row=3)  # 第3行不是D2，按型号写入第4行
+        writer.close()
+
+        sheet = load_workbook(filename).active
+        assert sheet["K2"].value == 1.2 and sheet["B2"].value == "2024-03-01 07:50:00"
+        assert sheet["K3"].value == 1.3303 and sheet["B3"].value == "2024-03-01 08:10:00"
+        assert sheet["K4"].value == 1.3303 and sheet.max_row == 4
+
+
+def test_non_finite_values_written_as_empty_cells():
+    """NaN和无穷大写为空单元格，与openpyxl完整保存的结果一致，工作簿仍能正常打开"""
+    detect_data = dict(DETECT_DATA, 密度2=float("nan"), 密度4=float("inf"), 平均值=float("nan"))
+    results = []
+    for write_mode in ("workbook", "patch"):
+        filename = os.path.join(tempfile.mkdtemp(), "data.xlsx")
+        make_template(filename)
+        save_detection_results(filename, [("数据", "M5", detect_data)], write_mode=write_mode)
+        sheet = load_workbook(filename)["数据"]
+        results.append([cell.value for cell in sheet[6]][5:11])
+        with zipfile.ZipFile(filename) as archive:
+            assert b"nan" not in archive.read("xl/worksheets/sheet1.xml")
+    assert results[0] == results[1] == [1.329, None, 1.33, None, 1.33, None]